@@ -17,9 +17,7 @@ Per eseguire:
 """
 
 import streamlit as st
-import streamlit.components.v1 as components
 import hashlib
-from risk_engine import calculate_component_risk, calculate_bom_risk, calculate_bom_risk_v3
 from pn_lookup import PartNumberDatabase
 
 # Import moduli UI
@@ -33,7 +31,7 @@ from tabs_modules import (
     render_tab_gestione_database,
     render_tab_simulatore_whatif,
     render_tab_dashboard_esecutiva,
-    render_tab_guida
+    render_tab_guida,
 )
 
 # =============================================================================
@@ -149,6 +147,50 @@ def show_login_page():
     st.markdown('</div>', unsafe_allow_html=True)
 
 
+# =============================================================================
+# DATABASE (CACHE)
+# =============================================================================
+
+@st.cache_resource
+def get_db() -> PartNumberDatabase:
+    """Istanza condivisa del database: costruzione e migrazione una sola volta."""
+    db = PartNumberDatabase()
+    db.migrate_database()
+    return db
+
+
+def _db_version() -> int:
+    """Token di versione del database (mtime del file Excel): cambia a ogni salvataggio."""
+    return get_db().db_path.stat().st_mtime_ns
+
+
+@st.cache_data(show_spinner=False)
+def _cached_all_clients(db_version: int):
+    """Lista clienti, ricalcolata solo quando cambia il database."""
+    return get_db().get_all_clients()
+
+
+@st.cache_data(show_spinner=False)
+def _cached_client(client_id, db_version: int):
+    """Dati di un cliente, ricalcolati solo quando cambia il database."""
+    return get_db().get_client(client_id)
+
+
+@st.cache_data(show_spinner=False)
+def _client_options(clients: tuple):
+    """Etichette, ID e mappa ID -> indice per la selectbox clienti."""
+    labels = [f"{name} ({client_id})" for client_id, name in clients]
+    client_ids = [client_id for client_id, _ in clients]
+    id_to_idx = {client_id: i for i, client_id in enumerate(client_ids)}
+    return labels, client_ids, id_to_idx
+
+
+@st.cache_data(show_spinner=False)
+def _cached_stats(db_version: int):
+    """Statistiche del database per la sidebar, ricalcolate solo quando cambia il database."""
+    return get_db().get_stats()
+
+
 # =============================================================================
 # SESSION STATE INITIALIZATION
 # =============================================================================
@@ -168,24 +210,20 @@ def init_session_state():
         st.stop()
 
     if 'db' not in st.session_state:
-        st.session_state.db = PartNumberDatabase()
-        # Migra database se necessario
-        st.session_state.db.migrate_database()
+        # Database condiviso (già migrato) dalla cache delle risorse
+        st.session_state.db = get_db()
 
     if 'current_client' not in st.session_state:
-        clients = st.session_state.db.get_all_clients()
+        clients = _cached_all_clients(_db_version())
         if clients:
             st.session_state.current_client = clients[0]['Client_ID']
         else:
             st.session_state.current_client = None
 
     if 'run_rate' not in st.session_state:
-        client = st.session_state.db.get_client(st.session_state.current_client) if st.session_state.current_client else None
+        client = _cached_client(st.session_state.current_client, _db_version()) if st.session_state.current_client else None
         st.session_state.run_rate = client['Default_Run_Rate'] if client else 5000
 
-    if 'analysis_results' not in st.session_state:
-        st.session_state.analysis_results = []
-
     if 'batch_results' not in st.session_state:
         st.session_state.batch_results = None
 
@@ -196,116 +234,11 @@ init_session_state()
 # =============================================================================
 
 def get_client_run_rate(client_id):
-    """Ottiene il run rate di un cliente."""
-    client = st.session_state.db.get_client(client_id)
+    """Ottiene il run rate di un cliente (in cache fino alla prossima modifica del DB)."""
+    client = _cached_client(client_id, _db_version())
     return client['Default_Run_Rate'] if client else 5000
 
 
-def render_risk_badge(risk_level, score):
-    """Renderizza un badge del rischio."""
-    color_map = {
-        'ALTO': 'risk-red',
-        'MEDIO': 'risk-yellow',
-        'BASSO': 'risk-green'
-    }
-    css_class = color_map.get(risk_level, 'risk-green')
-    st.markdown(f"""
-    <div class="{css_class}">
-        <h3>{risk_level}</h3>
-        <p>Score: {score}/100</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-
-def render_switching_badge(classification):
-    """Renderizza un badge per la classificazione di switching."""
-    css_class = f"switching-{classification.lower()}"
-    st.markdown(f'<span class="{css_class}">{classification}</span>', unsafe_allow_html=True)
-
-
-def render_geo_detail(geo_risk):
-    """Renderizza i dettagli del rischio geografico frontend/backend."""
-    frontend = geo_risk.get('frontend_country', 'N/A').title()
-    backend = geo_risk.get('backend_country', 'N/A').title()
-    f_level = geo_risk.get('frontend_level', 'N/A')
-    b_level = geo_risk.get('backend_level', 'N/A')
-
-    st.markdown(f"""
-    <div class="geo-frontend">
-        <strong>Frontend (Wafer Fab):</strong> {frontend} - {f_level}<br/>
-        <small>{geo_risk.get('frontend_reason', '')}</small>
-    </div>
-    <div class="geo-backend">
-        <strong>Backend (Assembly/Test):</strong> {backend} - {b_level}<br/>
-        <small>{geo_risk.get('backend_reason', '')}</small>
-    </div>
-    """, unsafe_allow_html=True)
-
-
-def _is_component_affected(component: dict, scenario: dict) -> bool:
-    """Verifica se un componente è affetto dallo scenario."""
-    from whatif_simulator import _is_component_affected as _check_affected
-    return _check_affected(component, scenario)
-
-
-def render_mermaid(mermaid_code, height=600):
-    """Renderizza un diagramma Mermaid in Streamlit."""
-    components.html(f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <script src="https://cdn.jsdelivr.net/npm/mermaid@10.9.0/dist/mermaid.min.js"></script>
-        <style>
-            body {{ margin: 0; padding: 20px; font-family: Arial, sans-serif; background: white; }}
-            .mermaid {{ background: white; padding: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="mermaid" style="background: white;">
-{mermaid_code}
-        </div>
-        <script>
-            mermaid.initialize({{ startOnLoad: true, theme: 'default', securityLevel: 'loose' }});
-        </script>
-    </body>
-    </html>
-    """, height=height, scrolling=True)
-
-
-def run_batch_analysis(pns, client_id, run_rate):
-    """Esegue analisi batch e restituisce risultati strutturati."""
-    results = st.session_state.db.lookup_batch(pns, client_id)
-    found_components = {pn: data for pn, data in results.items() if data is not None}
-    not_found = [pn for pn, data in results.items() if data is None]
-
-    if not found_components:
-        return None
-
-    # Calcola rischi individuali
-    components_data = []
-    components_risk = []
-    for pn, data in found_components.items():
-        risk = calculate_component_risk(data, run_rate)
-        risk['part_number'] = pn
-        risk['supplier'] = data.get('Supplier Name', 'N/A')
-        risk['category'] = data.get('Category of product (MCU, MPU, Sensor, Analogic, Power, Passive Component, Transceiver Wireless)', 'N/A')
-        components_risk.append(risk)
-        data['Part Number'] = pn
-        components_data.append(data)
-
-    # Calcola BOM risk v3 (con dependency graph)
-    bom_risk_v3 = calculate_bom_risk_v3(components_data, components_risk)
-
-    return {
-        'components_data': components_data,
-        'components_risk': components_risk,
-        'bom_risk': bom_risk_v3,
-        'found_count': len(found_components),
-        'total_count': len(pns),
-        'not_found': not_found,
-    }
-
-
 # =============================================================================
 # SIDEBAR
 # =============================================================================
@@ -321,18 +254,22 @@ with st.sidebar:
     st.markdown("---")
     st.header("Configurazione")
 
-    clients = st.session_state.db.get_all_clients()
+    clients = _cached_all_clients(_db_version())
     if clients:
-        client_options = {f"{c['Client_Name']} ({c['Client_ID']})": c['Client_ID'] for c in clients}
-        selected = st.selectbox(
+        labels, client_ids, id_to_idx = _client_options(
+            tuple((c['Client_ID'], c['Client_Name']) for c in clients)
+        )
+        selected_idx = st.selectbox(
             "Seleziona Cliente",
-            options=list(client_options.keys()),
-            index=list(client_options.values()).index(st.session_state.current_client) if st.session_state.current_client else 0
+            options=range(len(labels)),
+            format_func=labels.__getitem__,
+            index=id_to_idx.get(st.session_state.current_client, 0)
         )
-        st.session_state.current_client = client_options[selected]
+        st.session_state.current_client = client_ids[selected_idx]
 
-        if st.session_state.run_rate != get_client_run_rate(st.session_state.current_client):
-            st.session_state.run_rate = get_client_run_rate(st.session_state.current_client)
+        client_run_rate = get_client_run_rate(st.session_state.current_client)
+        if st.session_state.run_rate != client_run_rate:
+            st.session_state.run_rate = client_run_rate
     else:
         st.warning("Nessun cliente trovato. Vai su 'Gestione Database' per aggiungerne uno.")
         st.session_state.current_client = None
@@ -353,7 +290,7 @@ with st.sidebar:
 
     st.markdown("---")
     st.header("Database Stats")
-    stats = st.session_state.db.get_stats()
+    stats = _cached_stats(_db_version())
     st.metric("Part Numbers", stats['total_part_numbers'])
     st.metric("Clienti", stats['total_clients'])
 
@@ -382,53 +319,40 @@ st.markdown("**Analisi deterministica del rischio con dipendenze, geo-risk front
 # TABS
 # =============================================================================
 
-tab9, tab2, tab3, tab4, tab5, tab_t2, tab6, tab7, tab8  = st.tabs([
-    "Guida",
-    "Analisi Multipla",
-    "Dashboard",
-    "Albero Dipendenze",
-    "Mappa Geopolitica",
-    "Tier-2/3 Visibility",
-    "Costi di Switching",
-    "Simulatore What-If",
-    "Gestione Database",
-])
+# Tabella dei tab: (etichetta, funzione di render), nell'ordine di visualizzazione.
+# "Analisi Rapida" (render_tab_analisi_rapida) è disattivata.
+TAB_RENDERERS = [
+    ("Guida", render_tab_guida),
+    ("Analisi Multipla", render_tab_analisi_multipla),
+    ("Dashboard", render_tab_dashboard_esecutiva),
+    ("Albero Dipendenze", render_tab_albero_dipendenze),
+    ("Mappa Geopolitica", render_tab_mappa_geopolitica),
+    ("Tier-2/3 Visibility", render_tab_tier2_visibility),
+    ("Costi di Switching", render_tab_costi_switching),
+    ("Simulatore What-If", render_tab_simulatore_whatif),
+    ("Gestione Database", render_tab_gestione_database),
+]
+
+# Con lo stato dei tab attivo (on_change="rerun") ogni rerun renderizza solo
+# il tab selezionato; con versioni di Streamlit senza questo supporto si
+# ricade sul render di tutti i tab.
+# Streamlit elimina lo stato dei widget dei tab non renderizzati: gli input da
+# conservare al cambio tab (BOM e file caricato, paginazione, What-If) sono
+# copiati in chiavi di sessione normali (tabs_modules._kept_widget).
+tab_labels = [label for label, _ in TAB_RENDERERS]
+try:
+    tabs = st.tabs(tab_labels, key="active_tab", on_change="rerun")
+except TypeError:
+    tabs = st.tabs(tab_labels)
 
 # =============================================================================
 # RENDER TAB FUNCTIONS
 # =============================================================================
 
-# with tab2:
-#     render_tab_analisi_rapida()
-with tab9:
-    render_tab_guida()
-
-with tab2:
-    render_tab_analisi_multipla()
-
-
-with tab3:
-    render_tab_dashboard_esecutiva()
-
-
-with tab4:
-    render_tab_albero_dipendenze()
-
-with tab5:
-    render_tab_mappa_geopolitica()
-
-with tab_t2:
-    render_tab_tier2_visibility()
-
-with tab6:
-    render_tab_costi_switching()
-
-with tab7:
-    render_tab_simulatore_whatif()
-
-with tab8:
-    render_tab_gestione_database()
-
+for tab, (_, render_tab) in zip(tabs, TAB_RENDERERS):
+    with tab:
+        if getattr(tab, 'open', None) is not False:
+            render_tab()
 
 
 # =============================================================================
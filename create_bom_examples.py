@@ -7,14 +7,17 @@ Script per creare 2 file BOM di esempio realistici e aggiornare il database.
 import pandas as pd
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
 from openpyxl.utils import get_column_letter
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
 # =========================================================================
 # COLUMN HEADERS (identici al template esistente)
 # =========================================================================
 
-HEADERS = [
+HEADERS = (
     'Supplier Name',
     'Supplier Part Number',
     'Stand-Alone Functional Device (Y/N)',
@@ -59,7 +62,10 @@ HEADERS = [
     'Last_Price_Increase_Pct\n(%)',
     'Allocation_Status\n(Normal/Constrained/Allocated)',
     'Package_Type\n(QFP/BGA/WLCSP/QFN/SOP/DIP)',
-]
+)
+_N_HEADERS = len(HEADERS)
+# Lettere di colonna del foglio INPUTS (A, B, ..., AQ) calcolate una volta
+_COL_LETTERS = tuple(get_column_letter(col_idx) for col_idx in range(1, _N_HEADERS + 1))
 
 ABSTRACT_ROWS = [
     ['Supply Chain Risk Assessment - Input Template v3.1'],
@@ -166,87 +172,137 @@ ABSTRACT_ROWS = [
 OUTPUT_HEADERS = ['Color Code', 'Risk Description', 'Suggestion', 'Man Hour Impact']
 
 
+# =========================================================================
+# STILI E LAYOUT (condivisi da tutti i file generati)
+# =========================================================================
+
+# Abstract
+_TITLE_FONT = Font(bold=True, size=14)
+_TITLE_ALIGN = Alignment(horizontal='center', vertical='center')
+_DESC_ALIGN = Alignment(wrap_text=True, vertical='top')
+_ABSTRACT_HEADER_FONT = Font(bold=True)
+_ABSTRACT_HEADER_FILL = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
+_CATEGORY_FONT = Font(bold=True)
+_CATEGORY_FILL = PatternFill(start_color='B4C6E7', end_color='B4C6E7', fill_type='solid')
+_ROW_FILL_EVEN = PatternFill(start_color='F2F2F2', end_color='F2F2F2', fill_type='solid')
+
+_ABSTRACT_HEADERS = ['#', 'Campo (Column Name)', 'Descrizione', 'Valori Ammessi', 'Impatto Score']
+# Salta le prime 5 righe di ABSTRACT_ROWS (titolo, vuota, descrizione, vuota,
+# header) che create_bom_file scrive con stile dedicato
+_ABSTRACT_CONTENT_ROWS = ABSTRACT_ROWS[5:]
+_ABSTRACT_FIRST_ROW = 6
+
+
+def _abstract_plan(rows):
+    """
+    Classifica una volta le righe dell'Abstract in (categoria?, valori):
+    le categorie hanno un solo testo, i campi fino a 5 colonne.
+    Le righe vuote vengono scartate.
+    """
+    plan = []
+    for row_data in rows:
+        if len(row_data) == 1 and row_data[0]:
+            plan.append((True, row_data[0]))
+        elif len(row_data) >= 2:
+            plan.append((False, list(row_data[:5])))
+    return plan
+
+
+_ABSTRACT_PLAN = _abstract_plan(_ABSTRACT_CONTENT_ROWS)
+_ABSTRACT_LAST_ROW = _ABSTRACT_FIRST_ROW + len(_ABSTRACT_PLAN) - 1
+# Titolo (riga 1), descrizione (riga 3) e una riga per ogni categoria
+_ABSTRACT_MERGES = ['A1:E1', 'A3:E3'] + [
+    f'A{row_idx}:E{row_idx}'
+    for row_idx, (is_category, _) in enumerate(_ABSTRACT_PLAN, start=_ABSTRACT_FIRST_ROW)
+    if is_category
+]
+_ABSTRACT_COL_WIDTHS = {'A': 5, 'B': 18, 'C': 50, 'D': 35, 'E': 20}
+
+# INPUTS
+_BOARD_TITLE_FONT = Font(bold=True, size=14, color='1F4E79')
+_INPUT_HEADER_FONT = Font(bold=True, color='FFFFFF', size=9)
+_INPUT_HEADER_FILL = PatternFill(start_color='1F4E79', end_color='1F4E79', fill_type='solid')
+_INPUT_HEADER_ALIGN = Alignment(wrap_text=True, vertical='center')
+_INPUT_COL_WIDTHS = {
+    **dict.fromkeys(_COL_LETTERS, 18),
+    'A': 22, 'B': 28, 'D': 35,
+}
+
+
+def _styled(ws, value, font=None, fill=None, alignment=None):
+    """Cella write-only con stile (gli oggetti stile sono condivisi, non ricreati)."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
+
+
 def create_bom_file(filename, run_rate, components, board_title):
-    """Crea un file BOM Excel con la struttura standard."""
-    wb = openpyxl.Workbook()
+    """
+    Crea un file BOM Excel con la struttura standard.
 
-    # Elimina il foglio di default
-    wb.remove(wb.active)
+    components è un DataFrame con colonne HEADERS (una riga per componente).
+    Il workbook è in modalità write_only: le righe vengono scritte in streaming
+    con ws.append() e solo le celle con stile diventano oggetti WriteOnlyCell.
+    """
+    wb = openpyxl.Workbook(write_only=True)
 
     # --- ABSTRACT SHEET ---
-    ws_abstract = wb.create_sheet('Abstract', 0)
-
-    # Stili
-    title_font = Font(bold=True, size=14)
-    title_align = Alignment(horizontal='center', vertical='center')
-    desc_align = Alignment(wrap_text=True, vertical='top')
-    header_font = Font(bold=True)
-    category_font = Font(bold=True)
-    category_fill = PatternFill(start_color='B4C6E7', end_color='B4C6E7', fill_type='solid')
-    header_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
-    row_fill_even = PatternFill(start_color='F2F2F2', end_color='F2F2F2', fill_type='solid')
+    ws_abstract = wb.create_sheet('Abstract')
 
-    # Titolo principale (riga 1)
-    ws_abstract.merge_cells('A1:E1')
-    c1 = ws_abstract['A1']
-    c1.value = 'Supply Chain Risk Assessment - Input Template v3.1'
-    c1.font = title_font
-    c1.alignment = title_align
+    # Larghezze colonne e altezze righe vanno impostate prima dello streaming
+    for col, width in _ABSTRACT_COL_WIDTHS.items():
+        ws_abstract.column_dimensions[col].width = width
     ws_abstract.row_dimensions[1].height = 25
+    ws_abstract.row_dimensions[3].height = 40
+    for cell_range in _ABSTRACT_MERGES:
+        ws_abstract.merged_cells.add(cell_range)
+
+    # Titolo principale (riga 1)
+    ws_abstract.append([_styled(ws_abstract, 'Supply Chain Risk Assessment - Input Template v3.1',
+                                font=_TITLE_FONT, alignment=_TITLE_ALIGN)])
+    ws_abstract.append([])
 
     # Descrizione (riga 3)
-    ws_abstract.merge_cells('A3:E3')
-    c3 = ws_abstract['A3']
-    c3.value = ('The electronic supply chain is one of the most complex in the world. '
-                'This tool assesses BOM-level risk and provides resilience suggestions. '
-                'The INPUTS sheet contains all the data fields described below. '
-                'Fields marked as NEW v3.1 are optional - if left empty, safe defaults are used.')
-    c3.alignment = desc_align
-    ws_abstract.row_dimensions[3].height = 40
+    ws_abstract.append([_styled(ws_abstract,
+                                'The electronic supply chain is one of the most complex in the world. '
+                                'This tool assesses BOM-level risk and provides resilience suggestions. '
+                                'The INPUTS sheet contains all the data fields described below. '
+                                'Fields marked as NEW v3.1 are optional - if left empty, safe defaults are used.',
+                                alignment=_DESC_ALIGN)])
+    ws_abstract.append([])
 
     # Header tabella (riga 5)
-    headers = ['#', 'Campo (Column Name)', 'Descrizione', 'Valori Ammessi', 'Impatto Score']
-    for col_idx, val in enumerate(headers, start=1):
-        cell = ws_abstract.cell(row=5, column=col_idx, value=val)
-        cell.font = header_font
-        cell.fill = header_fill
-
-    # Categorie e campi (partendo dalla riga 6)
-    # Salta i primi 4 elementi di ABSTRACT_ROWS (title vuoto, desc, vuoto, header)
-    # che abbiamo già scritto manualmente
-    row_idx = 6
-    content_rows = ABSTRACT_ROWS[5:]  # Salta le prime 5 righe
-
-    for row_data in content_rows:
-        if len(row_data) == 1 and row_data[0]:
-            # Categoria - merge celle
-            ws_abstract.merge_cells(f'A{row_idx}:E{row_idx}')
-            cell = ws_abstract.cell(row=row_idx, column=1, value=row_data[0])
-            cell.font = category_font
-            cell.fill = category_fill
-            row_idx += 1
-        elif len(row_data) >= 2:
-            # Campo normale
-            for col_idx, val in enumerate(row_data[:5], start=1):
-                cell = ws_abstract.cell(row=row_idx, column=col_idx, value=val)
-                # Alterna colori righe
-                if row_idx % 2 == 1:
-                    cell.fill = row_fill_even
-            row_idx += 1
-
-    # Larghezza colonne Abstract
-    ws_abstract.column_dimensions['A'].width = 5
-    ws_abstract.column_dimensions['B'].width = 18
-    ws_abstract.column_dimensions['C'].width = 50
-    ws_abstract.column_dimensions['D'].width = 35
-    ws_abstract.column_dimensions['E'].width = 20
+    ws_abstract.append([_styled(ws_abstract, val, font=_ABSTRACT_HEADER_FONT, fill=_ABSTRACT_HEADER_FILL)
+                        for val in _ABSTRACT_HEADERS])
+
+    # Categorie e campi (partendo dalla riga 6), secondo il piano precalcolato
+    for is_category, values in _ABSTRACT_PLAN:
+        if is_category:
+            ws_abstract.append([_styled(ws_abstract, values, font=_CATEGORY_FONT, fill=_CATEGORY_FILL)])
+        else:
+            ws_abstract.append(values)
+
+    # Alterna colori righe: un'unica regola condizionale su tutta la tabella
+    # invece di un fill per cella (le righe categoria hanno la colonna B vuota)
+    ws_abstract.conditional_formatting.add(
+        f'A{_ABSTRACT_FIRST_ROW}:E{_ABSTRACT_LAST_ROW}',
+        FormulaRule(formula=['AND(MOD(ROW(),2)=1,$B6<>"")'], fill=_ROW_FILL_EVEN)
+    )
 
     # --- INPUTS SHEET ---
     ws_inputs = wb.create_sheet('INPUTS')
 
+    # Set column widths
+    for col, width in _INPUT_COL_WIDTHS.items():
+        ws_inputs.column_dimensions[col].width = width
+
     # Row 1: Board title
-    ws_inputs.append([board_title])
-    ws_inputs['A1'].font = Font(bold=True, size=14, color='1F4E79')
+    ws_inputs.append([_styled(ws_inputs, board_title, font=_BOARD_TITLE_FONT)])
 
     # Row 2: empty
     ws_inputs.append([])
@@ -268,25 +324,13 @@ def create_bom_file(filename, run_rate, components, board_title):
     ws_inputs.append([])
 
     # Row 5: Headers
-    ws_inputs.append(HEADERS)
-    header_row = ws_inputs[5]
-    header_fill = PatternFill(start_color='1F4E79', end_color='1F4E79', fill_type='solid')
-    header_font = Font(bold=True, color='FFFFFF', size=9)
-    for cell in header_row:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(wrap_text=True, vertical='center')
-
-    # Data rows
-    for comp in components:
-        ws_inputs.append(comp)
+    ws_inputs.append([_styled(ws_inputs, h, font=_INPUT_HEADER_FONT, fill=_INPUT_HEADER_FILL,
+                              alignment=_INPUT_HEADER_ALIGN)
+                      for h in HEADERS])
 
-    # Set column widths
-    for col_idx in range(1, len(HEADERS) + 1):
-        ws_inputs.column_dimensions[get_column_letter(col_idx)].width = 18
-    ws_inputs.column_dimensions['A'].width = 22
-    ws_inputs.column_dimensions['B'].width = 28
-    ws_inputs.column_dimensions['D'].width = 35
+    # Data rows (tuple di oggetti Python: None resta cella vuota)
+    for comp in components.itertuples(index=False, name=None):
+        ws_inputs.append(comp)
 
     # --- OUTPUT SHEET ---
     ws_output = wb.create_sheet('OUTPUT')
@@ -306,9 +350,9 @@ def create_bom_file(filename, run_rate, components, board_title):
 # Rischi chiave: sole-source vision processor, NRND connector, advanced nodes
 # EMS: Bosch Germany (tier-1 automotive)
 
-adas_components = [
+ADAS_COMPONENT_ROWS = (
     # 1. NXP S32K344 - Automotive Safety MCU (ASIL-D)
-    ['NXP', 'S32K344', 'Y', None,
+    ('NXP', 'S32K344', 'Y', None,
      8.50, 1, 'MCU', 'N', 22, 'N',
      1024, 'Y', 'No', 'Baremetal', None,
      'AEC-Q100, ISO 26262 ASIL-D', 28, '40nm',
@@ -316,10 +360,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 15000,
      'Distributor', 'Arrow', 'Germany', 30000,
      'Yes', 75000,
-     'Active', 2, 'A', 500000, 'AEC-Q100', 8, 'Normal', 'BGA'],
+     'Active', 2, 'A', 500000, 'AEC-Q100', 8, 'Normal', 'BGA'),
 
     # 2. NXP S32G274A - Vehicle Network Processor (sole source!)
-    ['NXP', 'S32G274A', 'N', 'PMIC PF5024, LPDDR4 MT53E256M32D1DS-046',
+    ('NXP', 'S32G274A', 'N', 'PMIC PF5024, LPDDR4 MT53E256M32D1DS-046',
      28.00, 1, 'MPU', 'N', 26, 'Y',
      4096, 'N', 'Yes', 'Linux', None,
      'AEC-Q100, ISO 26262 ASIL-B', 36, '16nm',
@@ -327,10 +371,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 3000,
      'Supplier', None, None, None,
      'No', 0,
-     'Active', 0, 'A', 400000, 'AEC-Q100', 15, 'Constrained', 'FCBGA'],
+     'Active', 0, 'A', 400000, 'AEC-Q100', 15, 'Constrained', 'FCBGA'),
 
     # 3. NXP PF5024 - Safety PMIC (companion chip - sole source!)
-    ['NXP', 'PF5024', 'N', 'S32G274A MPU',
+    ('NXP', 'PF5024', 'N', 'S32G274A MPU',
      5.80, 1, 'Power', 'N', 20, 'Y',
      0, 'N', 'No', None, None,
      'AEC-Q100', 24, '130nm',
@@ -338,10 +382,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 5000,
      'Supplier', None, None, None,
      'Yes', 15000,
-     'Active', 0, 'A', 600000, 'AEC-Q100', 5, 'Normal', 'QFN'],
+     'Active', 0, 'A', 600000, 'AEC-Q100', 5, 'Normal', 'QFN'),
 
     # 4. Mobileye EyeQ5H - Vision Processor (7nm, sole source, allocated!)
-    ['Mobileye (Intel)', 'EyeQ5H', 'N', 'LPDDR4 MT53E256M32D1DS-046, NOR Flash MX25U25645G',
+    ('Mobileye (Intel)', 'EyeQ5H', 'N', 'LPDDR4 MT53E256M32D1DS-046, NOR Flash MX25U25645G',
      55.00, 1, 'MPU', 'N', 32, 'Y',
      8192, 'N', 'Yes', 'Linux', None,
      'AEC-Q100, ISO 26262 ASIL-B', 48, '7nm',
@@ -349,10 +393,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 1000,
      'Supplier', None, None, None,
      'No', 0,
-     'Active', 0, 'A', 350000, 'AEC-Q100', 0, 'Allocated', 'FCBGA'],
+     'Active', 0, 'A', 350000, 'AEC-Q100', 0, 'Allocated', 'FCBGA'),
 
     # 5. Micron MT53E256M32D1DS-046 - LPDDR4 (shared by 2 processors)
-    ['Micron', 'MT53E256M32D1DS-046', 'N', 'S32G274A MPU, EyeQ5H Vision Processor',
+    ('Micron', 'MT53E256M32D1DS-046', 'N', 'S32G274A MPU, EyeQ5H Vision Processor',
      6.50, 4, 'Memory', 'N', 18, 'N',
      0, 'N', 'Yes', None, None,
      'AEC-Q100', 16, '12nm',
@@ -360,10 +404,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 8000,
      'Distributor', 'WPG', 'Taiwan', 15000,
      'No', 0,
-     'Active', 2, 'A', 200000, 'AEC-Q100', 30, 'Constrained', 'BGA'],
+     'Active', 2, 'A', 200000, 'AEC-Q100', 30, 'Constrained', 'BGA'),
 
     # 6. Macronix MX25U25645G - NOR Flash 256Mbit
-    ['Macronix', 'MX25U25645G', 'Y', None,
+    ('Macronix', 'MX25U25645G', 'Y', None,
      2.80, 2, 'Memory', 'N', 14, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q100', 12, '45nm',
@@ -371,10 +415,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 12000,
      'Distributor', 'Mouser', 'USA', 20000,
      'Yes', 40000,
-     'Active', 3, 'B', 300000, 'AEC-Q100', 10, 'Normal', 'SOP'],
+     'Active', 3, 'B', 300000, 'AEC-Q100', 10, 'Normal', 'SOP'),
 
     # 7. Marvell 88Q2112 - Automotive Ethernet PHY 100BASE-T1
-    ['Marvell', '88Q2112-A2-NNP2I000', 'Y', None,
+    ('Marvell', '88Q2112-A2-NNP2I000', 'Y', None,
      4.20, 2, 'Transceiver', 'N', 24, 'N',
      64, 'Y', 'No', 'Baremetal', None,
      'AEC-Q100', 20, '28nm',
@@ -382,10 +426,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 6000,
      'Distributor', 'Arrow', 'Germany', 10000,
      'Yes', 25000,
-     'Active', 1, 'A', 450000, 'AEC-Q100', 12, 'Constrained', 'QFN'],
+     'Active', 1, 'A', 450000, 'AEC-Q100', 12, 'Constrained', 'QFN'),
 
     # 8. TI TPS65263-1QRGZRQ1 - Multi-output DC/DC Converter
-    ['Texas Instruments', 'TPS65263-1QRGZRQ1', 'Y', None,
+    ('Texas Instruments', 'TPS65263-1QRGZRQ1', 'Y', None,
      3.50, 1, 'Power', 'Y', 12, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q100', 10, '65nm',
@@ -393,10 +437,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 20000,
      'Distributor', 'Arrow', 'Germany', 50000,
      'Yes', 80000,
-     'Active', 3, 'A', 700000, 'AEC-Q100', 3, 'Normal', 'QFN'],
+     'Active', 3, 'A', 700000, 'AEC-Q100', 3, 'Normal', 'QFN'),
 
     # 9. Bosch SMI230 - 6-axis IMU MEMS
-    ['Bosch Sensortec', 'SMI230', 'Y', None,
+    ('Bosch Sensortec', 'SMI230', 'Y', None,
      3.80, 1, 'Sensor', 'N', 16, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q100', 14, 'MEMS',
@@ -404,10 +448,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 10000,
      'Supplier', None, None, None,
      'Yes', 30000,
-     'Active', 2, 'A', 350000, 'AEC-Q100', 0, 'Normal', 'LGA'],
+     'Active', 2, 'A', 350000, 'AEC-Q100', 0, 'Normal', 'LGA'),
 
     # 10. NXP TJA1463 - CAN FD System Basis Chip
-    ['NXP', 'TJA1463', 'Y', None,
+    ('NXP', 'TJA1463', 'Y', None,
      2.90, 3, 'Transceiver', 'N', 18, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q100', 16, '130nm',
@@ -415,10 +459,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 15000,
      'Distributor', 'Avnet', 'Germany', 40000,
      'Yes', 60000,
-     'Active', 1, 'A', 600000, 'AEC-Q100', 5, 'Normal', 'SOP'],
+     'Active', 1, 'A', 600000, 'AEC-Q100', 5, 'Normal', 'SOP'),
 
     # 11. Murata GCM32ER71E106KA37 - MLCC 10uF Automotive
-    ['Murata', 'GCM32ER71E106KA37', 'Y', None,
+    ('Murata', 'GCM32ER71E106KA37', 'Y', None,
      0.08, 65, 'Passive Component', 'Y', 8, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q200', 4, None,
@@ -426,10 +470,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 500000,
      'Distributor', 'DigiKey', 'USA', 2000000,
      'Yes', 5000000,
-     'Active', 4, 'A', 1000000, 'AEC-Q200', 0, 'Normal', '1206'],
+     'Active', 4, 'A', 1000000, 'AEC-Q200', 0, 'Normal', '1206'),
 
     # 12. Nexperia PESD2CAN-U - CAN Bus TVS Protection
-    ['Nexperia', 'PESD2CAN-U', 'Y', None,
+    ('Nexperia', 'PESD2CAN-U', 'Y', None,
      0.12, 6, 'Passive Component', 'Y', 6, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q101', 3, None,
@@ -437,10 +481,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 100000,
      'Distributor', 'Mouser', 'USA', 300000,
      'Yes', 500000,
-     'Active', 3, 'A', 800000, 'AEC-Q101', 0, 'Normal', 'SOT-23'],
+     'Active', 3, 'A', 800000, 'AEC-Q101', 0, 'Normal', 'SOT-23'),
 
     # 13. TDK VLS252015HBX-1R0M - Power Inductor 1uH
-    ['TDK', 'VLS252015HBX-1R0M', 'Y', None,
+    ('TDK', 'VLS252015HBX-1R0M', 'Y', None,
      0.15, 8, 'Passive Component', 'Y', 8, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q200', 3, None,
@@ -448,10 +492,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 200000,
      'Distributor', 'DigiKey', 'USA', 500000,
      'Yes', 800000,
-     'Active', 5, 'A', 900000, 'AEC-Q200', 0, 'Normal', 'SMD'],
+     'Active', 5, 'A', 900000, 'AEC-Q200', 0, 'Normal', 'SMD'),
 
     # 14. Molex 5025781070 - Board-to-Board Connector
-    ['Molex', '5025781070', 'Y', None,
+    ('Molex', '5025781070', 'Y', None,
      0.45, 4, 'Connector', 'Y', 6, 'N',
      0, 'N', 'No', None, None,
      None, 2, None,
@@ -459,10 +503,10 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 50000,
      'Distributor', 'DigiKey', 'USA', 150000,
      'Yes', 200000,
-     'Active', 2, 'A', 500000, None, 0, 'Normal', 'Connector'],
+     'Active', 2, 'A', 500000, None, 0, 'Normal', 'Connector'),
 
     # 15. TE 1-2141530-1-AUT - Automotive MQS Header (NRND!)
-    ['TE Connectivity', '1-2141530-1-AUT', 'Y', None,
+    ('TE Connectivity', '1-2141530-1-AUT', 'Y', None,
      0.85, 2, 'Connector', 'Y', 8, 'N',
      0, 'N', 'No', None, None,
      'AEC-Q200', 4, None,
@@ -470,8 +514,8 @@ adas_components = [
      'Yes', 'Bosch', 'Germany', 60000,
      'Distributor', 'Arrow', 'Germany', 100000,
      'Yes', 200000,
-     'NRND', 1, 'A', 600000, 'AEC-Q200', 15, 'Normal', 'Connector'],
-]
+     'NRND', 1, 'A', 600000, 'AEC-Q200', 15, 'Normal', 'Connector'),
+)
 
 
 # =========================================================================
@@ -481,9 +525,9 @@ adas_components = [
 # Rischi chiave: EOL sensor, Last_Buy flash, NRND WiFi, fornitore C-rating
 # EMS: Foxconn China
 
-iot_components = [
+IOT_COMPONENT_ROWS = (
     # 1. Renesas RZ/G2L - MPU Linux (ARM Cortex-A55 + M33)
-    ['Renesas', 'R9A07G044L23GBG', 'N', 'PMIC RAA215300, DDR3L AS4C256M16D3C-12',
+    ('Renesas', 'R9A07G044L23GBG', 'N', 'PMIC RAA215300, DDR3L AS4C256M16D3C-12',
      15.00, 1, 'MPU', 'N', 20, 'Y',
      4096, 'N', 'Yes', 'Linux', None,
      'IEC 62443', 24, '22nm',
@@ -491,10 +535,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 5000,
      'Distributor', 'Avnet', 'Germany', 8000,
      'No', 0,
-     'Active', 1, 'A', 350000, None, 10, 'Normal', 'BGA'],
+     'Active', 1, 'A', 350000, None, 10, 'Normal', 'BGA'),
 
     # 2. Renesas RAA215300 - PMIC companion (sole source!)
-    ['Renesas', 'RAA215300', 'N', 'R9A07G044L23GBG MPU',
+    ('Renesas', 'RAA215300', 'N', 'R9A07G044L23GBG MPU',
      3.50, 1, 'Power', 'N', 18, 'Y',
      0, 'N', 'No', None, None,
      'IEC 62443', 20, '130nm',
@@ -502,10 +546,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 8000,
      'Distributor', 'Avnet', 'Germany', 12000,
      'Yes', 20000,
-     'Active', 0, 'A', 500000, None, 5, 'Normal', 'QFN'],
+     'Active', 0, 'A', 500000, None, 5, 'Normal', 'QFN'),
 
     # 3. Qualcomm QCA6174A-5 - WiFi 5 + BT 4.2 (NRND!)
-    ['Qualcomm', 'QCA6174A-5', 'Y', None,
+    ('Qualcomm', 'QCA6174A-5', 'Y', None,
      8.90, 1, 'Transceiver Wireless', 'N', 22, 'Y',
      2048, 'N', 'No', 'Linux', 'WiFi, BLE',
      'FCC, CE, TELEC', 18, '28nm',
@@ -513,10 +557,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 3000,
      'Distributor', 'Arrow', 'USA', 5000,
      'No', 0,
-     'NRND', 1, 'A', 300000, None, 25, 'Constrained', 'BGA'],
+     'NRND', 1, 'A', 300000, None, 25, 'Constrained', 'BGA'),
 
     # 4. Quectel EC25-E - LTE Cat 4 Module
-    ['Quectel', 'EC25-E', 'Y', None,
+    ('Quectel', 'EC25-E', 'Y', None,
      18.50, 1, 'Transceiver Wireless', 'N', 14, 'N',
      512, 'N', 'No', 'Linux', 'LTE',
      'CE, FCC, PTCRB', 16, '28nm',
@@ -524,10 +568,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 6000,
      'Distributor', 'Rutronik', 'Germany', 10000,
      'Yes', 15000,
-     'Active', 2, 'B', 200000, None, 0, 'Normal', 'Module'],
+     'Active', 2, 'B', 200000, None, 0, 'Normal', 'Module'),
 
     # 5. Micron MT29F4G08ABAFAWP - NAND Flash 4Gbit (LAST BUY!)
-    ['Micron', 'MT29F4G08ABAFAWP', 'Y', None,
+    ('Micron', 'MT29F4G08ABAFAWP', 'Y', None,
      3.20, 1, 'Memory', 'N', 16, 'N',
      0, 'N', 'No', None, None,
      None, 8, '14nm',
@@ -535,10 +579,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 4000,
      'Distributor', 'Mouser', 'USA', 6000,
      'No', 0,
-     'Last_Buy', 2, 'A', 250000, None, 40, 'Allocated', 'TSOP'],
+     'Last_Buy', 2, 'A', 250000, None, 40, 'Allocated', 'TSOP'),
 
     # 6. Alliance Memory AS4C256M16D3C-12 - DDR3L (C-rated supplier!)
-    ['Alliance Memory', 'AS4C256M16D3C-12', 'N', 'R9A07G044L23GBG MPU',
+    ('Alliance Memory', 'AS4C256M16D3C-12', 'N', 'R9A07G044L23GBG MPU',
      2.80, 2, 'Memory', 'N', 14, 'N',
      0, 'N', 'Yes', None, None,
      None, 12, '25nm',
@@ -546,10 +590,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 10000,
      'Distributor', 'Mouser', 'USA', 20000,
      'Yes', 30000,
-     'Active', 3, 'C', 200000, None, 18, 'Normal', 'BGA'],
+     'Active', 3, 'C', 200000, None, 18, 'Normal', 'BGA'),
 
     # 7. Microchip LAN9250 - Dual Ethernet 10/100 (long lead, price spike!)
-    ['Microchip', 'LAN9250', 'Y', None,
+    ('Microchip', 'LAN9250', 'Y', None,
      4.50, 1, 'Transceiver', 'N', 28, 'N',
      256, 'Y', 'No', 'Linux', None,
      'IEC 62443', 14, '90nm',
@@ -557,10 +601,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 3000,
      'Distributor', 'DigiKey', 'USA', 5000,
      'Yes', 8000,
-     'Active', 1, 'A', 400000, None, 55, 'Allocated', 'QFP'],
+     'Active', 1, 'A', 400000, None, 55, 'Allocated', 'QFP'),
 
     # 8. Silicon Labs Si7021-A20 - Temp/Humidity Sensor (EOL!)
-    ['Silicon Labs', 'Si7021-A20-GM1R', 'Y', None,
+    ('Silicon Labs', 'Si7021-A20-GM1R', 'Y', None,
      2.10, 1, 'Sensor', 'Y', 10, 'N',
      0, 'N', 'No', None, None,
      None, 6, '180nm',
@@ -568,10 +612,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 15000,
      'Distributor', 'DigiKey', 'USA', 30000,
      'Yes', 50000,
-     'EOL', 3, 'A', 300000, None, 0, 'Normal', 'DFN'],
+     'EOL', 3, 'A', 300000, None, 0, 'Normal', 'DFN'),
 
     # 9. TDK C2012X7R1H104K - MLCC 100nF (low risk, commodity)
-    ['TDK', 'C2012X7R1H104K', 'Y', None,
+    ('TDK', 'C2012X7R1H104K', 'Y', None,
      0.01, 120, 'Passive Component', 'Y', 6, 'N',
      0, 'N', 'No', None, None,
      None, 2, None,
@@ -579,10 +623,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 1000000,
      'Distributor', 'DigiKey', 'USA', 5000000,
      'Yes', 10000000,
-     'Active', 5, 'A', 1000000, None, 0, 'Normal', '0805'],
+     'Active', 5, 'A', 1000000, None, 0, 'Normal', '0805'),
 
     # 10. Wurth 744043100 - Common Mode Choke 1mH
-    ['Wurth Elektronik', '744043100', 'Y', None,
+    ('Wurth Elektronik', '744043100', 'Y', None,
      0.65, 4, 'Passive Component', 'Y', 10, 'N',
      0, 'N', 'No', None, None,
      None, 4, None,
@@ -590,10 +634,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 50000,
      'Distributor', 'Wurth Direct', 'Germany', 100000,
      'Yes', 150000,
-     'Active', 3, 'A', 800000, None, 0, 'Normal', 'SMD'],
+     'Active', 3, 'A', 800000, None, 0, 'Normal', 'SMD'),
 
     # 11. Amphenol 10118194-0001LF - USB-C Connector
-    ['Amphenol', '10118194-0001LF', 'Y', None,
+    ('Amphenol', '10118194-0001LF', 'Y', None,
      0.55, 2, 'Connector', 'Y', 8, 'N',
      0, 'N', 'No', None, None,
      None, 3, None,
@@ -601,10 +645,10 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 30000,
      'Distributor', 'DigiKey', 'USA', 80000,
      'Yes', 100000,
-     'Active', 4, 'A', 500000, None, 5, 'Normal', 'USB-C'],
+     'Active', 4, 'A', 500000, None, 5, 'Normal', 'USB-C'),
 
     # 12. Vishay IHLP2525CZER1R0M11 - Power Inductor 1uH
-    ['Vishay', 'IHLP2525CZER1R0M11', 'Y', None,
+    ('Vishay', 'IHLP2525CZER1R0M11', 'Y', None,
      0.35, 6, 'Passive Component', 'Y', 8, 'N',
      0, 'N', 'No', None, None,
      None, 3, None,
@@ -612,31 +656,53 @@ iot_components = [
      'Yes', 'Foxconn', 'China', 80000,
      'Distributor', 'Mouser', 'USA', 200000,
      'Yes', 300000,
-     'Active', 4, 'A', 700000, None, 0, 'Normal', 'SMD'],
-]
+     'Active', 4, 'A', 700000, None, 0, 'Normal', 'SMD'),
+)
 
 
 # =========================================================================
 # MAIN: Create files
 # =========================================================================
 
+def components_frame(rows):
+    """
+    DataFrame dei componenti (colonne HEADERS) da una tabella di righe.
+    dtype=object: ogni cella resta il valore Python originale (None = cella vuota).
+    """
+    return pd.DataFrame(list(rows), columns=HEADERS, dtype=object)
+
+
+# Parametri di create_bom_file per ogni file di esempio: 'components' contiene
+# le righe, il DataFrame viene costruito solo nel processo che scrive il file
+BOM_EXAMPLES = [
+    {
+        'filename': '02_BOM_Automotive_ADAS_ECU_15.xlsx',
+        'run_rate': 3000,
+        'components': ADAS_COMPONENT_ROWS,
+        'board_title': 'AUTOMOTIVE ADAS ECU - Camera Control Module',
+    },
+    {
+        'filename': '03_BOM_Industrial_IoT_Gateway_12.xlsx',
+        'run_rate': 8000,
+        'components': IOT_COMPONENT_ROWS,
+        'board_title': 'INDUSTRIAL IoT EDGE GATEWAY - Smart Factory Module',
+    },
+]
+
+
+def _create_bom_example(example):
+    """Crea un file di esempio (eseguita in un processo separato)."""
+    create_bom_file(**{**example, 'components': components_frame(example['components'])})
+
+
 if __name__ == '__main__':
     print("Creating BOM example files...")
     print()
 
-    create_bom_file(
-        '02_BOM_Automotive_ADAS_ECU_15.xlsx',
-        run_rate=3000,
-        components=adas_components,
-        board_title='AUTOMOTIVE ADAS ECU - Camera Control Module'
-    )
-
-    create_bom_file(
-        '03_BOM_Industrial_IoT_Gateway_12.xlsx',
-        run_rate=8000,
-        components=iot_components,
-        board_title='INDUSTRIAL IoT EDGE GATEWAY - Smart Factory Module'
-    )
+    # Ogni file è indipendente: la serializzazione openpyxl (XML + zip)
+    # gira in processi separati, un workbook per processo
+    with ProcessPoolExecutor(max_workers=len(BOM_EXAMPLES)) as executor:
+        list(executor.map(_create_bom_example, BOM_EXAMPLES))
 
     print()
     print("Done! Both BOM files created successfully.")
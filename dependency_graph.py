@@ -11,7 +11,12 @@ Uso:
     from dependency_graph import build_dependency_graph, calculate_chain_risk
 """
 
-import pandas as pd
+import re
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 
 try:
@@ -20,71 +25,176 @@ try:
 except ImportError:
     HAS_NETWORKX = False
 
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
 
 # =============================================================================
 # FUNZIONI DI UTILITÀ
 # =============================================================================
 
 def _get_safe(row: Dict[str, Any], key: str, default: Any = '') -> Any:
-    """Ottiene un valore in modo sicuro."""
+    """Ottiene un valore in modo sicuro (None e NaN diventano il default)."""
     val = row.get(key, default)
-    if val is None:
-        return default
-    if isinstance(val, float) and pd.isna(val):
+    # val != val è vero solo per NaN (anche np.float64): niente pandas qui
+    if val is None or (isinstance(val, float) and val != val):
         return default
     return val
 
 
-def _match_dependency_target(dep_text: str, all_components: List[Dict[str, Any]]) -> List[str]:
+CATEGORY_COLUMN = 'Category of product (MCU, MPU, Sensor, Analogic, Power, Passive Component, Transceiver Wireless)'
+STANDALONE_COLUMN = 'Stand-Alone Functional Device (Y/N)'
+DEPENDENCY_COLUMN = 'In case answer on Column C is Y, Which other device in the BOM is necessary to run the PN on Column B? (e.g. PMIC for MPU, Memory for MPU)'
+
+# Campi letti dal grafo per ogni componente: (colonna, default)
+_GRAPH_FIELDS = (
+    ('Part Number', ''),
+    (STANDALONE_COLUMN, 'Y'),
+    ('Supplier Name', 'N/A'),
+    (CATEGORY_COLUMN, 'N/A'),
+    (DEPENDENCY_COLUMN, ''),
+)
+
+
+def _graph_fields(comp: Dict[str, Any]) -> Tuple[str, str, Any, Any, Any]:
+    """Legge una volta i campi del grafo: (pn, standalone Y/N, supplier, categoria, testo dipendenza)."""
+    pn, standalone, supplier, category, dep_text = (_get_safe(comp, col, default) for col, default in _GRAPH_FIELDS)
+    return str(pn), str(standalone).upper(), supplier, category, dep_text
+
+# (parola chiave nel testo dipendenza, sottostringhe cercate in categoria/PN)
+# Es: "PMIC" nel testo -> match componenti Power/PMIC
+CATEGORY_KEYWORDS = (
+    ('pmic', ('power', 'pmic')),
+    ('memory', ('memory', 'ddr', 'sdram', 'sram', 'flash')),
+    ('mpu', ('mpu',)),
+    ('mcu', ('mcu',)),
+    ('sensor', ('sensor',)),
+    ('transceiver', ('transceiver', 'wireless', 'wifi', 'bluetooth')),
+)
+_KEYWORDS = tuple(keyword for keyword, _ in CATEGORY_KEYWORDS)
+
+
+# Indice per il match delle dipendenze: (part number, posizioni per PN minuscolo,
+# posizioni per parola chiave di categoria, automa Aho-Corasick sui PN o None)
+_DependencyIndex = Tuple[np.ndarray, Dict[str, List[int]], Dict[str, List[int]], Optional[Any]]
+
+
+def _precompute_lower_index(pns: List[str], categories: List[Any]) -> _DependencyIndex:
+    """
+    Costruisce una volta per grafo gli indici inversi usati dal match delle dipendenze.
+
+    Args:
+        pns: Part number dei componenti (ordine BOM)
+        categories: Categorie dei componenti, allineate a pns
+
+    Returns:
+        (pns, idx_by_pn, idx_by_cat, automaton): part number originali (array
+        object), posizioni nella BOM per PN minuscolo (PN vuoti esclusi), per
+        ogni parola chiave di CATEGORY_KEYWORDS le posizioni dei componenti la
+        cui categoria o PN contiene una delle sottostringhe associate e, se
+        pyahocorasick è installato, l'automa costruito sui PN minuscoli
+    """
+    pns = np.asarray(pns, dtype=object)
+    idx_by_pn = defaultdict(list)
+    idx_by_cat = defaultdict(list)
+
+    for i, (pn, category) in enumerate(zip(pns, categories)):
+        pn_lower = pn.lower()
+        if pn_lower:
+            idx_by_pn[pn_lower].append(i)
+        category = str(category).lower()
+        for keyword, cat_matches in CATEGORY_KEYWORDS:
+            if any(cm in category or cm in pn_lower for cm in cat_matches):
+                idx_by_cat[keyword].append(i)
+
+    # Automa multi-pattern: un testo di dipendenza viene scandito una volta
+    # sola per trovare tutti i PN contenuti, invece di un 'in' per ogni PN
+    automaton = None
+    if HAS_AHOCORASICK and idx_by_pn:
+        automaton = ahocorasick.Automaton()
+        for pn_lower in idx_by_pn:
+            automaton.add_word(pn_lower, pn_lower)
+        automaton.make_automaton()
+
+    return pns, dict(idx_by_pn), dict(idx_by_cat), automaton
+
+
+def _match_dependency_target(dep_text: str, index: _DependencyIndex) -> List[str]:
     """
     Cerca i componenti target di una dipendenza nel testo.
 
     Il testo può contenere part number, nomi di supplier o categorie.
     Es: "STPMIC1APQR" oppure "PMIC for MPU" oppure "Memory"
 
+    Args:
+        dep_text: Testo della dipendenza
+        index: Risultato di _precompute_lower_index sui componenti della BOM
+
     Returns:
-        Lista di Part Number che matchano la dipendenza
+        Lista di Part Number (ordine BOM, senza duplicati) che matchano la dipendenza
     """
     if not dep_text:
         return []
 
+    pns, idx_by_pn, idx_by_cat, automaton = index
     dep_lower = str(dep_text).lower().strip()
-    matches = []
-
-    for comp in all_components:
-        pn = str(_get_safe(comp, 'Part Number', '')).lower()
-        supplier = str(_get_safe(comp, 'Supplier Name', '')).lower()
-        category = str(_get_safe(comp, 'Category of product (MCU, MPU, Sensor, Analogic, Power, Passive Component, Transceiver Wireless)', '')).lower()
-
-        # Match esatto per PN
-        if pn and pn in dep_lower:
-            matches.append(str(comp.get('Part Number', '')))
-            continue
-
-        # Match per categoria menzionata nel testo dipendenza
-        # Es: "PMIC" nel testo -> match componenti Power/PMIC
-        category_keywords = {
-            'pmic': ['power', 'pmic'],
-            'memory': ['memory', 'ddr', 'sdram', 'sram', 'flash'],
-            'mpu': ['mpu'],
-            'mcu': ['mcu'],
-            'sensor': ['sensor'],
-            'transceiver': ['transceiver', 'wireless', 'wifi', 'bluetooth'],
-        }
 
-        for keyword, cat_matches in category_keywords.items():
-            if keyword in dep_lower:
-                if any(cm in category for cm in cat_matches) or any(cm in pn for cm in cat_matches):
-                    matches.append(str(comp.get('Part Number', '')))
-                    break
-
-    return list(set(matches))
+    # Posizioni raccolte in un set: un componente che matcha sia per PN
+    # che per categoria viene scartato subito invece che alla fine
+    positions = set()
+
+    # Match esatto per PN contenuto nel testo: scansione unica con l'automa,
+    # altrimenti un controllo per PN distinto
+    if automaton is not None:
+        for _, pn_lower in automaton.iter(dep_lower):
+            positions.update(idx_by_pn[pn_lower])
+    else:
+        for pn_lower, idxs in idx_by_pn.items():
+            if pn_lower in dep_lower:
+                positions.update(idxs)
+
+    # Match per categoria menzionata nel testo dipendenza
+    for keyword in _KEYWORDS:
+        if keyword in dep_lower:
+            positions.update(idx_by_cat.get(keyword, ()))
+
+    if not positions:
+        return []
+    # PN ripetuti nella BOM compaiono una volta sola, alla prima posizione
+    return list(dict.fromkeys(pns[sorted(positions)].tolist()))
 
 
 # =============================================================================
 # COSTRUZIONE GRAFO
 # =============================================================================
 
+# Chiave in graph.graph della tabella attributi a colonne (allineata a graph.nodes())
+NODE_TABLE_KEY = 'node_table'
+NODE_TABLE_COLUMNS = ('supplier', 'category', 'standalone')
+
+
+def _node_table(rows: List[Tuple[Any, Any, bool]]) -> Dict[str, np.ndarray]:
+    """Attributi dei nodi a colonne: un array per attributo, nell'ordine dei nodi."""
+    columns = list(zip(*rows)) if rows else [(), (), ()]
+    table = {name: np.asarray(col, dtype=object) for name, col in zip(NODE_TABLE_COLUMNS, columns)}
+    table['standalone'] = table['standalone'].astype(bool)
+    return table
+
+
+def _node_columns(graph: Any) -> Dict[str, np.ndarray]:
+    """Tabella attributi del grafo; ricostruita dai dict dei nodi se il grafo non viene da build_dependency_graph."""
+    table = graph.graph.get(NODE_TABLE_KEY)
+    if table is not None and len(table['supplier']) == graph.number_of_nodes():
+        return table
+    return _node_table([
+        (data.get('supplier', 'N/A'), data.get('category', 'N/A'), data.get('standalone', True))
+        for _, data in graph.nodes(data=True)
+    ])
+
+
 def build_dependency_graph(components: List[Dict[str, Any]]) -> Optional[Any]:
     """
     Costruisce un grafo direzionale delle dipendenze tra componenti.
@@ -103,41 +213,36 @@ def build_dependency_graph(components: List[Dict[str, Any]]) -> Optional[Any]:
 
     G = nx.DiGraph()
 
-    # Aggiungi tutti i componenti come nodi
-    for comp in components:
-        pn = str(_get_safe(comp, 'Part Number', ''))
-        if not pn:
-            continue
-
-        standalone = str(_get_safe(comp, 'Stand-Alone Functional Device (Y/N)', 'Y')).upper()
-        supplier = _get_safe(comp, 'Supplier Name', 'N/A')
-        category = _get_safe(comp, 'Category of product (MCU, MPU, Sensor, Analogic, Power, Passive Component, Transceiver Wireless)', 'N/A')
-
-        G.add_node(pn, **{
-            'supplier': supplier,
-            'category': category,
-            'standalone': standalone == 'Y',
-            'risk_score': 0,
-            'risk_color': 'GREEN',
-        })
-
-    # Aggiungi archi per i componenti non-standalone
-    for comp in components:
-        pn = str(_get_safe(comp, 'Part Number', ''))
-        standalone = str(_get_safe(comp, 'Stand-Alone Functional Device (Y/N)', 'Y')).upper()
-
+    # Campi del grafo letti una sola volta per componente
+    fields = [_graph_fields(comp) for comp in components]
+
+    # Attributi per nodo: un PN ripetuto mantiene la prima posizione e gli
+    # ultimi valori, come G.add_node chiamato riga per riga
+    node_rows = {}
+    for pn, standalone, supplier, category, _ in fields:
+        if pn:
+            node_rows[pn] = (supplier, category, standalone == 'Y')
+
+    # Nodi senza attributi: supplier/category/standalone vivono solo nella
+    # tabella a colonne (letta con _node_columns), il colore di rischio in
+    # calculate_chain_risk
+    G.add_nodes_from(node_rows)
+    G.graph[NODE_TABLE_KEY] = _node_table(list(node_rows.values()))
+
+    # Aggiungi archi per i componenti non-standalone (raccolti e inseriti in blocco)
+    # Le categorie mancanti valgono 'N/A', che non contiene parole chiave
+    index = _precompute_lower_index([f[0] for f in fields], [f[3] for f in fields])
+    existing_nodes = set(G.nodes())
+    edges = []
+    for pn, standalone, _, _, dep_text in fields:
         if standalone == 'N' and pn:
-            dep_text = _get_safe(
-                comp,
-                'In case answer on Column C is Y, Which other device in the BOM is necessary to run the PN on Column B? (e.g. PMIC for MPU, Memory for MPU)',
-                ''
-            )
-
             if dep_text:
-                targets = _match_dependency_target(dep_text, components)
-                for target_pn in targets:
-                    if target_pn != pn and G.has_node(target_pn):
-                        G.add_edge(pn, target_pn, dependency_text=dep_text)
+                edges.extend(
+                    (pn, target_pn, {'dependency_text': dep_text})
+                    for target_pn in _match_dependency_target(dep_text, index)
+                    if target_pn != pn and target_pn in existing_nodes
+                )
+    G.add_edges_from(edges)
 
     return G
 
@@ -146,9 +251,76 @@ def build_dependency_graph(components: List[Dict[str, Any]]) -> Optional[Any]:
 # ANALISI RISCHIO DI CATENA
 # =============================================================================
 
+# Soglie score (medio, alto) e classi corrispondenti (GREEN < 30 <= YELLOW < 55 <= RED)
+CHAIN_THRESHOLDS = np.array([30, 55])
+CHAIN_COLORS = ('GREEN', 'YELLOW', 'RED')
+CHAIN_LEVELS = ('BASSO', 'MEDIO', 'ALTO')
+
+
+def _color_index(scores: List[float]) -> List[int]:
+    """Indice di classe (0=GREEN, 1=YELLOW, 2=RED) per ogni score, in un'unica chiamata vettoriale."""
+    return np.searchsorted(CHAIN_THRESHOLDS, np.asarray(scores, dtype=float), side='right').tolist()
+
+
+def _condensed_order(graph: Any) -> Tuple[Any, Dict[Any, int], List[int]]:
+    """
+    Condensa il grafo nelle sue componenti fortemente connesse (i match per
+    categoria possono creare cicli, es. MPU <-> PMIC) e ne restituisce
+    (DAG condensato, mappa nodo -> componente, ordine topologico).
+    """
+    condensed = nx.condensation(graph)
+    return condensed, condensed.graph['mapping'], list(nx.topological_sort(condensed))
+
+
+def _dependents_bits(graph: Any, condensed: Any, mapping: Dict[Any, int], topo: List[int]) -> Dict[Any, int]:
+    """
+    Dipendenti transitivi (equivalente di nx.ancestors) di tutti i nodi in
+    un solo passaggio topologico sul DAG condensato. Ogni insieme è una
+    bitmask intera: il bit i corrisponde all'i-esimo nodo di graph.nodes().
+    """
+    node_bit = {node: 1 << i for i, node in enumerate(graph.nodes())}
+    member_bits = {c: sum(node_bit[n] for n in condensed.nodes[c]['members']) for c in condensed}
+
+    ancestors = {}
+    condensed_pred = condensed.pred
+    for c in topo:
+        bits = 0
+        for pred in condensed_pred[c]:
+            bits |= ancestors[pred] | member_bits[pred]
+        ancestors[c] = bits
+
+    # Gli altri nodi della stessa componente sono anch'essi dipendenti
+    return {
+        node: ancestors[mapping[node]] | (member_bits[mapping[node]] & ~node_bit[node])
+        for node in graph.nodes()
+    }
+
+
+def _bits_to_nodes(nodes: List[Any], bits: int) -> List[Any]:
+    """Converte una bitmask di _dependents_bits nella lista di nodi (ordine del grafo)."""
+    # Visita solo i bit accesi, dal meno significativo: O(dipendenti) invece di O(nodi)
+    result = []
+    while bits:
+        low = bits & -bits
+        result.append(nodes[low.bit_length() - 1])
+        bits ^= low
+    return result
+
+
+# (DAG condensato, mappa nodo -> componente, ordine topologico, dipendenti per nodo)
+_Reachability = Tuple[Any, Dict[Any, int], List[int], Dict[Any, int]]
+
+
+def _reachability(graph: Any) -> _Reachability:
+    """Condensazione e dipendenti transitivi calcolati una volta, condivisi da chain risk e SPOF."""
+    condensed, mapping, topo = _condensed_order(graph)
+    return condensed, mapping, topo, _dependents_bits(graph, condensed, mapping, topo)
+
+
 def calculate_chain_risk(
     graph: Any,
-    component_risks: Dict[str, Dict[str, Any]]
+    component_risks: Dict[str, Dict[str, Any]],
+    reachability: Optional[_Reachability] = None
 ) -> Dict[str, Dict[str, Any]]:
     """
     Calcola il rischio propagato lungo le catene di dipendenza.
@@ -159,6 +331,7 @@ def calculate_chain_risk(
     Args:
         graph: networkx.DiGraph dal build_dependency_graph
         component_risks: Dict {part_number: {score, color, risk_level, ...}}
+        reachability: Opzionale, risultato di _reachability(graph) già calcolato
 
     Returns:
         Dict {part_number: {chain_score, chain_color, chain_factors, pair_risks}}
@@ -167,88 +340,105 @@ def calculate_chain_risk(
         return {}
 
     chain_risks = {}
-
-    for node in graph.nodes():
-        node_risk = component_risks.get(node, {'score': 0, 'color': 'GREEN', 'risk_level': 'BASSO'})
-        own_score = node_risk.get('score', 0)
-
-        # Trova tutte le dipendenze (dirette e transitive)
-        try:
-            dependencies = list(nx.descendants(graph, node))
-        except nx.NetworkXError:
-            dependencies = []
-
-        # Predecessori: chi dipende da questo nodo
-        try:
-            dependents = list(nx.ancestors(graph, node))
-        except nx.NetworkXError:
-            dependents = []
-
-        # Calcola worst-case tra le dipendenze
-        dep_scores = []
+    default_risk = {'score': 0, 'color': 'GREEN', 'risk_level': 'BASSO'}
+
+    # Worst-case su dipendenze dirette e transitive: programmazione dinamica
+    # in ordine topologico inverso sul DAG delle componenti fortemente
+    # connesse, invece di un nx.descendants/nx.ancestors per nodo
+    # Score individuali letti una sola volta per nodo
+    scores = {node: component_risks.get(node, default_risk).get('score', 0) for node in graph.nodes()}
+
+    condensed, mapping, topo, dependents_bits = reachability or _reachability(graph)
+    worst_reachable = {}
+    condensed_succ = condensed.succ
+    for c in reversed(topo):
+        worst = max(scores[n] for n in condensed.nodes[c]['members'])
+        downstream = max((worst_reachable[succ] for succ in condensed_succ[c]), default=worst)
+        worst_reachable[c] = max(worst, downstream)
+
+    # Viste di adiacenza legate una volta (dict dei vicini, senza iteratori)
+    succ, pred = graph.succ, graph.pred
+    standalone_flags = _node_columns(graph)['standalone'].tolist()
+
+    pair_scores = []
+    for node, is_standalone in zip(graph.nodes(), standalone_flags):
+        own_score = scores[node]
+        # Vicini diretti materializzati una volta; i dipendenti transitivi
+        # (bitset) servono solo per il conteggio dei fattori di catena
+        direct_deps = list(succ[node])
+        direct_dependents = list(pred[node])
+        num_transitive_dependents = dependents_bits[node].bit_count()
+
+        # Worst-case tra le dipendenze dirette (massimo corrente, senza lista)
+        max_dep_score = None
         pair_risks = []
 
-        for dep_pn in graph.successors(node):  # Dipendenze dirette
-            dep_risk = component_risks.get(dep_pn, {'score': 0, 'color': 'GREEN', 'risk_level': 'BASSO'})
-            dep_score = dep_risk.get('score', 0)
-            dep_scores.append(dep_score)
+        for dep_pn in direct_deps:
+            dep_score = scores[dep_pn]
+            if max_dep_score is None or dep_score > max_dep_score:
+                max_dep_score = dep_score
 
-            # Score di coppia
+            # Score di coppia (colore assegnato dopo, in blocco)
             pair_score = max(own_score, dep_score)
+            pair_scores.append(pair_score)
             pair_risks.append({
                 'from': node,
                 'to': dep_pn,
                 'pair_score': pair_score,
-                'pair_color': 'RED' if pair_score >= 55 else 'YELLOW' if pair_score >= 30 else 'GREEN',
             })
 
         # Chain score = max tra il proprio e tutte le dipendenze
-        all_dep_scores = []
-        for dep in dependencies:
-            dr = component_risks.get(dep, {'score': 0})
-            all_dep_scores.append(dr.get('score', 0))
-
-        chain_score = max([own_score] + all_dep_scores) if all_dep_scores else own_score
+        chain_score = max(own_score, worst_reachable[mapping[node]])
 
         # Fattori di catena
         chain_factors = []
-        if dep_scores and max(dep_scores) > own_score:
-            worst_dep = max(dep_scores)
+        if max_dep_score is not None and max_dep_score > own_score:
             chain_factors.append(
                 f"Rischio ereditato da dipendenza (score catena: {chain_score} vs individuale: {own_score})"
             )
-        if len(dependents) > 0:
+        if num_transitive_dependents > 0:
             chain_factors.append(
-                f"Componente critico: {len(dependents)} altri componenti dipendono da questo"
+                f"Componente critico: {num_transitive_dependents} altri componenti dipendono da questo"
             )
 
-        # Determina colore catena
-        if chain_score >= 55:
-            chain_color = 'RED'
-            chain_level = 'ALTO'
-        elif chain_score >= 30:
-            chain_color = 'YELLOW'
-            chain_level = 'MEDIO'
-        else:
-            chain_color = 'GREEN'
-            chain_level = 'BASSO'
-
         chain_risks[node] = {
             'chain_score': chain_score,
             'own_score': own_score,
-            'chain_color': chain_color,
-            'chain_level': chain_level,
             'chain_factors': chain_factors,
             'pair_risks': pair_risks,
-            'dependencies': list(graph.successors(node)),
-            'dependents': list(graph.predecessors(node)),
-            'is_standalone': graph.nodes[node].get('standalone', True),
+            'dependencies': direct_deps,
+            'dependents': direct_dependents,
+            'is_standalone': is_standalone,
         }
 
+    # Colore/livello di catena e colore di coppia: una classificazione
+    # vettoriale per tutti i nodi e una per tutte le coppie
+    chain_idx = _color_index([risk['chain_score'] for risk in chain_risks.values()])
+    for risk, idx in zip(chain_risks.values(), chain_idx):
+        risk['chain_color'] = CHAIN_COLORS[idx]
+        risk['chain_level'] = CHAIN_LEVELS[idx]
+
+    pair_idx = iter(_color_index(pair_scores))
+    for risk in chain_risks.values():
+        for pair in risk['pair_risks']:
+            pair['pair_color'] = CHAIN_COLORS[next(pair_idx)]
+
     return chain_risks
 
 
-def find_single_points_of_failure(graph: Any) -> List[Dict[str, Any]]:
+def _spof_entry(node: Any, supplier: Any, category: Any, dependents: List[Any]) -> Dict[str, Any]:
+    """Voce della lista SPOF per un nodo e i suoi dipendenti transitivi."""
+    return {
+        'part_number': node,
+        'supplier': supplier,
+        'category': category,
+        'num_dependents': len(dependents),
+        'dependent_pns': dependents,
+        'impact': f"Blocca {len(dependents)} componenti: {', '.join(dependents)}",
+    }
+
+
+def find_single_points_of_failure(graph: Any, reachability: Optional[_Reachability] = None) -> List[Dict[str, Any]]:
     """
     Identifica i Single Points of Failure nella BOM.
 
@@ -256,6 +446,7 @@ def find_single_points_of_failure(graph: Any) -> List[Dict[str, Any]]:
 
     Args:
         graph: networkx.DiGraph
+        reachability: Opzionale, risultato di _reachability(graph) già calcolato
 
     Returns:
         Lista di SPOF ordinata per impatto (numero di componenti bloccati)
@@ -263,25 +454,16 @@ def find_single_points_of_failure(graph: Any) -> List[Dict[str, Any]]:
     if graph is None or not HAS_NETWORKX:
         return []
 
-    spofs = []
-
-    for node in graph.nodes():
-        # Quanti componenti dipendono da questo (direttamente o indirettamente)
-        try:
-            dependents = list(nx.ancestors(graph, node))
-        except nx.NetworkXError:
-            dependents = []
-
-        if len(dependents) > 0:
-            node_data = graph.nodes[node]
-            spofs.append({
-                'part_number': node,
-                'supplier': node_data.get('supplier', 'N/A'),
-                'category': node_data.get('category', 'N/A'),
-                'num_dependents': len(dependents),
-                'dependent_pns': dependents,
-                'impact': f"Blocca {len(dependents)} componenti: {', '.join(dependents)}",
-            })
+    dependents_bits = (reachability or _reachability(graph))[3]
+    nodes = list(graph.nodes())
+    table = _node_columns(graph)
+
+    # Componenti da cui dipende almeno un altro (direttamente o indirettamente)
+    spofs = [
+        _spof_entry(node, supplier, category, _bits_to_nodes(nodes, bits))
+        for (node, bits), supplier, category in zip(dependents_bits.items(), table['supplier'], table['category'])
+        if bits
+    ]
 
     # Ordina per impatto
     spofs.sort(key=lambda x: x['num_dependents'], reverse=True)
@@ -292,28 +474,45 @@ def find_single_points_of_failure(graph: Any) -> List[Dict[str, Any]]:
 # VISUALIZZAZIONE MERMAID
 # =============================================================================
 
+_MERMAID_ID_RE = re.compile(r'[^a-zA-Z0-9_]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Caratteri che rompono la sintassi Mermaid: rimossi o sostituiti in una passata
+_MERMAID_TRANS = str.maketrans({
+    '"': '', "'": '',
+    '|': ' ', ',': ' -',
+    '(': '', ')': '',
+    '[': '', ']': '',
+    '{': '', '}': '',
+    '#': '', ';': ' ',
+    '<': '', '>': '',
+})
+
+
 def _mermaid_safe_id(text: str) -> str:
     """Genera un ID sicuro per nodi Mermaid (solo alfanumerici e underscore)."""
-    import re
-    return re.sub(r'[^a-zA-Z0-9_]', '_', str(text))
+    return _MERMAID_ID_RE.sub('_', str(text))
 
 
 def _mermaid_sanitize(text: str) -> str:
     """Rimuove caratteri problematici per Mermaid: virgolette, pipe, parentesi, emoji."""
-    import re
-    # Rimuovi emoji e caratteri non-ASCII
-    text = text.encode('ascii', 'ignore').decode('ascii')
-    # Rimuovi caratteri che rompono la sintassi Mermaid
-    text = text.replace('"', '').replace("'", '')
-    text = text.replace('|', ' ').replace(',', ' -')
-    text = text.replace('(', '').replace(')', '')
-    text = text.replace('[', '').replace(']', '')
-    text = text.replace('{', '').replace('}', '')
-    text = text.replace('#', '').replace(';', ' ')
-    text = text.replace('<', '').replace('>', '')
+    # Rimuovi emoji e caratteri non-ASCII, poi i caratteri Mermaid in un'unica translate
+    text = text.encode('ascii', 'ignore').decode('ascii').translate(_MERMAID_TRANS)
     # Collassa spazi multipli
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def _mermaid_sanitize_series(texts: List[str]) -> Any:
+    """Versione vettoriale di _mermaid_sanitize su una lista di testi (pd.Series, metodi .str)."""
+    import pandas as pd
+
+    return (
+        pd.Series(texts, dtype=object)
+        .str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.translate(_MERMAID_TRANS)
+        .str.replace(_WHITESPACE_RE, ' ', regex=True)
+        .str.strip()
+    )
 
 
 def render_dependency_tree(
@@ -336,62 +535,45 @@ def render_dependency_tree(
     if len(graph.nodes()) == 0:
         return "graph TD\n    EMPTY[Nessuna dipendenza trovata]"
 
-    lines = ["graph TD"]
+    # pandas serve solo alla sanitizzazione vettoriale: import differito
+    import pandas as pd
 
-    # Definisci nodi
-    for node in graph.nodes():
-        data = graph.nodes[node]
-        supplier = str(data.get('supplier', ''))
-        category = str(data.get('category', ''))
-        standalone = data.get('standalone', True)
+    nodes = list(graph.nodes())
 
-        # ID sicuro per Mermaid (rimuovi caratteri speciali)
-        safe_id = _mermaid_safe_id(node)
+    # ID sicuri e label dei nodi: sanitizzazione vettoriale su tutte le righe
+    safe_ids = pd.Series(nodes, dtype=object).astype(str).str.replace(_MERMAID_ID_RE, '_', regex=True)
+    safe_id_by_node = dict(zip(nodes, safe_ids))
 
-        # Label: solo testo ASCII semplice, senza caratteri speciali Mermaid
+    # Label: solo testo ASCII semplice, senza caratteri speciali Mermaid
+    table = _node_columns(graph)
+    raw_labels = []
+    for node, supplier, category, standalone in zip(nodes, table['supplier'], table['category'], table['standalone']):
         label_parts = [node]
-        if supplier:
-            label_parts.append(supplier)
-        if category:
-            label_parts.append(category)
+        label_parts.extend(part for part in (str(supplier), str(category)) if part)
         if not standalone:
             label_parts.append("non standalone")
+        raw_labels.append(" - ".join(label_parts))
+    labels = _mermaid_sanitize_series(raw_labels)
 
-        label = _mermaid_sanitize(" - ".join(label_parts))
-        lines.append(f'    {safe_id}["{label}"]')
-
-    # Definisci archi
-    for source, target, data in graph.edges(data=True):
-        safe_source = _mermaid_safe_id(source)
-        safe_target = _mermaid_safe_id(target)
-        dep_text = str(data.get('dependency_text', 'dipende da'))
-
-        # Tronca testo lungo
-        if len(dep_text) > 30:
-            dep_text = dep_text[:27] + '...'
-
-        # Sanitizza: rimuovi virgole, virgolette e caratteri speciali
-        dep_text = _mermaid_sanitize(dep_text)
-
-        lines.append(f'    {safe_source} -->|{dep_text}| {safe_target}')
+    lines = ["graph TD"]
+    lines.extend(('    ' + safe_ids + '["' + labels + '"]').tolist())
+
+    # Definisci archi (testo troncato a 30 caratteri, poi sanitizzato)
+    edges = list(graph.edges(data=True))
+    if edges:
+        dep_texts = [str(data.get('dependency_text', 'dipende da')) for _, _, data in edges]
+        dep_texts = _mermaid_sanitize_series([t[:27] + '...' if len(t) > 30 else t for t in dep_texts])
+        # Righe degli archi concatenate colonna per colonna, come per i nodi
+        sources = pd.Series([safe_id_by_node[source] for source, _, _ in edges], dtype=object)
+        targets = pd.Series([safe_id_by_node[target] for _, target, _ in edges], dtype=object)
+        lines.extend(('    ' + sources + ' -->|' + dep_texts + '| ' + targets).tolist())
 
     # Colora nodi per rischio
     if component_risks:
-        red_nodes = []
-        yellow_nodes = []
-        green_nodes = []
-
-        for node in graph.nodes():
-            safe_id = _mermaid_safe_id(node)
-            risk = component_risks.get(node, {})
-            color = risk.get('color', 'GREEN')
-
-            if color == 'RED':
-                red_nodes.append(safe_id)
-            elif color == 'YELLOW':
-                yellow_nodes.append(safe_id)
-            else:
-                green_nodes.append(safe_id)
+        colors = pd.Series([component_risks.get(node, {}).get('color', 'GREEN') for node in nodes], dtype=object)
+        red_nodes = safe_ids[colors == 'RED'].tolist()
+        yellow_nodes = safe_ids[colors == 'YELLOW'].tolist()
+        green_nodes = safe_ids[(colors != 'RED') & (colors != 'YELLOW')].tolist()
 
         lines.append("")
         lines.append("    classDef red fill:#ff4444,stroke:#c92a2a,color:#fff")
@@ -406,3 +588,68 @@ def render_dependency_tree(
             lines.append(f"    class {','.join(green_nodes)} green")
 
     return "\n".join(lines)
+
+
+# =============================================================================
+# ANALISI COMPLETA (MEMOIZZATA)
+# =============================================================================
+
+# Colonne dei componenti che determinano il grafo
+GRAPH_INPUT_COLUMNS = tuple(col for col, _ in _GRAPH_FIELDS)
+
+# Analisi memorizzate nel processo (LRU): un rerun sulla stessa BOM non
+# ricostruisce grafo, catene e SPOF
+GRAPH_CACHE_SIZE = 8
+_graph_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_graph_cache_lock = threading.Lock()
+
+
+def _graph_key(components: List[Dict[str, Any]], component_risks: Dict[str, Dict[str, Any]]) -> str:
+    """Hash degli input dell'analisi: colonne del grafo e score/colore per PN."""
+    digest = hashlib.blake2b(digest_size=16)
+    for comp in components:
+        digest.update(repr(tuple(_get_safe(comp, col, '') for col in GRAPH_INPUT_COLUMNS)).encode('utf-8'))
+    digest.update(b'|')
+    for pn, risk in component_risks.items():
+        digest.update(repr((pn, risk.get('score', 0), risk.get('color', 'GREEN'))).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def analyze_dependencies(
+    components: List[Dict[str, Any]],
+    component_risks: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Grafo, chain risk, SPOF e diagramma Mermaid di una BOM, memorizzati
+    per hash degli input: finché componenti e score non cambiano il
+    risultato viene riusato. Il risultato è condiviso: va trattato in
+    sola lettura.
+
+    Args:
+        components: Lista di dizionari con dati dei componenti
+        component_risks: Dict {part_number: {score, color, ...}}
+
+    Returns:
+        Dict con graph, chain_risks, spofs, mermaid
+    """
+    key = _graph_key(components, component_risks)
+    with _graph_cache_lock:
+        if key in _graph_cache:
+            _graph_cache.move_to_end(key)
+            return _graph_cache[key]
+
+    graph = build_dependency_graph(components)
+    # Condensazione e dipendenti transitivi condivisi tra chain risk e SPOF
+    reachability = _reachability(graph) if graph is not None else None
+    analysis = {
+        'graph': graph,
+        'chain_risks': calculate_chain_risk(graph, component_risks, reachability),
+        'spofs': find_single_points_of_failure(graph, reachability),
+        'mermaid': render_dependency_tree(graph, component_risks),
+    }
+
+    with _graph_cache_lock:
+        _graph_cache[key] = analysis
+        while len(_graph_cache) > GRAPH_CACHE_SIZE:
+            _graph_cache.popitem(last=False)
+    return analysis
@@ -6,11 +6,17 @@ distinguendo la fase di fabbricazione wafer (frontend) dalla fase
 di assemblaggio e test (backend).
 
 Uso:
-    from geo_risk import calculate_geo_risk, get_technology_node_risk
+    from geo_risk import calculate_geo_risk, calculate_geo_risks, get_technology_node_risk, get_technology_node_risks
 """
 
+import re
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from risk_kernel import score_geo
 
 
 # =============================================================================
@@ -65,36 +71,209 @@ TECH_NODE_THRESHOLDS = [
      'reason': 'Nodi legacy, rischio obsolescenza a lungo termine'},
 ]
 
+# Formato comune del nodo tecnologico: numero con 'nm' opzionale
+_NM_RE = re.compile(r'\s*(\d+(?:\.\d+)?)\s*(?:nm)?\s*', re.IGNORECASE)
+
+# Limiti superiori ordinati delle soglie, per la ricerca binaria
+_TECH_NODE_BOUNDS = np.array([t['max_nm'] for t in TECH_NODE_THRESHOLDS], dtype=float)
+_TECH_NODE_LEGACY = {'score': 3, 'level': 'BASSO', 'reason': 'Nodo legacy'}
+
+# Coordinate approssimative dei principali hub produttivi (marker mappa)
+COUNTRY_COORDS = {
+    'taiwan': (23.5, 121.0),
+    'china': (31.2, 121.5),
+    'korea': (37.5, 127.0),
+    'japan': (35.7, 139.7),
+    'malaysia': (3.1, 101.7),
+    'philippines': (14.6, 121.0),
+    'singapore': (1.3, 103.8),
+    'thailand': (13.8, 100.5),
+    'vietnam': (21.0, 105.8),
+    'usa': (37.4, -122.1),
+    'germany': (48.1, 11.6),
+    'france': (45.2, 5.7),
+    'italy': (37.5, 15.1),
+    'ireland': (53.3, -6.3),
+    'israel': (32.1, 34.8),
+    'united kingdom': (51.5, -0.1),
+    'mexico': (23.6, -102.6),
+}
+
+# Paesi dei marker come categorie fisse (codice = posizione in COUNTRY_COORDS):
+# la colonna 'country' di risk_map_frame e' categorica su questo dtype
+_MAP_COUNTRY_CODES = {country: code for code, country in enumerate(COUNTRY_COORDS)}
+MAP_COUNTRY_DTYPE = pd.CategoricalDtype([country.title() for country in COUNTRY_COORDS])
+
+# Colonne dei marker della mappa (risk_map_frame / generate_risk_map_data)
+MAP_MARKER_COLUMNS = ('lat', 'lon', 'type', 'part_number', 'supplier', 'country', 'risk_score', 'risk_level', 'label')
+
+# Offset di jitter dei marker sulla mappa (circa ±50km): indice % 5 per la
+# latitudine, (indice // 5) % 5 per la longitudine
+_JITTER_OFFSETS = (np.arange(5) - 2) * 0.2
+
 FRONTEND_WEIGHT = 0.6
 BACKEND_WEIGHT = 0.4
 
 
+# Alias comuni dei nomi paese (chiavi già minuscole e senza spazi ai bordi)
+COUNTRY_ALIASES = {
+    'united states': 'usa', 'us': 'usa', 'u.s.a.': 'usa', 'united states of america': 'usa',
+    'south korea': 'korea', 'republic of korea': 'korea',
+    'people\'s republic of china': 'china', 'prc': 'china',
+    'uk': 'united kingdom', 'great britain': 'united kingdom',
+    'deutschland': 'germany', 'de': 'germany',
+}
+
+# Score, livello e motivazione per paesi non classificati
+FRONTEND_UNKNOWN_SCORE = 10
+BACKEND_UNKNOWN_SCORE = 8
+UNKNOWN_LEVEL = 'SCONOSCIUTO'
+_UNKNOWN_REASON = 'Paese non classificato: {}'
+
+# Soglie del livello composito (score >= soglia): BASSO, MEDIO, ALTO, CRITICO
+COMPOSITE_THRESHOLDS = np.array([6, 12, 20])
+COMPOSITE_LEVELS = ('BASSO', 'MEDIO', 'ALTO', 'CRITICO')
+
+# Id interi dei paesi classificati (l'id len(COUNTRY_IDS) indica un paese
+# non classificato) e tabelle score per id, una per fase
+COUNTRY_IDS = {country: i for i, country in enumerate(dict.fromkeys([*FRONTEND_RISK_SCORES, *BACKEND_RISK_SCORES]))}
+_UNKNOWN_COUNTRY_ID = len(COUNTRY_IDS)
+_FRONTEND_SCORE_TABLE = np.array(
+    [FRONTEND_RISK_SCORES.get(c, {'score': FRONTEND_UNKNOWN_SCORE})['score'] for c in COUNTRY_IDS] + [FRONTEND_UNKNOWN_SCORE],
+    dtype=np.int64,
+)
+_BACKEND_SCORE_TABLE = np.array(
+    [BACKEND_RISK_SCORES.get(c, {'score': BACKEND_UNKNOWN_SCORE})['score'] for c in COUNTRY_IDS] + [BACKEND_UNKNOWN_SCORE],
+    dtype=np.int64,
+)
+
+
 # =============================================================================
 # FUNZIONI PRINCIPALI
 # =============================================================================
 
+def _get_safe_col(rows: List[Dict[str, Any]], key: str, default: Any = '') -> pd.Series:
+    """Legge una colonna in modo sicuro: un valore per riga, mancanti/NaN/vuoti sostituiti da default."""
+    values = pd.Series([row.get(key) for row in rows], dtype=object)
+    return values.where(values.notna() & values.astype(bool), default)
+
+
+@lru_cache(maxsize=1024)
 def _normalize_country(country: str) -> str:
-    """Normalizza il nome del paese per matching."""
+    """Normalizza il nome del paese per matching (memorizzato: i paesi distinti sono pochi)."""
     if not country:
         return ''
     country = str(country).strip().lower()
-    # Alias comuni
-    aliases = {
-        'united states': 'usa', 'us': 'usa', 'u.s.a.': 'usa', 'united states of america': 'usa',
-        'south korea': 'korea', 'republic of korea': 'korea',
-        'people\'s republic of china': 'china', 'prc': 'china',
-        'uk': 'united kingdom', 'great britain': 'united kingdom',
-        'deutschland': 'germany', 'de': 'germany',
-    }
-    return aliases.get(country, country)
+    return COUNTRY_ALIASES.get(country, country)
 
 
-def _get_safe(row: Dict[str, Any], key: str, default: Any = '') -> Any:
-    """Ottiene un valore in modo sicuro."""
-    val = row.get(key, default)
-    if pd.isna(val) if isinstance(val, float) else not val:
-        return default
-    return val
+def _normalize_countries(values: List[Any]) -> np.ndarray:
+    """
+    Normalizza una colonna di nomi paese: ogni valore distinto viene
+    normalizzato una volta sola e poi espanso sulle righe (valori mancanti -> '').
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    # Il codice -1 (valore mancante) punta all'ultimo elemento: ''
+    normalized = [_normalize_country(u) for u in uniques] + ['']
+    return np.asarray(normalized, dtype=object)[codes]
+
+
+def _encode_phase(countries: np.ndarray, scores: Dict[str, Dict[str, Any]]) -> Tuple[np.ndarray, List[str], List[str]]:
+    """Id paese per il kernel, livello e motivazione di una fase (frontend/backend), un lookup per paese distinto."""
+    codes, uniques = pd.factorize(countries)
+    ids = np.array([COUNTRY_IDS.get(country, _UNKNOWN_COUNTRY_ID) for country in uniques], dtype=np.int64)
+    # Paesi non classificati: livello costante, motivazione formattata solo per loro
+    levels = np.asarray([scores[c]['level'] if c in scores else UNKNOWN_LEVEL for c in uniques], dtype=object)
+    reasons = np.asarray(
+        [scores[c]['reason'] if c in scores else _UNKNOWN_REASON.format(c) for c in uniques], dtype=object
+    )
+    return ids[codes], levels[codes].tolist(), reasons[codes].tolist()
+
+
+def calculate_geo_risks(components: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Versione vettoriale di calculate_geo_risk su tutta la BOM: normalizzazione
+    dei paesi, lookup degli score e livello composito in un'unica passata a colonne.
+
+    Args:
+        components: Lista di dizionari con i dati dei componenti
+
+    Returns:
+        Lista di dizionari (stesso formato di calculate_geo_risk), nell'ordine di input
+    """
+    if not components:
+        return []
+
+    # NaN/None sono trattati come mancanti da _normalize_countries
+    def column(key: str) -> np.ndarray:
+        return _normalize_countries([component.get(key) for component in components])
+
+    # Fallback: se frontend/backend non specificati, Plant 1 come frontend;
+    # Plant 2 come backend se disponibile, altrimenti stesso del frontend
+    frontend = column('Frontend_Country')
+    frontend = np.where(frontend != '', frontend, column('Country of Manufacturing Plant 1'))
+    backend = column('Backend_Country')
+    backend = np.where(backend != '', backend, column('Country of Manufacturing Plant 2'))
+    backend = np.where(backend != '', backend, frontend)
+
+    # Il rischio dipende solo dalla coppia (frontend, backend): calcolato una
+    # volta per coppia distinta (poche in una BOM) ed espanso sulle righe
+    pair_index = {}
+    pair_codes = [pair_index.setdefault(pair, len(pair_index)) for pair in zip(frontend.tolist(), backend.tolist())]
+    frontend = np.array([fe for fe, _ in pair_index], dtype=object)
+    backend = np.array([be for _, be in pair_index], dtype=object)
+
+    fe_ids, fe_levels, fe_reasons = _encode_phase(frontend, FRONTEND_RISK_SCORES)
+    be_ids, be_levels, be_reasons = _encode_phase(backend, BACKEND_RISK_SCORES)
+
+    # Score per fase, composito e livello (soglie sullo score non arrotondato)
+    # in un unico kernel sugli id paese
+    fe_scores, be_scores, composite, levels = score_geo(
+        fe_ids, be_ids, _FRONTEND_SCORE_TABLE, _BACKEND_SCORE_TABLE,
+        FRONTEND_WEIGHT, BACKEND_WEIGHT, COMPOSITE_THRESHOLDS,
+    )
+
+    pair_results = []
+    for (fe_country, fe_score, fe_level, fe_reason, be_country, be_score, be_level, be_reason,
+         composite_score, level_idx) in zip(
+            frontend.tolist(), fe_scores.tolist(), fe_levels, fe_reasons,
+            backend.tolist(), be_scores.tolist(), be_levels, be_reasons,
+            composite.tolist(), levels.tolist()):
+        # Costruisci fattori
+        factors = []
+        suggestions = []
+
+        if fe_score >= 10:
+            factors.append(f"FAB FRONTEND {fe_level}: {fe_country.title()} - {fe_reason}")
+            if fe_score >= 20:
+                suggestions.append("Valutare fornitori con frontend in EU/USA (CHIPS Act, European Chips Act)")
+
+        if be_score >= 8:
+            factors.append(f"ASSEMBLY BACKEND {be_level}: {be_country.title()} - {be_reason}")
+            if be_score >= 12:
+                suggestions.append("Considerare OSAT con siti in multiple regioni")
+
+        pair_results.append({
+            'frontend_country': fe_country,
+            'frontend_score': fe_score,
+            'frontend_level': fe_level,
+            'frontend_reason': fe_reason,
+            'backend_country': be_country,
+            'backend_score': be_score,
+            'backend_level': be_level,
+            'backend_reason': be_reason,
+            'composite_score': round(composite_score, 1),
+            'composite_level': COMPOSITE_LEVELS[level_idx],
+            'factors': factors,
+            'suggestions': suggestions,
+        })
+
+    # Copia per riga con liste proprie: i chiamanti possono modificarle
+    return [
+        dict(pair_results[code], factors=list(pair_results[code]['factors']),
+             suggestions=list(pair_results[code]['suggestions']))
+        for code in pair_codes
+    ]
 
 
 def calculate_geo_risk(component: Dict[str, Any]) -> Dict[str, Any]:
@@ -110,86 +289,62 @@ def calculate_geo_risk(component: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dizionario con frontend_risk, backend_risk, composite_score, factors, suggestions
     """
-    frontend_country = _normalize_country(_get_safe(component, 'Frontend_Country'))
-    backend_country = _normalize_country(_get_safe(component, 'Backend_Country'))
-
-    # Fallback: se frontend/backend non specificati, usa Plant 1 come frontend
-    if not frontend_country:
-        frontend_country = _normalize_country(
-            _get_safe(component, 'Country of Manufacturing Plant 1')
-        )
-    if not backend_country:
-        # Usa Plant 2 come backend se disponibile, altrimenti stesso del frontend
-        backend_country = _normalize_country(
-            _get_safe(component, 'Country of Manufacturing Plant 2', '')
-        )
-        if not backend_country:
-            backend_country = frontend_country
-
-    # Calcola frontend risk
-    frontend_info = FRONTEND_RISK_SCORES.get(frontend_country, {
-        'score': 10, 'level': 'SCONOSCIUTO', 'reason': f'Paese non classificato: {frontend_country}'
-    })
+    return calculate_geo_risks([component])[0]
 
-    # Calcola backend risk
-    backend_info = BACKEND_RISK_SCORES.get(backend_country, {
-        'score': 8, 'level': 'SCONOSCIUTO', 'reason': f'Paese non classificato: {backend_country}'
-    })
 
-    # Score composito
-    composite_score = (
-        frontend_info['score'] * FRONTEND_WEIGHT +
-        backend_info['score'] * BACKEND_WEIGHT
-    )
+def _parse_tech_node(tech_node: Any) -> Optional[float]:
+    """Nodo tecnologico in nm ("28nm", "28", 28, "7 nm"), None se il formato non è riconosciuto."""
+    tech_str = str(tech_node)
+    # Caso comune (numero con 'nm' opzionale): una sola regex, senza eccezioni
+    match = _NM_RE.fullmatch(tech_str)
+    if match:
+        return float(match.group(1))
+    # Altri formati accettati da float() dopo la rimozione di 'nm' e spazi
+    try:
+        return float(tech_str.lower().replace('nm', '').replace(' ', ''))
+    except ValueError:
+        return None
 
-    # Costruisci fattori
-    factors = []
-    suggestions = []
-
-    if frontend_info['score'] >= 20:
-        factors.append(
-            f"FAB FRONTEND {frontend_info['level']}: {frontend_country.title()} - {frontend_info['reason']}"
-        )
-        suggestions.append("Valutare fornitori con frontend in EU/USA (CHIPS Act, European Chips Act)")
-    elif frontend_info['score'] >= 10:
-        factors.append(
-            f"FAB FRONTEND {frontend_info['level']}: {frontend_country.title()} - {frontend_info['reason']}"
-        )
-
-    if backend_info['score'] >= 12:
-        factors.append(
-            f"ASSEMBLY BACKEND {backend_info['level']}: {backend_country.title()} - {backend_info['reason']}"
-        )
-        suggestions.append("Considerare OSAT con siti in multiple regioni")
-    elif backend_info['score'] >= 8:
-        factors.append(
-            f"ASSEMBLY BACKEND {backend_info['level']}: {backend_country.title()} - {backend_info['reason']}"
-        )
-
-    # Determina livello composito
-    if composite_score >= 20:
-        level = 'CRITICO'
-    elif composite_score >= 12:
-        level = 'ALTO'
-    elif composite_score >= 6:
-        level = 'MEDIO'
-    else:
-        level = 'BASSO'
-
-    return {
-        'frontend_country': frontend_country,
-        'frontend_score': frontend_info['score'],
-        'frontend_level': frontend_info['level'],
-        'frontend_reason': frontend_info['reason'],
-        'backend_country': backend_country,
-        'backend_score': backend_info['score'],
-        'backend_level': backend_info['level'],
-        'backend_reason': backend_info['reason'],
-        'composite_score': round(composite_score, 1),
-        'composite_level': level,
-        'factors': factors,
-        'suggestions': suggestions,
-    }
+
+def get_technology_node_risks(tech_nodes: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Versione batch di get_technology_node_risk: i nodi validi vengono
+    classificati con un'unica np.searchsorted sulle soglie max_nm.
+
+    Args:
+        tech_nodes: Nodi tecnologici (es. ["28nm", 180, None, "7"])
+
+    Returns:
+        Lista di dizionari con score, level, reason, nm (ordine di input)
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tech_nodes)
+    positions = []
+    nm_values = []
+
+    for i, tech_node in enumerate(tech_nodes):
+        if not tech_node or (isinstance(tech_node, float) and pd.isna(tech_node)):
+            results[i] = {'score': 0, 'level': 'N/A', 'reason': 'Technology node non specificato', 'nm': None}
+            continue
+
+        nm_value = _parse_tech_node(tech_node)
+        if nm_value is None:
+            results[i] = {'score': 0, 'level': 'N/A', 'reason': f'Formato non riconosciuto: {tech_node}', 'nm': None}
+            continue
+        positions.append(i)
+        nm_values.append(nm_value)
+
+    # Prima soglia con nm <= max_nm; NaN cade oltre l'ultima (nodo legacy)
+    threshold_idx = np.searchsorted(_TECH_NODE_BOUNDS, np.asarray(nm_values, dtype=float), side='left')
+    for i, nm_value, idx in zip(positions, nm_values, threshold_idx.tolist()):
+        threshold = TECH_NODE_THRESHOLDS[idx] if idx < len(TECH_NODE_THRESHOLDS) else _TECH_NODE_LEGACY
+        results[i] = {
+            'score': threshold['score'],
+            'level': threshold['level'],
+            'reason': threshold['reason'],
+            'nm': nm_value,
+        }
+
+    return results
 
 
 def get_technology_node_risk(tech_node: Any) -> Dict[str, Any]:
@@ -202,26 +357,63 @@ def get_technology_node_risk(tech_node: Any) -> Dict[str, Any]:
     Returns:
         Dizionario con score, level, reason
     """
-    if not tech_node or (isinstance(tech_node, float) and pd.isna(tech_node)):
-        return {'score': 0, 'level': 'N/A', 'reason': 'Technology node non specificato', 'nm': None}
+    return get_technology_node_risks([tech_node])[0]
 
-    # Parsing: accetta "28nm", "28", 28, "7nm", etc.
-    tech_str = str(tech_node).lower().replace('nm', '').replace(' ', '')
-    try:
-        nm_value = float(tech_str)
-    except ValueError:
-        return {'score': 0, 'level': 'N/A', 'reason': f'Formato non riconosciuto: {tech_node}', 'nm': None}
 
-    for threshold in TECH_NODE_THRESHOLDS:
-        if nm_value <= threshold['max_nm']:
-            return {
-                'score': threshold['score'],
-                'level': threshold['level'],
-                'reason': threshold['reason'],
-                'nm': nm_value,
-            }
+def _country_coords(country: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Coordinate di un paese gia' normalizzato (minuscolo, alias risolti)."""
+    return COUNTRY_COORDS.get(country) if country else None
+
+
+def risk_map_frame(components: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Marker della mappa in forma colonnare (una riga per marker): coordinate
+    e campi di visualizzazione restano colonne, senza un dict per marker.
+
+    Args:
+        components: Lista di componenti con dati geo
 
-    return {'score': 3, 'level': 'BASSO', 'reason': 'Nodo legacy', 'nm': nm_value}
+    Returns:
+        DataFrame con le colonne MAP_MARKER_COLUMNS, nell'ordine componente -> frontend, backend
+        ('country' categorica su MAP_COUNTRY_DTYPE)
+    """
+    # Indice progressivo per (tipo, paese) usato dal jitter (backend
+    # spostato di +100 per separarlo dal frontend)
+    counts = {}
+    jitter_idx = []
+    base_coords = []
+    columns = {name: [] for name in ('type', 'part_number', 'supplier', 'country', 'risk_score', 'risk_level', 'label')}
+    pns = _get_safe_col(components, 'Part Number', 'N/A').tolist()
+    suppliers = _get_safe_col(components, 'Supplier Name', 'N/A').tolist()
+    for pn, supplier, geo in zip(pns, suppliers, calculate_geo_risks(components)):
+        for marker_type, prefix, shift in (('frontend', 'FAB', 0), ('backend', 'OSAT', 100)):
+            country = geo[f'{marker_type}_country']
+            coords = _country_coords(country)
+            if coords:
+                key = (marker_type, country)
+                idx = counts.get(key, 0)
+                counts[key] = idx + 1
+                jitter_idx.append(idx + shift)
+                base_coords.append(coords)
+                columns['type'].append(marker_type)
+                columns['part_number'].append(pn)
+                columns['supplier'].append(supplier)
+                columns['country'].append(_MAP_COUNTRY_CODES[country])
+                columns['risk_score'].append(geo[f'{marker_type}_score'])
+                columns['risk_level'].append(geo[f'{marker_type}_level'])
+                columns['label'].append(f"{prefix}: {pn} ({supplier})")
+
+    # Jitter per evitare sovrapposizione dei marker, calcolato su tutti i marker insieme
+    idx = np.array(jitter_idx, dtype=np.int64)
+    base = np.array(base_coords, dtype=float).reshape(-1, 2)
+    frame = pd.DataFrame({
+        'lat': base[:, 0] + _JITTER_OFFSETS[idx % 5],
+        'lon': base[:, 1] + _JITTER_OFFSETS[(idx // 5) % 5],
+        **{name: pd.Series(values, dtype=object) for name, values in columns.items() if name != 'country'},
+        'country': pd.Categorical.from_codes(np.array(columns['country'], dtype=np.int8), dtype=MAP_COUNTRY_DTYPE),
+    })
+    frame['risk_score'] = frame['risk_score'].astype(np.int64)
+    return frame[list(MAP_MARKER_COLUMNS)]
 
 
 def generate_risk_map_data(components: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -234,89 +426,6 @@ def generate_risk_map_data(components: List[Dict[str, Any]]) -> List[Dict[str, A
     Returns:
         Lista di marker con coordinate, tipo (frontend/backend), rischio
     """
-    # Coordinate approssimative dei principali hub produttivi
-    COUNTRY_COORDS = {
-        'taiwan': (23.5, 121.0),
-        'china': (31.2, 121.5),
-        'korea': (37.5, 127.0),
-        'japan': (35.7, 139.7),
-        'malaysia': (3.1, 101.7),
-        'philippines': (14.6, 121.0),
-        'singapore': (1.3, 103.8),
-        'thailand': (13.8, 100.5),
-        'vietnam': (21.0, 105.8),
-        'usa': (37.4, -122.1),
-        'germany': (48.1, 11.6),
-        'france': (45.2, 5.7),
-        'italy': (37.5, 15.1),
-        'ireland': (53.3, -6.3),
-        'israel': (32.1, 34.8),
-        'united kingdom': (51.5, -0.1),
-        'mexico': (23.6, -102.6),
-    }
-
-    import random
-
-    def get_coords(country: str | None) -> tuple | None:
-        """Helper per lookup case-insensitive delle coordinate."""
-        if not country:
-            return None
-        return COUNTRY_COORDS.get(country.lower())
-
-    # Aggiunge un piccolo jitter per evitare sovrapposizione dei marker
-    def jitter_coords(lat: float, lon: float, index: int) -> tuple:
-        """Sposta leggermente le coordinate in base all'indice."""
-        # Jitter di circa ±0.5 gradi (circa 50km)
-        lat_offset = (index % 5 - 2) * 0.2
-        lon_offset = ((index // 5) % 5 - 2) * 0.2
-        return (lat + lat_offset, lon + lon_offset)
-
-    markers = []
-    frontend_count = {}  # Contatore per jitter frontend per paese
-    backend_count = {}   # Contatore per jitter backend per paese
-
-    for comp in components:
-        pn = _get_safe(comp, 'Part Number', 'N/A')
-        supplier = _get_safe(comp, 'Supplier Name', 'N/A')
-
-        geo = calculate_geo_risk(comp)
-
-        # Frontend marker
-        frontend_country = geo['frontend_country'].lower() if geo['frontend_country'] else ''
-        frontend_coords = get_coords(geo['frontend_country'])
-        if frontend_coords:
-            idx = frontend_count.get(frontend_country, 0)
-            frontend_count[frontend_country] = idx + 1
-            lat_jit, lon_jit = jitter_coords(frontend_coords[0], frontend_coords[1], idx)
-            markers.append({
-                'lat': lat_jit,
-                'lon': lon_jit,
-                'type': 'frontend',
-                'part_number': pn,
-                'supplier': supplier,
-                'country': geo['frontend_country'].title(),
-                'risk_score': geo['frontend_score'],
-                'risk_level': geo['frontend_level'],
-                'label': f"FAB: {pn} ({supplier})",
-            })
-
-        # Backend marker
-        backend_country = geo['backend_country'].lower() if geo['backend_country'] else ''
-        backend_coords = get_coords(geo['backend_country'])
-        if backend_coords:
-            idx = backend_count.get(backend_country, 0)
-            backend_count[backend_country] = idx + 1
-            lat_jit, lon_jit = jitter_coords(backend_coords[0], backend_coords[1], idx + 100)  # +100 per separare da frontend
-            markers.append({
-                'lat': lat_jit,
-                'lon': lon_jit,
-                'type': 'backend',
-                'part_number': pn,
-                'supplier': supplier,
-                'country': geo['backend_country'].title(),
-                'risk_score': geo['backend_score'],
-                'risk_level': geo['backend_level'],
-                'label': f"OSAT: {pn} ({supplier})",
-            })
-
-    return markers
+    frame = risk_map_frame(components)
+    columns = [frame[name].tolist() for name in MAP_MARKER_COLUMNS]
+    return [dict(zip(MAP_MARKER_COLUMNS, values)) for values in zip(*columns)]
@@ -8,8 +8,61 @@ import pandas as pd
 from datetime import datetime
 from io import BytesIO
 
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+    HAS_REPORTLAB = True
+except ImportError:
+    HAS_REPORTLAB = False
+
+
+# Colore del testo nella colonna Rischio della tabella componenti
+RISK_TEXT_COLORS = {
+    'ALTO': '#d32f2f',
+    'MEDIO': '#f57c00',
+    'BASSO': '#388e3c',
+}
+
+# Stili di paragrafo costruiti una volta al caricamento del modulo
+if HAS_REPORTLAB:
+    _SAMPLE_STYLES = getSampleStyleSheet()
+    NORMAL_STYLE = _SAMPLE_STYLES['Normal']
+
+    TITLE_STYLE = ParagraphStyle(
+        'CustomTitle',
+        parent=_SAMPLE_STYLES['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#1976D2'),
+        alignment=TA_CENTER,
+        spaceAfter=10
+    )
 
-def generate_pdf_report(batch_results, client_id, run_rate):
+    SUBTITLE_STYLE = ParagraphStyle(
+        'CustomSubtitle',
+        parent=NORMAL_STYLE,
+        fontSize=10,
+        textColor=colors.grey,
+        alignment=TA_CENTER,
+        spaceAfter=20
+    )
+
+    HEADER_STYLE = ParagraphStyle(
+        'SectionHeader',
+        parent=_SAMPLE_STYLES['Heading2'],
+        fontSize=12,
+        textColor=colors.HexColor('#1976D2'),
+        spaceBefore=10,
+        spaceAfter=8
+    )
+
+    FOOTER_STYLE = ParagraphStyle('Footer', parent=NORMAL_STYLE, fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
+
+
+def generate_pdf_report(batch_results, client_id, run_rate, generated_at=None):
     """
     Genera un report PDF completo con tutti i dati dell'analisi.
 
@@ -17,21 +70,12 @@ def generate_pdf_report(batch_results, client_id, run_rate):
         batch_results: Risultati dell'analisi batch
         client_id: ID del cliente
         run_rate: Run rate utilizzato
+        generated_at: Data di generazione stampata nel report (default: adesso)
 
     Returns:
         BytesIO: Buffer contenente il PDF generato
     """
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.platypus import KeepTogether
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-    except ImportError:
+    if not HAS_REPORTLAB:
         st.error("Libreria reportlab non installata. Esegui: pip install reportlab")
         return None
 
@@ -51,45 +95,14 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     # Elementi del documento
     elements = []
 
-    # Stili
-    styles = getSampleStyleSheet()
-
-    # Stili personalizzati
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1976D2'),
-        alignment=TA_CENTER,
-        spaceAfter=10
-    )
-
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.grey,
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-
-    header_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#1976D2'),
-        spaceBefore=10,
-        spaceAfter=8
-    )
-
     # ============================================================================
     # HEADER
     # ============================================================================
-    elements.append(Paragraph("REPORT RISCHIO SUPPLY CHAIN", title_style))
-    elements.append(Paragraph("Analisi deterministica con dipendenze e costi di switching", subtitle_style))
+    elements.append(Paragraph("REPORT RISCHIO SUPPLY CHAIN", TITLE_STYLE))
+    elements.append(Paragraph("Analisi deterministica con dipendenze e costi di switching", SUBTITLE_STYLE))
 
     # Info meta
-    report_date = datetime.now().strftime("%d/%m/%Y %H:%M")
+    report_date = (generated_at or datetime.now()).strftime("%d/%m/%Y %H:%M")
     meta_data = [
         ["Cliente:", client_id, "Data:", report_date],
         ["Run Rate:", f"{run_rate:,} PCB/settimana", "Componenti:", f"{len(components_risk)}"]
@@ -106,15 +119,82 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     elements.append(meta_table)
     elements.append(Spacer(1, 0.5*cm))
 
+    # ============================================================================
+    # AGGREGAZIONE (un solo passaggio sui componenti)
+    # ============================================================================
+    # Conteggi KPI e righe delle tabelle di dettaglio raccolti insieme
+    risk_counts = {'ALTO': 0, 'MEDIO': 0, 'BASSO': 0}
+    sw_counts = {'CRITICO': 0, 'COMPLESSO': 0, 'MODERATO': 0, 'TRIVIALE': 0}
+    spof_count = 0
+
+    # Comandi di stile per riga della colonna Rischio (applicati in un'unica TableStyle),
+    # con un solo oggetto colore per livello condiviso da tutte le righe
+    risk_style_cmds = []
+    risk_text_colors = {level: colors.HexColor(hex_color) for level, hex_color in RISK_TEXT_COLORS.items()}
+
+    # Header tabelle
+    table_data = [["PN", "Fornitore", "Categoria", "Score", "Rischio", "Switching", "SPOF"]]
+    sw_table_data = [["Part Number", "OS", "SW (KB)", "Porting (h)", "Qualifica (h)", "Cert.", "Totale (h)"]]
+
+    for comp in components_risk:
+        part_number = comp.get('part_number', 'N/A')
+        risk_level = comp.get('risk_level', 'N/A')
+        score = comp.get('overall_score', 0)
+        is_spof = comp.get('is_spof', False)
+
+        # Campi di switching estratti una volta e riusati da conteggi e tabelle
+        sw = comp.get('switching_cost') or {}
+        sw_class, os_type, sw_size_kb, porting_hours, qualification_hours, cert_multiplier, total_hours = (
+            sw.get('classification', 'N/A'),
+            sw.get('os_type', 'N/A'),
+            sw.get('sw_size_kb', 0),
+            sw.get('sw_porting_hours', 0),
+            sw.get('qualification_hours', 0),
+            sw.get('certification_multiplier', 1.0),
+            sw.get('total_switching_hours', 0),
+        )
+
+        if risk_level in risk_counts:
+            risk_counts[risk_level] += 1
+        if sw_class in sw_counts:
+            sw_counts[sw_class] += 1
+        if is_spof:
+            spof_count += 1
+
+        # Testo rischio: ALTO/MEDIO, altrimenti BASSO
+        risk_text = risk_level if risk_level in ('ALTO', 'MEDIO') else 'BASSO'
+        row = len(table_data)
+        risk_style_cmds.append(('TEXTCOLOR', (4, row), (4, row), risk_text_colors[risk_text]))
+        if risk_text == 'ALTO':
+            risk_style_cmds.append(('FONTNAME', (4, row), (4, row), 'Helvetica-Bold'))
+
+        table_data.append([
+            part_number[:15],  # Tronca per spazio
+            comp.get('supplier', 'N/A')[:15],
+            comp.get('category', 'N/A')[:12],
+            f"{score:.0f}",
+            risk_text,
+            sw_class,
+            'Sì' if is_spof else 'No'
+        ])
+        sw_table_data.append([
+            part_number[:20],
+            os_type[:8],
+            f"{sw_size_kb:.0f}",
+            f"{porting_hours:.0f}",
+            f"{qualification_hours:.0f}",
+            f"{cert_multiplier:.1f}x",
+            f"{total_hours:.0f}"
+        ])
+
     # ============================================================================
     # KPI RISCHIO
     # ============================================================================
-    elements.append(Paragraph("1. PANORAMICA RISCHIO", header_style))
+    elements.append(Paragraph("1. PANORAMICA RISCHIO", HEADER_STYLE))
 
-    high_risk = sum(1 for c in components_risk if c.get('risk_level') == 'ALTO')
-    medium_risk = sum(1 for c in components_risk if c.get('risk_level') == 'MEDIO')
-    low_risk = sum(1 for c in components_risk if c.get('risk_level') == 'BASSO')
-    spof_count = sum(1 for c in components_risk if c.get('is_spof', False))
+    high_risk = risk_counts['ALTO']
+    medium_risk = risk_counts['MEDIO']
+    low_risk = risk_counts['BASSO']
 
     kpi_data = [
         ["Rischio Alto", f"{high_risk}", "Rischio Medio", f"{medium_risk}"],
@@ -148,12 +228,12 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     # ============================================================================
     # KPI SWITCHING
     # ============================================================================
-    elements.append(Paragraph("2. COSTI DI SWITCHING", header_style))
+    elements.append(Paragraph("2. COSTI DI SWITCHING", HEADER_STYLE))
 
-    critical_sw = sum(1 for c in components_risk if c.get('switching_cost', {}).get('classification') == 'CRITICO')
-    complex_sw = sum(1 for c in components_risk if c.get('switching_cost', {}).get('classification') == 'COMPLESSO')
-    moderate_sw = sum(1 for c in components_risk if c.get('switching_cost', {}).get('classification') == 'MODERATO')
-    trivial_sw = sum(1 for c in components_risk if c.get('switching_cost', {}).get('classification') == 'TRIVIALE')
+    critical_sw = sw_counts['CRITICO']
+    complex_sw = sw_counts['COMPLESSO']
+    moderate_sw = sw_counts['MODERATO']
+    trivial_sw = sw_counts['TRIVIALE']
 
     sw_data = [
         ["Critico", f"{critical_sw}", "Complesso", f"{complex_sw}"],
@@ -183,7 +263,7 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     # ============================================================================
     # BOM RISK SUMMARY
     # ============================================================================
-    elements.append(Paragraph("3. RISCHIO COMPLESSIVO BOM", header_style))
+    elements.append(Paragraph("3. RISCHIO COMPLESSIVO BOM", HEADER_STYLE))
 
     overall_score = bom_risk.get('overall_score', 0)
     risk_level = bom_risk.get('risk_level', 'N/A')
@@ -221,44 +301,10 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     # ============================================================================
     # TABELLA COMPONENTI
     # ============================================================================
-    elements.append(Paragraph("4. DETTAGLIO COMPONENTI", header_style))
-
-    # Header tabella
-    table_data = [["PN", "Fornitore", "Categoria", "Score", "Rischio", "Switching", "SPOF"]]
-
-    for comp in components_risk:
-        risk_level = comp.get('risk_level', 'N/A')
-        score = comp.get('overall_score', 0)
-        sw = comp.get('switching_cost', {})
-        sw_class = sw.get('classification', 'N/A')
-        is_spof = 'Sì' if comp.get('is_spof', False) else 'No'
-
-        # Colore sfondo in base al rischio
-        if risk_level == 'ALTO':
-            row_color = colors.HexColor('#ffebee')
-            risk_text = 'ALTO'
-            risk_text_color = colors.HexColor('#d32f2f')
-        elif risk_level == 'MEDIO':
-            row_color = colors.HexColor('#fff3e0')
-            risk_text = 'MEDIO'
-            risk_text_color = colors.HexColor('#f57c00')
-        else:
-            row_color = colors.HexColor('#e8f5e9')
-            risk_text = 'BASSO'
-            risk_text_color = colors.HexColor('#388e3c')
-
-        table_data.append([
-            comp.get('part_number', 'N/A')[:15],  # Tronca per spazio
-            comp.get('supplier', 'N/A')[:15],
-            comp.get('category', 'N/A')[:12],
-            f"{score:.0f}",
-            risk_text,
-            sw_class,
-            is_spof
-        ])
+    elements.append(Paragraph("4. DETTAGLIO COMPONENTI", HEADER_STYLE))
 
-    # Crea tabella
-    comp_table = Table(table_data, colWidths=[3.5*cm, 3.5*cm, 3*cm, 1.5*cm, 2*cm, 2.5*cm, 1.5*cm],
+    # Crea tabella (LongTable: layout ottimizzato per tabelle su più pagine)
+    comp_table = LongTable(table_data, colWidths=[3.5*cm, 3.5*cm, 3*cm, 1.5*cm, 2*cm, 2.5*cm, 1.5*cm],
                       repeatRows=1)  # Ripete header su ogni pagina
 
     # Stili tabella
@@ -274,24 +320,10 @@ def generate_pdf_report(batch_results, client_id, run_rate):
         ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
         ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
         ('CELLPADDING', (0, 0), (-1, -1), 4),
+        # Colora le righe in base al rischio
+        *risk_style_cmds,
     ]))
 
-    # Colora le righe in base al rischio
-    for i, row in enumerate(table_data[1:], start=1):
-        if row[4] == 'ALTO':
-            comp_table.setStyle(TableStyle([
-                ('TEXTCOLOR', (4, i), (4, i), colors.HexColor('#d32f2f')),
-                ('FONTNAME', (4, i), (4, i), 'Helvetica-Bold'),
-            ]))
-        elif row[4] == 'MEDIO':
-            comp_table.setStyle(TableStyle([
-                ('TEXTCOLOR', (4, i), (4, i), colors.HexColor('#f57c00')),
-            ]))
-        else:
-            comp_table.setStyle(TableStyle([
-                ('TEXTCOLOR', (4, i), (4, i), colors.HexColor('#388e3c')),
-            ]))
-
     elements.append(comp_table)
     elements.append(Spacer(1, 0.3*cm))
 
@@ -299,23 +331,9 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     # TABELLA COSTI SWITCHING
     # ============================================================================
     elements.append(PageBreak())
-    elements.append(Paragraph("5. DETTAGLIO COSTI DI SWITCHING", header_style))
+    elements.append(Paragraph("5. DETTAGLIO COSTI DI SWITCHING", HEADER_STYLE))
 
-    sw_table_data = [["Part Number", "OS", "SW (KB)", "Porting (h)", "Qualifica (h)", "Cert.", "Totale (h)"]]
-
-    for comp in components_risk:
-        sw = comp.get('switching_cost', {})
-        sw_table_data.append([
-            comp.get('part_number', 'N/A')[:20],
-            sw.get('os_type', 'N/A')[:8],
-            f"{sw.get('sw_size_kb', 0):.0f}",
-            f"{sw.get('sw_porting_hours', 0):.0f}",
-            f"{sw.get('qualification_hours', 0):.0f}",
-            f"{sw.get('certification_multiplier', 1.0):.1f}x",
-            f"{sw.get('total_switching_hours', 0):.0f}"
-        ])
-
-    sw_detail_table = Table(sw_table_data, colWidths=[4*cm, 2*cm, 1.5*cm, 2*cm, 2*cm, 1.5*cm, 2*cm], repeatRows=1)
+    sw_detail_table = LongTable(sw_table_data, colWidths=[4*cm, 2*cm, 1.5*cm, 2*cm, 2*cm, 1.5*cm, 2*cm], repeatRows=1)
     sw_detail_table.setStyle(TableStyle([
         ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
         ('FONTSIZE', (0, 0), (-1, -1), 8),
@@ -336,9 +354,9 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     # ============================================================================
     if not_found:
         elements.append(Spacer(1, 0.5*cm))
-        elements.append(Paragraph("6. COMPONENTI NON TROVATI", header_style))
+        elements.append(Paragraph("6. COMPONENTI NON TROVATI", HEADER_STYLE))
         elements.append(Paragraph(f"I seguenti part number non sono presenti nel database: {', '.join(not_found)}",
-                                 styles['Normal']))
+                                 NORMAL_STYLE))
 
     # ============================================================================
     # FOOTER
@@ -347,7 +365,7 @@ def generate_pdf_report(batch_results, client_id, run_rate):
     footer_text = Paragraph(
         f"Report generato da Supply Chain Resilience Platform v3.0 - {report_date}<br/>"
         "Documento confidenziale - Uso interno solamente",
-        ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
+        FOOTER_STYLE
     )
     elements.append(footer_text)
 
@@ -373,22 +391,34 @@ def show_export_button(batch_results, client_id, run_rate, key=None):
         st.info("Esegui prima un'analisi multipla per esportare il report.")
         return
 
-    # Genera PDF
-    pdf_buffer = generate_pdf_report(batch_results, client_id, run_rate)
+    # Usa key specificata o generane una univoca
+    button_key = key or f"pdf_export_{client_id}_{id(batch_results)}"
+    state_key = f"{button_key}_pdf"
 
-    if pdf_buffer is None:
-        return
+    # Il PDF si genera solo su richiesta: i rerun senza click non lo costruiscono.
+    # Il riferimento al batch tenuto in sessione invalida il PDF se l'analisi cambia.
+    generated = st.session_state.get(state_key)
+    if generated is None or generated['batch'] is not batch_results or generated['params'] != (client_id, run_rate):
+        if not st.button("📄 Genera Report PDF", key=f"{button_key}_gen", use_container_width=True):
+            return
 
-    # Crea download button
-    pdf_data = pdf_buffer.getvalue()
-    filename = f"report_rischio_{client_id}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+        generated_at = datetime.now().replace(second=0, microsecond=0)
+        pdf_buffer = generate_pdf_report(batch_results, client_id, run_rate, generated_at)
 
-    # Usa key specificata o generane una univoca
-    button_key = key or f"pdf_export_{client_id}_{id(pdf_data)}"
+        if pdf_buffer is None:
+            return
+        pdf_data = pdf_buffer.getvalue()
+
+        generated = {'batch': batch_results, 'params': (client_id, run_rate),
+                     'data': pdf_data, 'generated_at': generated_at}
+        st.session_state[state_key] = generated
+
+    # Crea download button (nome file con lo stesso orario stampato nel report)
+    filename = f"report_rischio_{client_id}_{generated['generated_at'].strftime('%Y%m%d_%H%M')}.pdf"
 
     st.download_button(
         label="📄 Scarica Report PDF",
-        data=pdf_data,
+        data=generated['data'],
         file_name=filename,
         mime="application/pdf",
         use_container_width=True,
@@ -16,12 +16,28 @@ Uso:
     data = db.lookup_part_number('STM32F103C8T6', client_id='CLIENTE_001')
 """
 
+import threading
+import functools
 import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import shutil
 
+# Lettore xlsx in Rust usato da pandas con engine='calamine'
+try:
+    import python_calamine
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# Writer xlsx piu' veloce di openpyxl per le riscritture complete del workbook
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
 
 # =============================================================================
 # CONFIGURAZIONE
@@ -29,6 +45,12 @@ import shutil
 
 DEFAULT_DB_NAME = 'part_numbers_db.xlsx'
 
+# Motore di lettura dei fogli: calamine (Rust) se disponibile; le scritture restano su openpyxl
+READ_ENGINE = 'calamine' if HAS_CALAMINE else 'openpyxl'
+
+# Motore di scrittura del workbook (riscritto per intero a ogni salvataggio)
+WRITE_ENGINE = 'xlsxwriter' if HAS_XLSXWRITER else 'openpyxl'
+
 # Nomi dei fogli Excel
 SHEET_PART_NUMBERS = 'Part_Numbers'
 SHEET_CLIENT_DATA = 'Client_Data'
@@ -124,11 +146,54 @@ COMPONENT_MATERIALS_COLUMNS = [
     'Created_at',
 ]
 
+# Colonne numeriche convertite una sola volta al caricamento per il lookup:
+# i valori non numerici diventano NaN (trattati come mancanti dal risk engine)
+NUMERIC_COLUMNS = [
+    'Supplier Lead Time (weeks)',
+    'Weeks to qualify',
+    'Unit Price ($)',
+    'SW_Code_Size_KB',
+    'Number_of_Alternative_Sources',
+    'MTBF_Hours',
+    'Last_Price_Increase_Pct',
+    'How Many Device of this specific PN are in the BOM?',
+    'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units',
+    'Custom Supplier Lead Time (weeks)',
+]
+
+# Colonne chiave confrontate in maiuscolo (normalizzate una volta per versione del file)
+KEY_COLUMNS = ['Part Number', 'Client_ID', 'Part_Number', 'Material_Key']
+
+# Dati cliente che sovrascrivono quelli globali: {colonna ClientData: colonna PartNumbers}
+CLIENT_OVERRIDE_COLUMNS = {
+    'How Many Device of this specific PN are in the BOM?': 'How Many Device of this specific PN are in the BOM?',
+    'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units':
+        'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units',
+    'Custom Supplier Lead Time (weeks)': 'Supplier Lead Time (weeks)',
+}
+
+# Campi dei dati in ingresso salvati in Client_Data invece che in Part_Numbers
+CLIENT_SPECIFIC_FIELDS = [
+    'How Many Device of this specific PN are in the BOM?',
+    'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units',
+    'Custom Supplier Lead Time (weeks)',
+    'Notes',
+]
+
 
 # =============================================================================
 # CLASSE PRINCIPALE
 # =============================================================================
 
+def _locked(method):
+    """Esegue il metodo tenendo il lock dell'istanza (cache dei fogli e salvataggi)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class PartNumberDatabase:
     """
     Gestore del database Excel dei Part Numbers.
@@ -145,6 +210,16 @@ class PartNumberDatabase:
             db_path: Percorso del file Excel. Se None, usa il default.
         """
         self.db_path = Path(db_path) if db_path else Path(DEFAULT_DB_NAME)
+        # Fogli gia' letti (nome foglio -> DataFrame) e mtime_ns del file alla lettura
+        self._sheet_cache: Dict[str, pd.DataFrame] = {}
+        self._sheet_cache_mtime: Optional[int] = None
+        # Colonne chiave in maiuscolo per la stessa versione: foglio -> {colonna: Series}
+        self._key_cache: Dict[str, Dict[str, pd.Series]] = {}
+        # Fogli di lookup indicizzati: nome foglio -> (mtime_ns, DataFrame, indice chiave -> riga)
+        self._lookup_cache: Dict[str, Tuple[int, pd.DataFrame, Dict[Any, int]]] = {}
+        # L'istanza e' condivisa tra sessioni e thread di scoring: cache e
+        # cicli leggi-modifica-salva passano da questo lock (rientrante)
+        self._lock = threading.RLock()
         self._ensure_database_exists()
 
     # -------------------------------------------------------------------------
@@ -180,22 +255,124 @@ class PartNumberDatabase:
                 writer, sheet_name=SHEET_COMPONENT_MATERIALS, index=False
             )
 
+    @_locked
+    def _load_all_sheets(self) -> Dict[str, pd.DataFrame]:
+        """
+        Tutti i fogli del database, nell'ordine del workbook.
+
+        I fogli restano in memoria finche' il file non cambia (mtime); a ogni
+        nuova versione il workbook viene aperto una sola volta e tutti i fogli
+        vengono letti insieme. I DataFrame restituiti sono condivisi: vanno
+        solo letti. Gli errori di lettura vengono propagati.
+        """
+        mtime = self.db_path.stat().st_mtime_ns
+        if mtime != self._sheet_cache_mtime:
+            frames = pd.read_excel(self.db_path, sheet_name=None, engine=READ_ENGINE)
+            # Rimuovi righe completamente vuote
+            self._sheet_cache = {name: frame.dropna(how='all') for name, frame in frames.items()}
+            self._sheet_cache_mtime = mtime
+            self._key_cache = {}
+        return self._sheet_cache
+
     def _load_sheet(self, sheet_name: str) -> pd.DataFrame:
-        """Carica un foglio dal database."""
+        """
+        Carica un foglio dal database.
+
+        Viene restituita una copia del foglio in memoria, quindi i chiamanti
+        possono modificarla.
+        """
         try:
-            df = pd.read_excel(self.db_path, sheet_name=sheet_name)
-            # Rimuovi righe completamente vuote
-            df = df.dropna(how='all')
-            return df
+            df = self._load_all_sheets().get(sheet_name)
+            return pd.DataFrame() if df is None else df.copy()
         except Exception:
             # Se il foglio non esiste o è vuoto, restituisci DataFrame vuoto
             return pd.DataFrame()
 
+    @_locked
+    def _load_sheet_keys(self, sheet_name: str) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
+        """
+        Come _load_sheet, restituendo anche le colonne chiave (KEY_COLUMNS)
+        normalizzate in maiuscolo e allineate alle righe della copia.
+
+        Le chiavi sono calcolate una volta per versione del file e condivise:
+        vanno solo lette.
+        """
+        try:
+            sheets = self._load_all_sheets()
+            df = sheets.get(sheet_name)
+            if df is None:
+                return pd.DataFrame(), {}
+
+            keys = self._key_cache.get(sheet_name)
+            if keys is None:
+                keys = {col: df[col].astype(str).str.upper() for col in KEY_COLUMNS if col in df.columns}
+                self._key_cache[sheet_name] = keys
+            return df.copy(), keys
+        except Exception:
+            # Se il foglio non esiste o è vuoto, restituisci DataFrame vuoto
+            return pd.DataFrame(), {}
+
+    def _load_lookup_sheet(self, sheet_name: str) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
+        """
+        Carica un foglio per il lookup con le colonne numeriche già convertite
+        (e le colonne chiave, come _load_sheet_keys).
+        Da non usare per i cicli leggi-modifica-salva: i testi non numerici
+        verrebbero persi al salvataggio.
+        """
+        df, keys = self._load_sheet_keys(sheet_name)
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df, keys
+
+    @_locked
+    def _lookup_index(self, sheet_name: str) -> Tuple[pd.DataFrame, Dict[Any, int]]:
+        """
+        Foglio di lookup e indice {chiave: posizione del primo match}, costruiti
+        una volta per versione del file (mtime). La chiave e' il PN maiuscolo,
+        oppure la coppia (PN, Client_ID) maiuscola per Client_Data.
+        Il DataFrame restituito e' condiviso: va solo letto.
+        """
+        mtime = self.db_path.stat().st_mtime_ns
+        cached = self._lookup_cache.get(sheet_name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        df, key_columns = self._load_lookup_sheet(sheet_name)
+        index = {}
+        if not df.empty:
+            keys = key_columns['Part Number'].tolist()
+            if sheet_name == SHEET_CLIENT_DATA:
+                keys = zip(keys, key_columns['Client_ID'].tolist())
+            for row, key in enumerate(keys):
+                index.setdefault(key, row)
+
+        self._lookup_cache[sheet_name] = (mtime, df, index)
+        return df, index
+
     def _save_sheet(self, df: pd.DataFrame, sheet_name: str) -> None:
         """Salva un foglio nel database."""
-        # Prima leggi tutti i fogli esistenti
-        with pd.ExcelWriter(self.db_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+        self._save_sheets({sheet_name: df})
+
+    @_locked
+    def _save_sheets(self, frames: Dict[str, pd.DataFrame]) -> None:
+        """
+        Salva piu' fogli nel database con una sola riscrittura del workbook.
+
+        Il file viene riscritto per intero dai fogli gia' in memoria (quelli non
+        modificati compresi), senza riaprire il workbook esistente come farebbe
+        la modalita' append di openpyxl.
+        """
+        if not frames:
+            return
+        all_frames = {**self._load_all_sheets(), **frames}
+        with pd.ExcelWriter(self.db_path, engine=WRITE_ENGINE) as writer:
+            for sheet_name, df in all_frames.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        # Fogli e indici da rileggere dal file (comunque invalidati dal nuovo mtime)
+        self._sheet_cache = {}
+        self._sheet_cache_mtime = None
+        self._lookup_cache = {}
 
     def _normalize_pn(self, pn: str) -> str:
         """Normalizza un part number per il confronto."""
@@ -222,50 +399,32 @@ class PartNumberDatabase:
         """
         pn_normalized = self._normalize_pn(pn)
 
-        # 1. Cerca dati globali
-        df_part_numbers = self._load_sheet(SHEET_PART_NUMBERS)
+        # 1. Cerca dati globali (case-insensitive, primo match)
+        df_part_numbers, pn_index = self._lookup_index(SHEET_PART_NUMBERS)
+        row = pn_index.get(pn_normalized)
 
-        if df_part_numbers.empty:
-            return None
-
-        # Cerca il part number (case-insensitive)
-        mask = df_part_numbers['Part Number'].astype(str).str.upper() == pn_normalized
-        matching_rows = df_part_numbers[mask]
-
-        if matching_rows.empty:
+        if row is None:
             return None
 
-        # Prendi il primo match
-        global_data = matching_rows.iloc[0].to_dict()
+        global_data = df_part_numbers.iloc[row].to_dict()
 
         # 2. Se specificato cliente, cerca dati specifici
         if client_id:
-            df_client_data = self._load_sheet(SHEET_CLIENT_DATA)
+            df_client_data, client_index = self._lookup_index(SHEET_CLIENT_DATA)
+            client_row = client_index.get((pn_normalized, client_id.upper()))
 
-            if not df_client_data.empty:
-                mask_client = (
-                    (df_client_data['Part Number'].astype(str).str.upper() == pn_normalized) &
-                    (df_client_data['Client_ID'].astype(str).str.upper() == client_id.upper())
-                )
-                client_rows = df_client_data[mask_client]
-
-                if not client_rows.empty:
-                    client_data = client_rows.iloc[0].to_dict()
-
-                    # Sovrascrivi/aggiungi dati cliente
-                    if pd.notna(client_data.get('How Many Device of this specific PN are in the BOM?')):
-                        global_data['How Many Device of this specific PN are in the BOM?'] = client_data[
-                            'How Many Device of this specific PN are in the BOM?'
-                        ]
-                    if pd.notna(client_data.get('If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units')):
-                        global_data['If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units'] = client_data[
-                            'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units'
-                        ]
-                    if pd.notna(client_data.get('Custom Supplier Lead Time (weeks)')):
-                        global_data['Supplier Lead Time (weeks)'] = client_data['Custom Supplier Lead Time (weeks)']
+            if client_row is not None:
+                self._apply_client_data(global_data, df_client_data.iloc[client_row].to_dict())
 
         return global_data
 
+    @staticmethod
+    def _apply_client_data(global_data: Dict[str, Any], client_data: Dict[str, Any]) -> None:
+        """Sovrascrive/aggiunge ai dati globali i dati specifici del cliente (se valorizzati)."""
+        for client_col, global_col in CLIENT_OVERRIDE_COLUMNS.items():
+            if pd.notna(client_data.get(client_col)):
+                global_data[global_col] = client_data[client_col]
+
     def lookup_batch(self, pns: List[str], client_id: Optional[str] = None) -> Dict[str, Optional[Dict[str, Any]]]:
         """
         Cerca più part numbers in una volta.
@@ -276,12 +435,85 @@ class PartNumberDatabase:
 
         Returns:
             Dizionario {part_number: dati} con None per i PN non trovati
+
+        Gli indici per PN normalizzato sono quelli di _lookup_index (stessa
+        logica di lookup_part_number: primo match); solo le righe trovate
+        vengono convertite, con un'unica estrazione colonnare per foglio.
         """
-        results = {}
-        for pn in pns:
-            results[pn] = self.lookup_part_number(pn, client_id)
+        df_part_numbers, pn_index = self._lookup_index(SHEET_PART_NUMBERS)
+        results = dict.fromkeys(pns)
+        keys = {pn: self._normalize_pn(pn) for pn in results}
+        found = [pn for pn in results if keys[pn] in pn_index]
+        if not found:
+            return results
+
+        records = df_part_numbers.iloc[[pn_index[keys[pn]] for pn in found]].to_dict('records')
+
+        client_records = {}
+        if client_id:
+            df_client_data, client_index = self._lookup_index(SHEET_CLIENT_DATA)
+            client_upper = client_id.upper()
+            client_hits = {
+                pn: client_index[(keys[pn], client_upper)]
+                for pn in found if (keys[pn], client_upper) in client_index
+            }
+            if client_hits:
+                client_records = dict(zip(client_hits, df_client_data.iloc[list(client_hits.values())].to_dict('records')))
+
+        for pn, global_data in zip(found, records):
+            if pn in client_records:
+                self._apply_client_data(global_data, client_records[pn])
+            results[pn] = global_data
         return results
 
+    def lookup_batch_df(self, pns: List[str], client_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Come lookup_batch, ma restituisce direttamente un DataFrame colonnare.
+
+        Args:
+            pns: Lista di Part Numbers
+            client_id: ID del cliente (opzionale)
+
+        Returns:
+            DataFrame indicizzato per part number richiesto (ordine di input,
+            senza duplicati) con i soli PN trovati; quelli non trovati sono i
+            PN assenti dall'indice. Le colonne numeriche sono già convertite.
+        """
+        requested = list(dict.fromkeys(pns))
+        df_part_numbers, pn_index = self._lookup_index(SHEET_PART_NUMBERS)
+        if df_part_numbers.empty:
+            return pd.DataFrame(index=pd.Index([], dtype=object))
+
+        # Primo record per PN normalizzato (stessa logica di lookup_part_number)
+        found = [pn for pn in requested if self._normalize_pn(pn) in pn_index]
+        keys = [self._normalize_pn(pn) for pn in found]
+        df = df_part_numbers.iloc[[pn_index[key] for key in keys]].set_axis(pd.Index(keys, dtype=object))
+
+        if client_id and keys:
+            df_client_data, client_index = self._lookup_index(SHEET_CLIENT_DATA)
+            if not df_client_data.empty:
+                client_upper = client_id.upper()
+                client_hits = {
+                    key: client_index[(key, client_upper)]
+                    for key in keys if (key, client_upper) in client_index
+                }
+                client_df = (
+                    df_client_data.iloc[list(client_hits.values())]
+                    .set_axis(pd.Index(list(client_hits), dtype=object))
+                    .reindex(keys)
+                )
+                for client_col, global_col in CLIENT_OVERRIDE_COLUMNS.items():
+                    if client_col not in client_df.columns:
+                        continue
+                    override = client_df[client_col]
+                    if global_col in df.columns:
+                        df[global_col] = override.where(override.notna(), df[global_col])
+                    elif override.notna().any():
+                        df[global_col] = override
+
+        df.index = pd.Index(found, dtype=object)
+        return df
+
     # -------------------------------------------------------------------------
     # METODI PUBBLICI - INSERIMENTO/MODIFICA
     # -------------------------------------------------------------------------
@@ -298,74 +530,111 @@ class PartNumberDatabase:
         Returns:
             True se successo, False altrimenti
         """
-        try:
-            pn_normalized = self._normalize_pn(pn)
-            df_part_numbers = self._load_sheet(SHEET_PART_NUMBERS)
-
-            # Separa dati globali da dati cliente
-            global_data = {}
-            client_data = {'Part Number': pn_normalized}
-
-            if client_id:
-                client_data['Client_ID'] = client_id.upper()
-
-            for key, value in data.items():
-                if key in ['How Many Device of this specific PN are in the BOM?',
-                          'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units',
-                          'Custom Supplier Lead Time (weeks)', 'Notes']:
-                    # Dati specifici cliente
-                    client_data[key] = value
-                else:
-                    # Dati globali
-                    global_data[key] = value
+        return self.add_part_numbers([{**data, 'Part Number': pn}], client_id) > 0
 
-            # Aggiungi timestamp
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            global_data['Part Number'] = pn_normalized
-            global_data['Updated_at'] = now
+    @_locked
+    def add_part_numbers(self, records: List[Dict[str, Any]], client_id: Optional[str] = None) -> int:
+        """
+        Aggiunge o aggiorna piu' part numbers con una sola lettura e una sola
+        scrittura del database.
 
-            # Aggiorna o inserisci dati globali
-            mask = df_part_numbers['Part Number'].astype(str).str.upper() == pn_normalized
+        Le righe nuove vengono accumulate in una lista e unite al foglio con un
+        unico concat; per i PN gia' presenti si aggiornano le colonne esistenti.
+        Un PN ripetuto nel lotto vale come aggiornamenti successivi.
 
-            if mask.any():
-                # Update esistente
-                for col in df_part_numbers.columns:
-                    if col in global_data:
-                        df_part_numbers.loc[mask, col] = global_data[col]
-            else:
-                # Insert nuovo
-                global_data['Created_at'] = now
-                new_row = pd.DataFrame([global_data])
-                df_part_numbers = pd.concat([df_part_numbers, new_row], ignore_index=True)
-
-            self._save_sheet(df_part_numbers, SHEET_PART_NUMBERS)
+        Args:
+            records: Dizionari con i dati dei componenti (chiave 'Part Number')
+            client_id: ID cliente (opzionale, per dati specifici cliente)
 
-            # Se ci sono dati cliente, aggiorna anche Client_Data
-            if client_id and any(v is not None for k, v in client_data.items() if k not in ['Part Number', 'Client_ID']):
-                df_client_data = self._load_sheet(SHEET_CLIENT_DATA)
+        Returns:
+            Numero di record scritti (0 in caso di errore)
+        """
+        if not records:
+            return 0
 
-                mask_client = (
-                    (df_client_data['Part Number'].astype(str).str.upper() == pn_normalized) &
-                    (df_client_data['Client_ID'].astype(str).str.upper() == client_id.upper())
-                )
+        try:
+            df_part_numbers, pn_keys = self._load_sheet_keys(SHEET_PART_NUMBERS)
+            df_client_data = None
+            client_upper = client_id.upper() if client_id else None
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-                if mask_client.any():
-                    # Update esistente
-                    for col in df_client_data.columns:
-                        if col in client_data:
-                            df_client_data.loc[mask_client, col] = client_data[col]
+            # Etichette delle righe esistenti per PN normalizzato (tutte le occorrenze)
+            pn_rows = df_part_numbers.groupby(pn_keys['Part Number'], sort=False).groups if not df_part_numbers.empty else {}
+            client_rows = {}
+
+            # Righe nuove accumulate: PN normalizzato -> dict riga
+            new_pn_rows = {}
+            new_client_rows = {}
+
+            for record in records:
+                pn_normalized = self._normalize_pn(record['Part Number'])
+
+                # Separa dati globali da dati cliente
+                global_data = {}
+                client_data = {'Part Number': pn_normalized}
+                if client_id:
+                    client_data['Client_ID'] = client_upper
+
+                for key, value in record.items():
+                    if key in CLIENT_SPECIFIC_FIELDS:
+                        client_data[key] = value
+                    else:
+                        global_data[key] = value
+
+                global_data['Part Number'] = pn_normalized
+                global_data['Updated_at'] = now
+
+                # Aggiorna o inserisci dati globali
+                if pn_normalized in pn_rows:
+                    rows = pn_rows[pn_normalized]
+                    for col in df_part_numbers.columns:
+                        if col in global_data:
+                            df_part_numbers.loc[rows, col] = global_data[col]
+                elif pn_normalized in new_pn_rows:
+                    new_pn_rows[pn_normalized].update(global_data)
                 else:
-                    # Insert nuovo
-                    new_row = pd.DataFrame([client_data])
-                    df_client_data = pd.concat([df_client_data, new_row], ignore_index=True)
+                    global_data['Created_at'] = now
+                    new_pn_rows[pn_normalized] = global_data
+
+                # Se ci sono dati cliente, aggiorna anche Client_Data
+                if client_id and any(v is not None for k, v in client_data.items() if k not in ['Part Number', 'Client_ID']):
+                    if df_client_data is None:
+                        df_client_data, client_key_columns = self._load_sheet_keys(SHEET_CLIENT_DATA)
+                        if not df_client_data.empty:
+                            client_keys = zip(client_key_columns['Part Number'], client_key_columns['Client_ID'])
+                            for label, key in zip(df_client_data.index, client_keys):
+                                client_rows.setdefault(key, []).append(label)
+
+                    key = (pn_normalized, client_upper)
+                    if key in client_rows:
+                        for col in df_client_data.columns:
+                            if col in client_data:
+                                df_client_data.loc[client_rows[key], col] = client_data[col]
+                    elif key in new_client_rows:
+                        new_client_rows[key].update(client_data)
+                    else:
+                        new_client_rows[key] = client_data
+
+            # Un solo concat per foglio con tutte le righe nuove
+            if new_pn_rows:
+                df_part_numbers = pd.concat(
+                    [df_part_numbers, pd.DataFrame(list(new_pn_rows.values()))], ignore_index=True
+                )
+            changed_sheets = {SHEET_PART_NUMBERS: df_part_numbers}
 
-                self._save_sheet(df_client_data, SHEET_CLIENT_DATA)
+            if df_client_data is not None:
+                if new_client_rows:
+                    df_client_data = pd.concat(
+                        [df_client_data, pd.DataFrame(list(new_client_rows.values()))], ignore_index=True
+                    )
+                changed_sheets[SHEET_CLIENT_DATA] = df_client_data
 
-            return True
+            self._save_sheets(changed_sheets)
+            return len(records)
 
         except Exception as e:
             print(f"Errore nell'aggiungere il part number: {e}")
-            return False
+            return 0
 
     def search_similar(self, pattern: str) -> List[Dict[str, Any]]:
         """
@@ -377,13 +646,15 @@ class PartNumberDatabase:
         Returns:
             Lista di dizionari con i part numbers trovati
         """
-        df = self._load_sheet(SHEET_PART_NUMBERS)
+        df, keys = self._load_sheet_keys(SHEET_PART_NUMBERS)
 
         if df.empty:
             return []
 
+        # Sottostringa letterale: nessuna regex compilata, e caratteri come
+        # '(' o '+' nel pattern vengono cercati cosi' come sono
         pattern_upper = pattern.upper()
-        mask = df['Part Number'].astype(str).str.upper().str.contains(pattern_upper, na=False)
+        mask = keys['Part Number'].str.contains(pattern_upper, regex=False, na=False)
 
         matching = df[mask]
         return matching.to_dict('records')
@@ -397,6 +668,7 @@ class PartNumberDatabase:
 
         return df['Part Number'].dropna().unique().tolist()
 
+    @_locked
     def remove_part_number(self, pn: str, client_id: Optional[str] = None) -> bool:
         """
         Rimuove un part number dal database.
@@ -411,36 +683,36 @@ class PartNumberDatabase:
         """
         try:
             pn_normalized = self._normalize_pn(pn)
+            # Solo i fogli con righe effettivamente rimosse vengono riscritti
+            changed_sheets = {}
 
             if client_id:
                 # Rimuovi solo dati specifici cliente
-                df_client_data = self._load_sheet(SHEET_CLIENT_DATA)
+                df_client_data, keys = self._load_sheet_keys(SHEET_CLIENT_DATA)
 
                 if not df_client_data.empty:
-                    mask = (
-                        (df_client_data['Part Number'].astype(str).str.upper() == pn_normalized) &
-                        (df_client_data['Client_ID'].astype(str).str.upper() == client_id.upper())
-                    )
-                    df_client_data = df_client_data[~mask]
-                    self._save_sheet(df_client_data, SHEET_CLIENT_DATA)
+                    mask = (keys['Part Number'] == pn_normalized) & (keys['Client_ID'] == client_id.upper())
+                    if mask.any():
+                        changed_sheets[SHEET_CLIENT_DATA] = df_client_data[~mask]
 
             else:
                 # Rimuovi completamente da entrambi i fogli
-                df_part_numbers = self._load_sheet(SHEET_PART_NUMBERS)
+                df_part_numbers, keys = self._load_sheet_keys(SHEET_PART_NUMBERS)
 
                 if not df_part_numbers.empty:
-                    mask = df_part_numbers['Part Number'].astype(str).str.upper() == pn_normalized
-                    df_part_numbers = df_part_numbers[~mask]
-                    self._save_sheet(df_part_numbers, SHEET_PART_NUMBERS)
+                    mask = keys['Part Number'] == pn_normalized
+                    if mask.any():
+                        changed_sheets[SHEET_PART_NUMBERS] = df_part_numbers[~mask]
 
                 # Rimuovi anche tutti i dati cliente associati
-                df_client_data = self._load_sheet(SHEET_CLIENT_DATA)
+                df_client_data, keys = self._load_sheet_keys(SHEET_CLIENT_DATA)
 
                 if not df_client_data.empty:
-                    mask = df_client_data['Part Number'].astype(str).str.upper() == pn_normalized
-                    df_client_data = df_client_data[~mask]
-                    self._save_sheet(df_client_data, SHEET_CLIENT_DATA)
+                    mask = keys['Part Number'] == pn_normalized
+                    if mask.any():
+                        changed_sheets[SHEET_CLIENT_DATA] = df_client_data[~mask]
 
+            self._save_sheets(changed_sheets)
             return True
 
         except Exception as e:
@@ -460,6 +732,7 @@ class PartNumberDatabase:
 
         return df.to_dict('records')
 
+    @_locked
     def add_client(self, client_id: str, client_name: str, default_run_rate: int = 5000) -> bool:
         """
         Aggiunge o aggiorna un cliente.
@@ -473,7 +746,7 @@ class PartNumberDatabase:
             True se successo, False altrimenti
         """
         try:
-            df_clients = self._load_sheet(SHEET_CLIENTS)
+            df_clients, keys = self._load_sheet_keys(SHEET_CLIENTS)
 
             client_id_upper = client_id.upper()
             now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -485,7 +758,7 @@ class PartNumberDatabase:
                 'Created_at': now
             }
 
-            mask = df_clients['Client_ID'].astype(str).str.upper() == client_id_upper
+            mask = keys['Client_ID'] == client_id_upper
 
             if mask.any():
                 # Update
@@ -506,12 +779,12 @@ class PartNumberDatabase:
 
     def get_client(self, client_id: str) -> Optional[Dict[str, Any]]:
         """Restituisce i dati di un cliente."""
-        df_clients = self._load_sheet(SHEET_CLIENTS)
+        df_clients, keys = self._load_sheet_keys(SHEET_CLIENTS)
 
         if df_clients.empty:
             return None
 
-        mask = df_clients['Client_ID'].astype(str).str.upper() == client_id.upper()
+        mask = keys['Client_ID'] == client_id.upper()
 
         if mask.any():
             return df_clients[mask].iloc[0].to_dict()
@@ -522,6 +795,7 @@ class PartNumberDatabase:
     # METODI PUBBLICI - MIGRAZIONE DATABASE
     # -------------------------------------------------------------------------
 
+    @_locked
     def migrate_database(self) -> bool:
         """
         Migra il database aggiungendo le nuove colonne v3.0 senza perdere dati.
@@ -530,30 +804,37 @@ class PartNumberDatabase:
             True se la migrazione è riuscita o non necessaria, False altrimenti.
         """
         try:
-            df_pn = self._load_sheet(SHEET_PART_NUMBERS)
+            # Fogli letti insieme in sola lettura: si copia solo quello da modificare
+            try:
+                sheets = self._load_all_sheets()
+            except Exception:
+                sheets = {}
+            empty = pd.DataFrame()
+
+            df_pn = sheets.get(SHEET_PART_NUMBERS, empty)
             if df_pn.empty:
                 return True
 
-            changed = False
-            for col in PART_NUMBERS_COLUMNS:
-                if col not in df_pn.columns:
+            # Fogli da aggiornare, scritti con una sola riscrittura del workbook
+            changed_sheets = {}
+            missing = [col for col in PART_NUMBERS_COLUMNS if col not in df_pn.columns]
+            if missing:
+                df_pn = df_pn.copy()
+                for col in missing:
                     df_pn[col] = ''
-                    changed = True
-
-            if changed:
-                self._save_sheet(df_pn, SHEET_PART_NUMBERS)
+                changed_sheets[SHEET_PART_NUMBERS] = df_pn
 
-            # Migrazione fogli Tier-2/3
-            df_t2 = self._load_sheet(SHEET_TIER2_SUPPLIERS)
-            if df_t2.empty or not all(c in df_t2.columns for c in TIER2_SUPPLIERS_COLUMNS):
-                df_t2 = pd.DataFrame(columns=TIER2_SUPPLIERS_COLUMNS)
-                self._save_sheet(df_t2, SHEET_TIER2_SUPPLIERS)
+            # Migrazione fogli Tier-2/3: ricreati solo se mancano colonne
+            # (un foglio con le intestazioni ma senza righe e' gia' migrato)
+            df_t2 = sheets.get(SHEET_TIER2_SUPPLIERS, empty)
+            if not all(c in df_t2.columns for c in TIER2_SUPPLIERS_COLUMNS):
+                changed_sheets[SHEET_TIER2_SUPPLIERS] = pd.DataFrame(columns=TIER2_SUPPLIERS_COLUMNS)
 
-            df_cm = self._load_sheet(SHEET_COMPONENT_MATERIALS)
-            if df_cm.empty or not all(c in df_cm.columns for c in COMPONENT_MATERIALS_COLUMNS):
-                df_cm = pd.DataFrame(columns=COMPONENT_MATERIALS_COLUMNS)
-                self._save_sheet(df_cm, SHEET_COMPONENT_MATERIALS)
+            df_cm = sheets.get(SHEET_COMPONENT_MATERIALS, empty)
+            if not all(c in df_cm.columns for c in COMPONENT_MATERIALS_COLUMNS):
+                changed_sheets[SHEET_COMPONENT_MATERIALS] = pd.DataFrame(columns=COMPONENT_MATERIALS_COLUMNS)
 
+            self._save_sheets(changed_sheets)
             return True
         except Exception as e:
             print(f"Errore nella migrazione del database: {e}")
@@ -565,14 +846,15 @@ class PartNumberDatabase:
 
     def get_tier2_suppliers(self, material_key: Optional[str] = None) -> List[Dict[str, Any]]:
         """Restituisce fornitori Tier-2, opzionalmente filtrati per material_key."""
-        df = self._load_sheet(SHEET_TIER2_SUPPLIERS)
+        df, keys = self._load_sheet_keys(SHEET_TIER2_SUPPLIERS)
         if df.empty:
             return []
         if material_key:
-            mask = df['Material_Key'].astype(str).str.upper() == material_key.upper()
+            mask = keys['Material_Key'] == material_key.upper()
             return df[mask].to_dict('records')
         return df.to_dict('records')
 
+    @_locked
     def add_tier2_supplier(self, data: Dict[str, Any]) -> bool:
         """Aggiunge o aggiorna un fornitore Tier-2."""
         try:
@@ -582,14 +864,16 @@ class PartNumberDatabase:
             # Auto-genera ID se non fornito
             supplier_id = data.get('Tier2_Supplier_ID', '')
             if not supplier_id:
-                existing_ids = df['Tier2_Supplier_ID'].tolist() if not df.empty else []
                 max_num = 0
-                for eid in existing_ids:
-                    try:
-                        num = int(str(eid).replace('T2S_', ''))
-                        max_num = max(max_num, num)
-                    except (ValueError, TypeError):
-                        pass
+                if not df.empty:
+                    # Parte numerica degli ID esistenti (non numerici -> NaN, ignorati)
+                    nums = pd.to_numeric(
+                        df['Tier2_Supplier_ID'].astype(str).str.replace('T2S_', '', regex=False),
+                        errors='coerce'
+                    )
+                    nums = nums[nums % 1 == 0]
+                    if not nums.empty:
+                        max_num = max(max_num, int(nums.max()))
                 supplier_id = f"T2S_{max_num + 1:03d}"
 
             data['Tier2_Supplier_ID'] = supplier_id
@@ -616,6 +900,7 @@ class PartNumberDatabase:
             print(f"Errore nell'aggiungere fornitore Tier-2: {e}")
             return False
 
+    @_locked
     def remove_tier2_supplier(self, supplier_id: str) -> bool:
         """Rimuove un fornitore Tier-2."""
         try:
@@ -632,17 +917,18 @@ class PartNumberDatabase:
 
     def get_component_materials(self, part_number: str) -> List[Dict[str, Any]]:
         """Restituisce i materiali custom associati a un Part Number."""
-        df = self._load_sheet(SHEET_COMPONENT_MATERIALS)
+        df, keys = self._load_sheet_keys(SHEET_COMPONENT_MATERIALS)
         if df.empty:
             return []
         pn_normalized = self._normalize_pn(part_number)
-        mask = df['Part_Number'].astype(str).str.upper() == pn_normalized
+        mask = keys['Part_Number'] == pn_normalized
         return df[mask].to_dict('records')
 
+    @_locked
     def add_component_material(self, part_number: str, material_data: Dict[str, Any]) -> bool:
         """Associa un materiale/fornitore Tier-2 a un Part Number."""
         try:
-            df = self._load_sheet(SHEET_COMPONENT_MATERIALS)
+            df, keys = self._load_sheet_keys(SHEET_COMPONENT_MATERIALS)
             pn_normalized = self._normalize_pn(part_number)
             now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -653,10 +939,7 @@ class PartNumberDatabase:
 
             if not df.empty:
                 # Controlla se esiste gia'
-                mask = (
-                    (df['Part_Number'].astype(str).str.upper() == pn_normalized) &
-                    (df['Material_Key'].astype(str).str.upper() == mat_key.upper())
-                )
+                mask = (keys['Part_Number'] == pn_normalized) & (keys['Material_Key'] == mat_key.upper())
                 if mask.any():
                     for col in df.columns:
                         if col in material_data and col != 'Created_at':
@@ -672,17 +955,15 @@ class PartNumberDatabase:
             print(f"Errore nell'associare materiale: {e}")
             return False
 
+    @_locked
     def remove_component_material(self, part_number: str, material_key: str) -> bool:
         """Rimuove un'associazione materiale-componente."""
         try:
-            df = self._load_sheet(SHEET_COMPONENT_MATERIALS)
+            df, keys = self._load_sheet_keys(SHEET_COMPONENT_MATERIALS)
             if df.empty:
                 return False
             pn_normalized = self._normalize_pn(part_number)
-            mask = (
-                (df['Part_Number'].astype(str).str.upper() == pn_normalized) &
-                (df['Material_Key'].astype(str).str.upper() == material_key.upper())
-            )
+            mask = (keys['Part_Number'] == pn_normalized) & (keys['Material_Key'] == material_key.upper())
             df = df[~mask]
             self._save_sheet(df, SHEET_COMPONENT_MATERIALS)
             return True
@@ -696,12 +977,12 @@ class PartNumberDatabase:
         if df.empty:
             return {}
         result = {}
-        for _, row in df.iterrows():
-            pn = str(row.get('Part_Number', '')).upper()
+        for record in df.to_dict('records'):
+            pn = str(record.get('Part_Number', '')).upper()
             if pn:
                 if pn not in result:
                     result[pn] = []
-                result[pn].append(row.to_dict())
+                result[pn].append(record)
         return result
 
     # -------------------------------------------------------------------------
@@ -718,8 +999,15 @@ class PartNumberDatabase:
             'suppliers': {}
         }
 
+        # Tutti i fogli da un'unica lettura del workbook (solo lettura, senza copie)
+        try:
+            sheets = self._load_all_sheets()
+        except Exception:
+            sheets = {}
+        empty = pd.DataFrame()
+
         # Part numbers
-        df_pn = self._load_sheet(SHEET_PART_NUMBERS)
+        df_pn = sheets.get(SHEET_PART_NUMBERS, empty)
         if not df_pn.empty:
             stats['total_part_numbers'] = len(df_pn['Part Number'].dropna().unique())
 
@@ -733,17 +1021,17 @@ class PartNumberDatabase:
                 stats['suppliers'] = df_pn['Supplier Name'].value_counts().to_dict()
 
         # Clienti
-        df_clients = self._load_sheet(SHEET_CLIENTS)
+        df_clients = sheets.get(SHEET_CLIENTS, empty)
         if not df_clients.empty:
             stats['total_clients'] = len(df_clients)
 
         # Record cliente
-        df_client_data = self._load_sheet(SHEET_CLIENT_DATA)
+        df_client_data = sheets.get(SHEET_CLIENT_DATA, empty)
         if not df_client_data.empty:
             stats['total_client_records'] = len(df_client_data)
 
         # Tier-2 Suppliers
-        df_t2 = self._load_sheet(SHEET_TIER2_SUPPLIERS)
+        df_t2 = sheets.get(SHEET_TIER2_SUPPLIERS, empty)
         if not df_t2.empty:
             stats['total_tier2_suppliers'] = len(df_t2)
         else:
@@ -9,32 +9,46 @@ Modulo indipendente da Streamlit per la logica di business del calcolo del risch
 Può essere importato e utilizzato in altri contesti (API, CLI, test, etc.).
 
 Uso:
-    from risk_engine import calculate_component_risk, calculate_bom_risk_v3
+    from risk_engine import calculate_component_risk, calculate_components_risk, calculate_bom_risk_v3
 
     risk = calculate_component_risk(component_data, run_rate=5000)
+    risks = calculate_components_risk(components_data, run_rate=5000)  # intera BOM
 """
 
+import re
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Union
 
-from geo_risk import calculate_geo_risk, get_technology_node_risk
+from geo_risk import calculate_geo_risks, get_technology_node_risks
 from switching_cost import calculate_switching_cost
-from dependency_graph import (
-    build_dependency_graph, calculate_chain_risk,
-    find_single_points_of_failure, render_dependency_tree
-)
+from dependency_graph import analyze_dependencies
 from tier2_visibility import calculate_tier2_risk
+from risk_kernel import (
+    score_components,
+    FLAG_GEO_CRITICAL, FLAG_GEO_HIGH, FLAG_GEO_MEDIUM, FLAG_TECH_HIGH, FLAG_TECH_MEDIUM,
+    FLAG_SPOF, FLAG_DUAL_PLANT, FLAG_LEAD_CRITICAL, FLAG_LEAD_HIGH, FLAG_LEAD_MEDIUM,
+    FLAG_BUFFER_CRITICAL, FLAG_BUFFER_MEDIUM, FLAG_BUFFER_MITIGATED, FLAG_NOT_STANDALONE,
+    FLAG_PROPRIETARY, FLAG_NON_COMMODITY, FLAG_LONG_QUALIFICATION, FLAG_EOL_CRITICAL,
+    FLAG_EOL_HIGH, FLAG_NO_ALT_SOURCE, FLAG_ONE_ALT_SOURCE, FLAG_MANY_ALT_SOURCES,
+    FLAG_FIN_HIGH, FLAG_FIN_MEDIUM, FLAG_ALLOC_CRITICAL, FLAG_ALLOC_HIGH,
+    FLAG_PRICE_HIGH, FLAG_PRICE_MEDIUM, FLAG_ADVANCED_PACKAGE,
+    FLAG_TIER2_CRITICAL, FLAG_TIER2_HIGH, FLAG_TIER2_MEDIUM,
+)
 
 
 # =============================================================================
 # CONFIGURAZIONE
 # =============================================================================
 
-# Paesi considerati ad alto rischio (legacy, mantenuto per retrocompatibilità)
-HIGH_RISK_COUNTRIES = [
+# Paesi considerati ad alto rischio (legacy: non entra nello score,
+# usato solo per il conteggio informativo 'high_risk_plants')
+HIGH_RISK_COUNTRIES = frozenset({
     'taiwan', 'china', 'korea', 'japan',
     'malaysia', 'singapore', 'philippines'
-]
+})
+# Stessi paesi come array costante per np.isin sulla matrice (N, 4)
+_HIGH_RISK_COUNTRIES_ARRAY = np.array(sorted(HIGH_RISK_COUNTRIES), dtype=object)
 
 # Soglie di rischio
 RISK_THRESHOLDS = {
@@ -42,6 +56,13 @@ RISK_THRESHOLDS = {
     'medium': 30   # Score >= 30 -> YELLOW
 }
 
+# Bordi crescenti per np.digitize (medio, alto)
+_RISK_BINS = np.array([RISK_THRESHOLDS['medium'], RISK_THRESHOLDS['high']], dtype=float)
+
+# Colori e livelli indicizzati da score_color_index (0=alto, 1=medio, 2=basso)
+RISK_COLORS = ('RED', 'YELLOW', 'GREEN')
+RISK_LEVELS = ('ALTO', 'MEDIO', 'BASSO')
+
 # Soglie lead time (settimane)
 LEAD_TIME_THRESHOLDS = {
     'critical': 16,  # > 16 -> critico
@@ -54,11 +75,36 @@ LEAD_TIME_THRESHOLDS = {
 # FUNZIONI DI UTILITÀ
 # =============================================================================
 
+# Colonne con i paesi degli stabilimenti produttivi
+PLANT_COUNTRY_COLUMNS = [
+    'Country of Manufacturing Plant 1', 'Country of Manufacturing Plant 2',
+    'Country of Manufacturing Plant 3', 'Country of Manufacturing Plant 4',
+]
+
+PRICE_COLUMN = 'Unit Price ($)'
+QTY_COLUMN = 'How Many Device of this specific PN are in the BOM?'
+DEPENDENCY_COLUMN = 'In case answer on Column C is Y, Which other device in the BOM is necessary to run the PN on Column B? (e.g. PMIC for MPU, Memory for MPU)'
+
+# Punteggi tabellari per i fattori categorici
+EOL_SCORES = {
+    'OBSOLETE': 15, 'EOL': 15, 'LAST_BUY': 12, 'LAST BUY': 12,
+    'NRND': 8, 'NOT RECOMMENDED': 8, 'ACTIVE': 0,
+}
+FIN_HEALTH_SCORES = {'A': 0, 'B': 2, 'C': 5, 'D': 8}
+ALLOCATION_SCORES = {'NORMAL': 0, 'CONSTRAINED': 5, 'ALLOCATED': 10}
+
+# Categorie fisse dei fattori tabellari: codici int8 (-1 = categoria non prevista)
+EOL_DTYPE = pd.CategoricalDtype(list(EOL_SCORES))
+FIN_HEALTH_DTYPE = pd.CategoricalDtype(list(FIN_HEALTH_SCORES))
+ALLOCATION_DTYPE = pd.CategoricalDtype(list(ALLOCATION_SCORES))
+ADVANCED_PACKAGES = ['WLCSP', 'FCCSP', 'FCBGA', 'FOWLP', 'CHIPLET', '2.5D', '3D']
+_ADVANCED_PACKAGE_PATTERN = '|'.join(re.escape(p) for p in ADVANCED_PACKAGES)
+
+
 def _extract_countries(row: Dict[str, Any]) -> List[str]:
     """Estrae la lista dei paesi degli stabilimenti produttivi."""
     countries = []
-    for col in ['Country of Manufacturing Plant 1', 'Country of Manufacturing Plant 2',
-                'Country of Manufacturing Plant 3', 'Country of Manufacturing Plant 4']:
+    for col in PLANT_COUNTRY_COLUMNS:
         if col in row and pd.notna(row[col]) and str(row[col]).strip():
             countries.append(str(row[col]).strip())
     return countries
@@ -74,6 +120,150 @@ def _get_safe_value(row: Dict[str, Any], key: str, default: Any = None) -> Any:
     return value
 
 
+def _column(df: pd.DataFrame, col: str) -> pd.Series:
+    """Restituisce la colonna del DataFrame (tutta NaN se assente)."""
+    if col in df.columns:
+        return df[col]
+    return pd.Series(np.nan, index=df.index, dtype=object)
+
+
+def _num_column(df: pd.DataFrame, col: str, default: float = np.nan) -> np.ndarray:
+    """
+    Converte una colonna in array float64.
+    I valori mancanti diventano `default`, quelli non numerici NaN.
+    """
+    raw = _column(df, col)
+    num = pd.to_numeric(raw, errors='coerce')
+    return num.where(raw.notna(), default).to_numpy(dtype=float)
+
+
+def _str_column(df: pd.DataFrame, col: str, default: str = '', upper: bool = True,
+                strip: bool = True) -> np.ndarray:
+    """Converte una colonna in array di stringhe normalizzate (strip + upper)."""
+    raw = _column(df, col)
+    values = raw.astype(object).where(raw.notna(), default).astype(str)
+    if strip:
+        values = values.str.strip()
+    if upper:
+        values = values.str.upper()
+    return values.to_numpy()
+
+
+def _flag_column(df: pd.DataFrame, col: str, default: str) -> pd.Categorical:
+    """
+    Converte una colonna flag Y/N in Categorical: i confronti con 'Y'/'N'
+    diventano confronti sui codici interi invece che su oggetti stringa.
+    Come nel confronto originale str(v).upper(), i flag non vengono
+    ripuliti dagli spazi: ' N' non vale come 'N'.
+    """
+    return pd.Categorical(_str_column(df, col, default, strip=False))
+
+
+def _build_component_arrays(components: Union[List[Dict[str, Any]], pd.DataFrame]) -> Dict[str, Any]:
+    """
+    Materializza una volta sola le colonne usate dalle regole di rischio
+    come array allineati (struct-of-arrays): numerici in float64
+    (troncati all'intero dove le regole usano int()), flag Y/N come
+    Categorical, categorie come stringhe normalizzate e, per EOL, salute
+    finanziaria e allocazione, anche i codici int8 usati per il punteggio.
+    """
+    n = len(components)
+    if isinstance(components, pd.DataFrame):
+        df = components.reset_index(drop=True)
+    else:
+        df = pd.DataFrame([dict(c) for c in components], index=range(n))
+
+    # Paesi stabilimenti: una sola passata str.strip/lower sulla matrice (N, 4) appiattita
+    plants = df.reindex(columns=PLANT_COUNTRY_COLUMNS).astype(object)
+    plants = plants.where(plants.notna(), '').to_numpy().ravel()
+    countries = pd.Series(plants, dtype=object).astype(str).str.strip().str.lower().to_numpy()
+
+    eol_status = _str_column(df, 'EOL_Status', 'Active')
+    fin_health = _str_column(df, 'Supplier_Financial_Health', 'A')
+    alloc_status = _str_column(df, 'Allocation_Status', 'Normal')
+
+    return {
+        'countries': countries.reshape(n, len(PLANT_COUNTRY_COLUMNS)),
+        'lead_time': np.trunc(_num_column(df, 'Supplier Lead Time (weeks)', 0.0)),
+        'buffer_stock': _num_column(df, 'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units', 0.0),
+        'qty_per_bom': _num_column(df, QTY_COLUMN, 1.0),
+        'weeks_qualify': np.trunc(_num_column(df, 'Weeks to qualify', 12.0)),
+        'standalone': _flag_column(df, 'Stand-Alone Functional Device (Y/N)', 'Y'),
+        'proprietary': _flag_column(df, 'Proprietary (Y/N)**', 'N'),
+        'commodity': _flag_column(df, 'Commodity (Y/N)*', 'Y'),
+        'eol_status': eol_status,
+        'eol_code': _category_codes(eol_status, EOL_DTYPE),
+        'alt_sources': np.trunc(_num_column(df, 'Number_of_Alternative_Sources')),
+        'fin_health': fin_health,
+        'fin_health_code': _category_codes(fin_health, FIN_HEALTH_DTYPE),
+        'alloc_code': _category_codes(alloc_status, ALLOCATION_DTYPE),
+        'price_increase': _num_column(df, 'Last_Price_Increase_Pct', 0.0),
+        'package': _str_column(df, 'Package_Type', ''),
+        'mtbf': _num_column(df, 'MTBF_Hours'),
+        'auto_grade': _str_column(df, 'Automotive_Grade', '', upper=False),
+    }
+
+
+def _category_codes(values: np.ndarray, dtype: pd.CategoricalDtype) -> np.ndarray:
+    """Codifica un array di stringhe nei codici int8 delle categorie fisse."""
+    return pd.Categorical(values, dtype=dtype).codes.astype(np.int8)
+
+
+def _points_table(table: Dict[str, int]) -> np.ndarray:
+    """
+    Punti indicizzati per codice di categoria, con uno 0 in coda:
+    il codice -1 (categoria assente dalla tabella) legge l'ultimo elemento.
+    """
+    return np.array([*table.values(), 0], dtype=np.int8)
+
+
+_EOL_POINTS = _points_table(EOL_SCORES)
+_FIN_HEALTH_POINTS = _points_table(FIN_HEALTH_SCORES)
+_ALLOCATION_POINTS = _points_table(ALLOCATION_SCORES)
+
+
+def score_color_index(scores: Any) -> np.ndarray:
+    """Classifica vettoriale degli score: 0=RED, 1=YELLOW, 2=GREEN."""
+    # digitize conta le soglie superate (0..2): l'indice va letto al contrario.
+    # NaN -> 0 per mantenerlo verde come nel confronto >= originale.
+    scores = np.nan_to_num(np.asarray(scores, dtype=float), nan=0.0)
+    return 2 - np.digitize(scores, _RISK_BINS)
+
+
+def count_risk_colors(components_risk: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+    """Conta i componenti (RED, YELLOW, GREEN) con un'unica classificazione vettoriale."""
+    scores = np.fromiter((r['score'] for r in components_risk), dtype=float, count=len(components_risk))
+    red, yellow, green = np.bincount(score_color_index(scores), minlength=3)
+    return int(red), int(yellow), int(green)
+
+
+def rank_by_score(components_risk: List[Dict[str, Any]]) -> np.ndarray:
+    """Indici dei componenti per score decrescente (stabile: a parità resta l'ordine BOM)."""
+    scores = np.fromiter((r['score'] for r in components_risk), dtype=float, count=len(components_risk))
+    return np.argsort(-scores, kind='stable')
+
+
+def risk_table(components_risk: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Vista colonnare dei risultati di scoring (una riga per componente).
+    Costruita una volta per analisi: KPI, filtri e raggruppamenti dei tab
+    lavorano sulle colonne invece di iterare sui dizionari a ogni rerun.
+    """
+    switching = [r.get('switching_cost', {}) for r in components_risk]
+    return pd.DataFrame({
+        'part_number': [r.get('part_number', 'N/A') for r in components_risk],
+        'supplier': [r.get('supplier', 'N/A') for r in components_risk],
+        'category': [r.get('category', 'N/A') for r in components_risk],
+        'score': np.fromiter((r['score'] for r in components_risk), dtype=float, count=len(components_risk)),
+        'color': [r['color'] for r in components_risk],
+        'risk_level': [r['risk_level'] for r in components_risk],
+        'man_hours': np.fromiter((r['man_hours'] for r in components_risk), dtype=np.int64, count=len(components_risk)),
+        'tier2_score': [r.get('tier2_risk', {}).get('tier2_score', 0) for r in components_risk],
+        'switching_class': [sw.get('classification', 'TRIVIALE') for sw in switching],
+        'switching_hours': [sw.get('total_switching_hours', 0) for sw in switching],
+    })
+
+
 # =============================================================================
 # MOTORE DI CALCOLO DEL RISCHIO v3.0
 # =============================================================================
@@ -101,333 +291,241 @@ def calculate_component_risk(row: Dict[str, Any], run_rate: int) -> Dict[str, An
             - tech_node_risk: Dettaglio rischio technology node
             - switching_cost: Dettaglio costo di switching
     """
-    score = 0
-    factors = []
-    suggestions = []
-    man_hours = 0
-
-    # =====================================================================
-    # 1. RISCHIO CONCENTRAZIONE GEOGRAFICA v3 - FRONTEND/BACKEND (25%)
-    # =====================================================================
-    geo = calculate_geo_risk(row)
-    tech_node = get_technology_node_risk(_get_safe_value(row, 'Technology_Node', ''))
-
-    # Usa il composite score geo normalizzato a 25 punti max
-    # geo composite_score va da 0 a ~25, lo usiamo direttamente
-    geo_score_normalized = min(25, geo['composite_score'])
-
-    if geo_score_normalized >= 20:
-        score += 25
-        factors.append(f"🌏 CRITICO: Frontend {geo['frontend_country'].title()} ({geo['frontend_level']}) + Backend {geo['backend_country'].title()} ({geo['backend_level']})")
-        suggestions.extend(geo['suggestions'])
-        man_hours += 40
-    elif geo_score_normalized >= 12:
-        score += 18
-        factors.append(f"🌏 ALTO: Frontend {geo['frontend_country'].title()} ({geo['frontend_level']}) + Backend {geo['backend_country'].title()} ({geo['backend_level']})")
-        if geo['suggestions']:
-            suggestions.extend(geo['suggestions'])
-        man_hours += 30
-    elif geo_score_normalized >= 6:
-        score += 12
-        factors.append(f"🌏 MEDIO: Frontend {geo['frontend_country'].title()} + Backend {geo['backend_country'].title()}")
-    else:
-        # Basso rischio geo, ma registra comunque info
-        if geo['frontend_country']:
-            factors.append(f"🌏 BASSO: Frontend {geo['frontend_country'].title()} + Backend {geo['backend_country'].title()}")
-
-    # Bonus/malus per technology node (aggiunge fino a +5 punti)
-    if tech_node['score'] >= 20:
-        score += 5
-        factors.append(f"🔬 ALTO: Nodo tecnologico {tech_node.get('nm', '?')}nm - {tech_node['reason']}")
-        suggestions.append("Valutare chip con nodi più maturi o fonderie alternative")
-    elif tech_node['score'] >= 10:
-        score += 3
-        factors.append(f"🔬 MEDIO: Nodo tecnologico {tech_node.get('nm', '?')}nm - {tech_node['reason']}")
-
-    # =====================================================================
-    # 2. RISCHIO SINGLE SOURCE (20%) + LEAD TIME SPOF MULTIPLIER
-    # =====================================================================
-    countries = _extract_countries(row)
-    num_plants = len(countries)
-    is_spof = num_plants == 1
-
-    if is_spof:
-        base_spof_score = 20
-        lead_time = _get_safe_value(row, 'Supplier Lead Time (weeks)', 0)
-
-        # Lead time SPOF multiplier: un SPOF con lead time lungo è molto più rischioso
-        spof_multiplier = 1.0
-        if lead_time:
-            try:
-                lead_time = int(float(lead_time))
-                if lead_time >= 52:
-                    spof_multiplier = 2.0  # 52+ settimane = doppio rischio
-                    factors.append(f"🏭 CRITICO: Un solo stabilimento produttivo + lead time molto lungo ({lead_time} settimane)")
-                    suggestions.append("URGENTE: Qualificare second source o aumentare buffer stock strategico")
-                elif lead_time >= 26:
-                    spof_multiplier = 1.5  # 26-51 settimane = +50% rischio
-                    factors.append(f"🏭 CRITICO: Un solo stabilimento produttivo + lead time lungo ({lead_time} settimane)")
-                    suggestions.append("Valutare second source o buffer stock esteso")
-                elif lead_time >= 16:
-                    spof_multiplier = 1.3  # 16-25 settimane = +30% rischio
-                    factors.append(f"🏭 CRITICO: Un solo stabilimento produttivo + lead time medio-lungo ({lead_time} settimane)")
-                else:
-                    factors.append("🏭 CRITICO: Un solo stabilimento produttivo")
-                    suggestions.append("Identificare e qualificare second source")
-            except (ValueError, TypeError):
-                factors.append("🏭 CRITICO: Un solo stabilimento produttivo")
-                suggestions.append("Identificare e qualificare second source")
-        else:
-            factors.append("🏭 CRITICO: Un solo stabilimento produttivo")
-            suggestions.append("Identificare e qualificare second source")
+    return calculate_components_risk([row], run_rate)[0]
 
-        score += int(base_spof_score * spof_multiplier)
 
-        weeks_qual = _get_safe_value(row, 'Weeks to qualify', 12)
-        if weeks_qual:
-            man_hours += int(weeks_qual) * 40
-        else:
-            man_hours += 200
-    elif num_plants == 2:
-        score += 10
-        factors.append("🏭 MEDIO: Solo 2 stabilimenti produttivi")
-
-    # =====================================================================
-    # 3. RISCHIO LEAD TIME (15%)
-    # =====================================================================
-    lead_time = _get_safe_value(row, 'Supplier Lead Time (weeks)', 0)
-    if lead_time is not None:
-        try:
-            lead_time = int(float(lead_time))
-            if lead_time > LEAD_TIME_THRESHOLDS['critical']:
-                score += 15
-                factors.append(f"⏱️ CRITICO: Lead time molto lungo ({lead_time} settimane)")
-                suggestions.append("Negoziare rolling forecast o VMI con il fornitore")
-                man_hours += 16
-            elif lead_time > LEAD_TIME_THRESHOLDS['high']:
-                score += 10
-                factors.append(f"⏱️ ALTO: Lead time lungo ({lead_time} settimane)")
-                suggestions.append("Implementare rolling forecast")
-                man_hours += 8
-            elif lead_time > LEAD_TIME_THRESHOLDS['medium']:
-                score += 5
-                factors.append(f"⏱️ MEDIO: Lead time moderato ({lead_time} settimane)")
-        except (ValueError, TypeError):
-            pass
-
-    # =====================================================================
-    # 4. RISCHIO BUFFER STOCK (15%) - con riduzione proporzionale
-    # =====================================================================
-    buffer_stock = _get_safe_value(row, 'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units', 0)
-    qty_per_bom = _get_safe_value(row, 'How Many Device of this specific PN are in the BOM?', 1)
-
-    buffer_coverage_weeks = 0
-    if buffer_stock is not None and qty_per_bom is not None and lead_time is not None:
-        try:
-            buffer_stock = float(buffer_stock)
-            qty_per_bom = float(qty_per_bom) if float(qty_per_bom) > 0 else 1
-            weekly_consumption = run_rate * qty_per_bom
-
-            if weekly_consumption > 0:
-                buffer_coverage_weeks = buffer_stock / weekly_consumption
-
-                if buffer_coverage_weeks < lead_time:
-                    score += 15
-                    factors.append(f"📦 CRITICO: Buffer copre solo {buffer_coverage_weeks:.1f} settimane (lead time: {lead_time})")
-                    suggestions.append(f"Aumentare buffer stock ad almeno {lead_time * 1.5:.0f} settimane di copertura")
-                    man_hours += 8
-                elif buffer_coverage_weeks < lead_time * 1.5:
-                    score += 8
-                    factors.append(f"📦 MEDIO: Buffer copre {buffer_coverage_weeks:.1f} settimane")
-                elif buffer_coverage_weeks >= lead_time * 2:
-                    # Buffer molto ampio -> riduzione rischio proporzionale
-                    buffer_bonus = min(5, int((buffer_coverage_weeks / lead_time - 2) * 2))
-                    score = max(0, score - buffer_bonus)
-                    if buffer_bonus > 0:
-                        factors.append(f"📦 MITIGATO: Buffer ampio ({buffer_coverage_weeks:.1f} settimane, {buffer_coverage_weeks/lead_time:.1f}x lead time) - riduzione {buffer_bonus} punti")
-        except (ValueError, TypeError, ZeroDivisionError):
-            pass
-
-    # =====================================================================
-    # 5. RISCHIO DIPENDENZE (10%)
-    # =====================================================================
-    standalone = _get_safe_value(row, 'Stand-Alone Functional Device (Y/N)', 'Y')
-    if standalone and str(standalone).upper() == 'N':
-        score += 10
-        dependency = _get_safe_value(row, 'In case answer on Column C is Y, Which other device in the BOM is necessary to run the PN on Column B? (e.g. PMIC for MPU, Memory for MPU)', '')
-        if dependency:
-            factors.append(f"🔗 ALTO: Dipende da altri componenti ({dependency})")
-        else:
-            factors.append("🔗 ALTO: Dipende da altri componenti nella BOM")
-        suggestions.append("Verificare allineamento rischio con componenti dipendenti")
+def calculate_components_risk(
+    components: Union[List[Dict[str, Any]], pd.DataFrame],
+    run_rate: int,
+) -> List[Dict[str, Any]]:
+    """
+    Calcola il rischio per una lista di componenti in un'unica passata vettoriale.
 
-    # =====================================================================
-    # 6. RISCHIO PROPRIETARY (10%)
-    # =====================================================================
-    proprietary = _get_safe_value(row, 'Proprietary (Y/N)**', 'N')
-    commodity = _get_safe_value(row, 'Commodity (Y/N)*', 'Y')
-
-    if proprietary and str(proprietary).upper() == 'Y':
-        score += 10
-        factors.append("🔒 ALTO: Componente proprietario (no alternative dirette)")
-        suggestions.append("Avviare studio di redesign con componente commodity/standard")
-        man_hours += 200
-    elif commodity and str(commodity).upper() == 'N':
-        score += 5
-        factors.append("🔒 MEDIO: Componente non-commodity")
+    Gli score di tutte le regole sono calcolati dal kernel numerico
+    (risk_kernel, JIT con numba se disponibile); factors e suggestions
+    vengono poi assemblati solo per le regole attivate (bitmask).
 
-    # =====================================================================
-    # 7. RISCHIO CERTIFICAZIONI (5%)
-    # =====================================================================
-    weeks_qualify = _get_safe_value(row, 'Weeks to qualify', 0)
-    certification = _get_safe_value(row, 'Specify Certification/Qualification', '')
-
-    if weeks_qualify is not None:
-        try:
-            if int(weeks_qualify) > 12:
-                score += 5
-                cert_suffix = f" - {certification}" if certification else ""
-                factors.append(f"📋 MEDIO: Riqualifica lunga ({int(weeks_qualify)} settimane){cert_suffix}")
-                suggestions.append("Pre-qualificare alternative prima di potenziale EOL")
-                man_hours += 16
-        except (ValueError, TypeError):
-            pass
+    Args:
+        components: Lista di dizionari con i dati dei componenti, oppure
+            DataFrame con una riga per componente (le colonne vengono lette
+            direttamente, senza ricostruire il frame)
+        run_rate: Tasso di produzione (PCB/settimana)
 
-    # =====================================================================
-    # SWITCHING COST (informativo, non modifica lo score)
-    # =====================================================================
-    switching = calculate_switching_cost(row)
+    Returns:
+        Lista di dizionari di rischio (stesso formato di calculate_component_risk),
+        nello stesso ordine dei componenti in input.
+    """
+    n = len(components)
+    if n == 0:
+        return []
+
+    cols = _build_component_arrays(components)
+    if isinstance(components, pd.DataFrame):
+        components = components.to_dict('records')
+
+    # Moduli esterni (geo, tech node, switching, tier-2): dettagli per componente
+    geos = calculate_geo_risks(components)
+    tech_nodes = get_technology_node_risks([_get_safe_value(c, 'Technology_Node', '') for c in components])
+    switchings = [calculate_switching_cost(c) for c in components]
+    tier2_results = [calculate_tier2_risk(c) for c in components]
+
+    # =====================================================================
+    # INPUT DEL KERNEL (array allineati, uno per componente)
+    # =====================================================================
+    # geo composite_score va da 0 a ~25, normalizzato a 25 punti max
+    geo_norm = np.minimum(25, np.array([g['composite_score'] for g in geos], dtype=float))
+    tech_score = np.array([t['score'] for t in tech_nodes], dtype=float)
+
+    num_plants = (cols['countries'] != '').sum(axis=1)
+    high_risk_plants = np.isin(cols['countries'], _HIGH_RISK_COUNTRIES_ARRAY).sum(axis=1)
+
+    lead_time = cols['lead_time']
+    weeks_qualify = cols['weeks_qualify']
+    alt_sources = cols['alt_sources']
+    price_increase = cols['price_increase']
+    proprietary = cols['proprietary'] == 'Y'
+
+    eol_status = cols['eol_status']
+    fin_health = cols['fin_health']
+    package = cols['package']
+    tier2_score = np.array([t.get('tier2_score', 0) for t in tier2_results], dtype=float)
+
+    score, man_hours, buffer_coverage_weeks, flags = score_components(
+        geo_norm=geo_norm,
+        tech_score=tech_score,
+        num_plants=num_plants,
+        lead_time=lead_time,
+        buffer_stock=cols['buffer_stock'],
+        qty_per_bom=cols['qty_per_bom'],
+        weeks_qualify=weeks_qualify,
+        not_standalone=cols['standalone'] == 'N',
+        proprietary=proprietary,
+        non_commodity=~proprietary & (cols['commodity'] == 'N'),
+        eol_add=_EOL_POINTS[cols['eol_code']],
+        alt_sources=alt_sources,
+        fin_add=_FIN_HEALTH_POINTS[cols['fin_health_code']],
+        alloc_add=_ALLOCATION_POINTS[cols['alloc_code']],
+        price_increase=price_increase,
+        advanced_package=pd.Series(package, dtype=object).str.contains(_ADVANCED_PACKAGE_PATTERN).to_numpy(dtype=bool),
+        tier2_score=tier2_score,
+        run_rate=run_rate,
+        lead_thresholds=(LEAD_TIME_THRESHOLDS['critical'], LEAD_TIME_THRESHOLDS['high'],
+                         LEAD_TIME_THRESHOLDS['medium']),
+    )
+
+    color_idx = score_color_index(score)
+
+    mtbf = cols['mtbf']
+    auto_grade = cols['auto_grade']
+
+    # =====================================================================
+    # FACTORS / SUGGESTIONS (solo per le regole attivate)
+    # =====================================================================
+    results = []
+    for i, row in enumerate(components):
+        factors = []
+        suggestions = []
+        f = int(flags[i])
+        geo = geos[i]
+        tech_node = tech_nodes[i]
+        tier2_result = tier2_results[i]
+        lt = int(lead_time[i]) if not np.isnan(lead_time[i]) else None
+        coverage = buffer_coverage_weeks[i]
+
+        # 1. Geo + technology node
+        if f & FLAG_GEO_CRITICAL:
+            factors.append(f"🌏 CRITICO: Frontend {geo['frontend_country'].title()} ({geo['frontend_level']}) + Backend {geo['backend_country'].title()} ({geo['backend_level']})")
+            suggestions.extend(geo['suggestions'])
+        elif f & FLAG_GEO_HIGH:
+            factors.append(f"🌏 ALTO: Frontend {geo['frontend_country'].title()} ({geo['frontend_level']}) + Backend {geo['backend_country'].title()} ({geo['backend_level']})")
+            if geo['suggestions']:
+                suggestions.extend(geo['suggestions'])
+        elif f & FLAG_GEO_MEDIUM:
+            factors.append(f"🌏 MEDIO: Frontend {geo['frontend_country'].title()} + Backend {geo['backend_country'].title()}")
+        elif geo['frontend_country']:
+            # Basso rischio geo, ma registra comunque info
+            factors.append(f"🌏 BASSO: Frontend {geo['frontend_country'].title()} + Backend {geo['backend_country'].title()}")
 
-    # =====================================================================
-    # 8. RISCHIO EOL STATUS (fino a +15 punti)
-    # =====================================================================
-    eol_status = str(_get_safe_value(row, 'EOL_Status', 'Active')).strip().upper()
-    eol_scores = {
-        'OBSOLETE': 15, 'EOL': 15, 'LAST_BUY': 12, 'LAST BUY': 12,
-        'NRND': 8, 'NOT RECOMMENDED': 8, 'ACTIVE': 0,
-    }
-    eol_add = eol_scores.get(eol_status, 0)
-    if eol_add > 0:
-        score += eol_add
-        if eol_add >= 12:
-            factors.append(f"⚠️ CRITICO: Componente {eol_status} - fine vita o last buy")
+        if f & FLAG_TECH_HIGH:
+            factors.append(f"🔬 ALTO: Nodo tecnologico {tech_node.get('nm', '?')}nm - {tech_node['reason']}")
+            suggestions.append("Valutare chip con nodi più maturi o fonderie alternative")
+        elif f & FLAG_TECH_MEDIUM:
+            factors.append(f"🔬 MEDIO: Nodo tecnologico {tech_node.get('nm', '?')}nm - {tech_node['reason']}")
+
+        # 2. Single source
+        if f & FLAG_SPOF:
+            if lt is not None and lt >= 52:
+                factors.append(f"🏭 CRITICO: Un solo stabilimento produttivo + lead time molto lungo ({lt} settimane)")
+                suggestions.append("URGENTE: Qualificare second source o aumentare buffer stock strategico")
+            elif lt is not None and lt >= 26:
+                factors.append(f"🏭 CRITICO: Un solo stabilimento produttivo + lead time lungo ({lt} settimane)")
+                suggestions.append("Valutare second source o buffer stock esteso")
+            elif lt is not None and lt >= 16:
+                factors.append(f"🏭 CRITICO: Un solo stabilimento produttivo + lead time medio-lungo ({lt} settimane)")
+            else:
+                factors.append("🏭 CRITICO: Un solo stabilimento produttivo")
+                suggestions.append("Identificare e qualificare second source")
+        elif f & FLAG_DUAL_PLANT:
+            factors.append("🏭 MEDIO: Solo 2 stabilimenti produttivi")
+
+        # 3. Lead time
+        if f & FLAG_LEAD_CRITICAL:
+            factors.append(f"⏱️ CRITICO: Lead time molto lungo ({lt} settimane)")
+            suggestions.append("Negoziare rolling forecast o VMI con il fornitore")
+        elif f & FLAG_LEAD_HIGH:
+            factors.append(f"⏱️ ALTO: Lead time lungo ({lt} settimane)")
+            suggestions.append("Implementare rolling forecast")
+        elif f & FLAG_LEAD_MEDIUM:
+            factors.append(f"⏱️ MEDIO: Lead time moderato ({lt} settimane)")
+
+        # 4. Buffer stock
+        if f & FLAG_BUFFER_CRITICAL:
+            factors.append(f"📦 CRITICO: Buffer copre solo {coverage:.1f} settimane (lead time: {lt})")
+            suggestions.append(f"Aumentare buffer stock ad almeno {lt * 1.5:.0f} settimane di copertura")
+        elif f & FLAG_BUFFER_MEDIUM:
+            factors.append(f"📦 MEDIO: Buffer copre {coverage:.1f} settimane")
+        elif f & FLAG_BUFFER_MITIGATED:
+            buffer_bonus = min(5, int((coverage / lt - 2) * 2))
+            factors.append(f"📦 MITIGATO: Buffer ampio ({coverage:.1f} settimane, {coverage/lt:.1f}x lead time) - riduzione {buffer_bonus} punti")
+
+        # 5. Dipendenze
+        if f & FLAG_NOT_STANDALONE:
+            dependency = _get_safe_value(row, DEPENDENCY_COLUMN, '')
+            if dependency:
+                factors.append(f"🔗 ALTO: Dipende da altri componenti ({dependency})")
+            else:
+                factors.append("🔗 ALTO: Dipende da altri componenti nella BOM")
+            suggestions.append("Verificare allineamento rischio con componenti dipendenti")
+
+        # 6. Proprietary
+        if f & FLAG_PROPRIETARY:
+            factors.append("🔒 ALTO: Componente proprietario (no alternative dirette)")
+            suggestions.append("Avviare studio di redesign con componente commodity/standard")
+        elif f & FLAG_NON_COMMODITY:
+            factors.append("🔒 MEDIO: Componente non-commodity")
+
+        # 7. Certificazioni
+        if f & FLAG_LONG_QUALIFICATION:
+            certification = _get_safe_value(row, 'Specify Certification/Qualification', '')
+            cert_suffix = f" - {certification}" if certification else ""
+            factors.append(f"📋 MEDIO: Riqualifica lunga ({int(weeks_qualify[i])} settimane){cert_suffix}")
+            suggestions.append("Pre-qualificare alternative prima di potenziale EOL")
+
+        # 8. EOL
+        if f & FLAG_EOL_CRITICAL:
+            factors.append(f"⚠️ CRITICO: Componente {eol_status[i]} - fine vita o last buy")
             suggestions.append("Avviare urgentemente ricerca alternativa e last-time buy")
-            man_hours += 80
-        else:
-            factors.append(f"⚠️ ALTO: Componente {eol_status} - non raccomandato per nuovi design")
+        elif f & FLAG_EOL_HIGH:
+            factors.append(f"⚠️ ALTO: Componente {eol_status[i]} - non raccomandato per nuovi design")
             suggestions.append("Pianificare migrazione a componente attivo")
-            man_hours += 40
-
-    # =====================================================================
-    # 9. RISCHIO ALTERNATIVE SOURCES (fino a +10 / bonus -3)
-    # =====================================================================
-    alt_sources = _get_safe_value(row, 'Number_of_Alternative_Sources', '')
-    if alt_sources is not None and str(alt_sources).strip() != '':
-        try:
-            alt_sources_n = int(float(alt_sources))
-            if alt_sources_n == 0:
-                score += 10
-                factors.append("🚫 CRITICO: Nessuna fonte alternativa sul mercato (sole source)")
-                suggestions.append("Avviare redesign con componente multi-source")
-                man_hours += 120
-            elif alt_sources_n == 1:
-                score += 5
-                factors.append("🚫 ALTO: Solo 1 fonte alternativa disponibile")
-                suggestions.append("Qualificare la fonte alternativa come second source")
-                man_hours += 24
-            elif alt_sources_n >= 3:
-                bonus = min(3, alt_sources_n - 2)
-                score = max(0, score - bonus)
-                factors.append(f"✅ MITIGATO: {alt_sources_n} fonti alternative disponibili (-{bonus} punti)")
-        except (ValueError, TypeError):
-            pass
 
-    # =====================================================================
-    # 10. RISCHIO SALUTE FINANZIARIA FORNITORE (fino a +8)
-    # =====================================================================
-    fin_health = str(_get_safe_value(row, 'Supplier_Financial_Health', 'A')).strip().upper()
-    fin_scores = {'A': 0, 'B': 2, 'C': 5, 'D': 8}
-    fin_add = fin_scores.get(fin_health, 0)
-    if fin_add > 0:
-        score += fin_add
-        if fin_add >= 5:
-            factors.append(f"💰 ALTO: Salute finanziaria fornitore rating {fin_health}")
+        # 9. Alternative sources
+        if f & FLAG_NO_ALT_SOURCE:
+            factors.append("🚫 CRITICO: Nessuna fonte alternativa sul mercato (sole source)")
+            suggestions.append("Avviare redesign con componente multi-source")
+        elif f & FLAG_ONE_ALT_SOURCE:
+            factors.append("🚫 ALTO: Solo 1 fonte alternativa disponibile")
+            suggestions.append("Qualificare la fonte alternativa come second source")
+        elif f & FLAG_MANY_ALT_SOURCES:
+            alt_sources_n = int(alt_sources[i])
+            factors.append(f"✅ MITIGATO: {alt_sources_n} fonti alternative disponibili (-{min(3, alt_sources_n - 2)} punti)")
+
+        # 10. Salute finanziaria
+        if f & FLAG_FIN_HIGH:
+            factors.append(f"💰 ALTO: Salute finanziaria fornitore rating {fin_health[i]}")
             suggestions.append("Monitorare rischio insolvenza/acquisizione fornitore")
-            man_hours += 16
-        else:
-            factors.append(f"💰 MEDIO: Salute finanziaria fornitore rating {fin_health}")
+        elif f & FLAG_FIN_MEDIUM:
+            factors.append(f"💰 MEDIO: Salute finanziaria fornitore rating {fin_health[i]}")
 
-    # =====================================================================
-    # 11. RISCHIO ALLOCATION STATUS (fino a +10)
-    # =====================================================================
-    alloc_status = str(_get_safe_value(row, 'Allocation_Status', 'Normal')).strip().upper()
-    alloc_scores = {'NORMAL': 0, 'CONSTRAINED': 5, 'ALLOCATED': 10}
-    alloc_add = alloc_scores.get(alloc_status, 0)
-    if alloc_add > 0:
-        score += alloc_add
-        if alloc_add >= 10:
+        # 11. Allocation
+        if f & FLAG_ALLOC_CRITICAL:
             factors.append("📉 CRITICO: Componente in allocazione - forniture limitate")
             suggestions.append("Negoziare volumi garantiti e cercare broker affidabili")
-            man_hours += 24
-        else:
+        elif f & FLAG_ALLOC_HIGH:
             factors.append("📉 ALTO: Componente con fornitura vincolata (constrained)")
             suggestions.append("Aumentare buffer stock e attivare monitoraggio lead time")
-            man_hours += 8
-
-    # =====================================================================
-    # 12. RISCHIO AUMENTO PREZZO (fino a +5)
-    # =====================================================================
-    price_increase = _get_safe_value(row, 'Last_Price_Increase_Pct', 0)
-    if price_increase is not None and str(price_increase).strip() != '':
-        try:
-            price_increase_f = float(price_increase)
-            if price_increase_f > 50:
-                score += 5
-                factors.append(f"💲 ALTO: Ultimo aumento prezzo {price_increase_f:.0f}% - segnale di tensione supply")
-                suggestions.append("Valutare alternative per contenere costi e ridurre dipendenza")
-                man_hours += 8
-            elif price_increase_f > 20:
-                score += 3
-                factors.append(f"💲 MEDIO: Ultimo aumento prezzo {price_increase_f:.0f}%")
-        except (ValueError, TypeError):
-            pass
-
-    # =====================================================================
-    # 13. RISCHIO PACKAGE TYPE (fino a +3)
-    # =====================================================================
-    package = str(_get_safe_value(row, 'Package_Type', '')).strip().upper()
-    advanced_packages = ['WLCSP', 'FCCSP', 'FCBGA', 'FOWLP', 'CHIPLET', '2.5D', '3D']
-    if package and any(ap in package for ap in advanced_packages):
-        score += 3
-        factors.append(f"📦 MEDIO: Package avanzato ({package}) - poche fonderie capaci")
-        suggestions.append("Verificare disponibilita' capacity nelle fonderie qualificate")
 
-    # =====================================================================
-    # 14. MTBF e AUTOMOTIVE GRADE (informativi)
-    # =====================================================================
-    mtbf = _get_safe_value(row, 'MTBF_Hours', '')
-    auto_grade = str(_get_safe_value(row, 'Automotive_Grade', '')).strip()
-    if auto_grade and auto_grade.upper() not in ('', 'NONE', 'N/A'):
-        factors.append(f"🚗 INFO: Grado automotive {auto_grade} - supply chain piu' rigida")
-    if mtbf and str(mtbf).strip() != '':
-        try:
-            mtbf_val = float(mtbf)
-            if mtbf_val < 50000:
-                factors.append(f"⏳ INFO: MTBF basso ({mtbf_val:.0f}h) - possibile rischio affidabilita'")
-        except (ValueError, TypeError):
-            pass
-
-    # =====================================================================
-    # 15. RISCHIO TIER-2/3 SUPPLY CHAIN (fino a +15)
-    # =====================================================================
-    tier2_result = calculate_tier2_risk(row)
-    tier2_score = tier2_result.get('tier2_score', 0)
-    if tier2_score > 0:
-        tier2_contribution = min(15, int(tier2_score * 0.6))
-        score += tier2_contribution
-
-        if tier2_contribution >= 10:
-            factors.append(f"🔗 CRITICO: Alta dipendenza materiali Tier-2/3 (score {tier2_score}/25)")
+        # 12. Aumento prezzo
+        if f & FLAG_PRICE_HIGH:
+            factors.append(f"💲 ALTO: Ultimo aumento prezzo {price_increase[i]:.0f}% - segnale di tensione supply")
+            suggestions.append("Valutare alternative per contenere costi e ridurre dipendenza")
+        elif f & FLAG_PRICE_MEDIUM:
+            factors.append(f"💲 MEDIO: Ultimo aumento prezzo {price_increase[i]:.0f}%")
+
+        # 13. Package
+        if f & FLAG_ADVANCED_PACKAGE:
+            factors.append(f"📦 MEDIO: Package avanzato ({package[i]}) - poche fonderie capaci")
+            suggestions.append("Verificare disponibilita' capacity nelle fonderie qualificate")
+
+        # 14. MTBF e automotive grade (informativi)
+        if auto_grade[i] and auto_grade[i].upper() not in ('', 'NONE', 'N/A'):
+            factors.append(f"🚗 INFO: Grado automotive {auto_grade[i]} - supply chain piu' rigida")
+        if mtbf[i] != 0 and mtbf[i] < 50000:
+            factors.append(f"⏳ INFO: MTBF basso ({mtbf[i]:.0f}h) - possibile rischio affidabilita'")
+
+        # 15. Tier-2/3
+        if f & FLAG_TIER2_CRITICAL:
+            factors.append(f"🔗 CRITICO: Alta dipendenza materiali Tier-2/3 (score {tier2_result.get('tier2_score', 0)}/25)")
             if tier2_result.get('bottlenecks'):
                 top_bn = tier2_result['bottlenecks'][0]
                 factors.append(
@@ -435,80 +533,74 @@ def calculate_component_risk(row: Dict[str, Any], run_rate: int) -> Dict[str, An
                     f"({top_bn['concentration']:.0%} {top_bn['dominant_country'].title()})"
                 )
             suggestions.extend(tier2_result.get('suggestions', [])[:2])
-            man_hours += 24
-        elif tier2_contribution >= 5:
-            factors.append(f"🔗 ALTO: Dipendenza significativa materiali Tier-2/3 (score {tier2_score}/25)")
+        elif f & FLAG_TIER2_HIGH:
+            factors.append(f"🔗 ALTO: Dipendenza significativa materiali Tier-2/3 (score {tier2_result.get('tier2_score', 0)}/25)")
             suggestions.extend(tier2_result.get('suggestions', [])[:1])
-            man_hours += 8
-        else:
+        elif f & FLAG_TIER2_MEDIUM:
             factors.append(f"🔗 MEDIO: Dipendenza moderata materiali Tier-2/3")
 
-    # Cap score a 100
-    score = min(100, score)
-
-    # Determina colore rischio
-    if score >= RISK_THRESHOLDS['high']:
-        color = "RED"
-        risk_level = "ALTO"
-    elif score >= RISK_THRESHOLDS['medium']:
-        color = "YELLOW"
-        risk_level = "MEDIO"
-    else:
-        color = "GREEN"
-        risk_level = "BASSO"
-
-    return {
-        'score': score,
-        'color': color,
-        'risk_level': risk_level,
-        'factors': factors,
-        'suggestions': suggestions,
-        'man_hours': man_hours,
-        # v3.0 - Dati arricchiti
-        'geo_risk': geo,
-        'tech_node_risk': tech_node,
-        'switching_cost': switching,
-        'buffer_coverage_weeks': round(buffer_coverage_weeks, 1),
-        # v3.2 - Tier-2/3
-        'tier2_risk': tier2_result,
-    }
+        results.append({
+            'score': int(score[i]),
+            'color': RISK_COLORS[color_idx[i]],
+            'risk_level': RISK_LEVELS[color_idx[i]],
+            'factors': factors,
+            'suggestions': suggestions,
+            'man_hours': int(man_hours[i]),
+            # v3.0 - Dati arricchiti
+            'geo_risk': geo,
+            'tech_node_risk': tech_node,
+            'switching_cost': switchings[i],
+            'buffer_coverage_weeks': round(float(coverage), 1),
+            'high_risk_plants': int(high_risk_plants[i]),
+            # v3.2 - Tier-2/3
+            'tier2_risk': tier2_result,
+        })
+
+    return results
 
 
 # =============================================================================
 # CALCOLO RISCHIO BOM (v2 legacy + v3 con dependency graph)
 # =============================================================================
 
+def _component_values(components: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Valore finanziario per componente (unit_price x qty_in_bom).
+    Quantità mancanti o non positive valgono 1; prezzo o quantità non
+    numerici azzerano il valore del componente.
+    """
+    df = pd.DataFrame([dict(c) for c in components], index=range(len(components)))
+    df = df.reindex(columns=[PRICE_COLUMN, QTY_COLUMN]).replace('', np.nan)
+    price = _num_column(df, PRICE_COLUMN, 0.0)
+    qty = _num_column(df, QTY_COLUMN, 1.0)
+    valid = ~np.isnan(price) & ~np.isnan(qty)
+    return np.where(valid, price * np.where(qty > 0, qty, 1.0), 0.0)
+
+
 def calculate_bom_risk(components_risk: List[Dict[str, Any]], df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
     """
     Calcola il rischio complessivo della BOM pesato per valore.
     Retrocompatibile con v2.
+
+    Il valore (prezzo x quantità) è calcolato per colonna sul DataFrame e
+    la media pesata è un unico prodotto scalare.
     """
     if not components_risk:
         return {'score': 0, 'color': 'GREEN', 'risk_level': 'N/A'}
 
-    total_value = 0
-    weighted_score = 0
+    scores = np.fromiter((r['score'] for r in components_risk), dtype=float, count=len(components_risk))
+    avg_score = scores.mean()
 
     if df is not None:
-        for i, risk in enumerate(components_risk):
-            if i < len(df):
-                price = _get_safe_value(df.iloc[i], 'Unit Price ($)', 1)
-                qty = _get_safe_value(df.iloc[i], 'How Many Device of this specific PN are in the BOM?', 1)
-
-                price = float(price) if price is not None else 1
-                qty = float(qty) if qty is not None else 1
-
-                value = price * qty
-                total_value += value
-                weighted_score += risk['score'] * value
-
+        m = min(len(scores), len(df))
+        price = pd.to_numeric(_column(df, PRICE_COLUMN).iloc[:m]).fillna(1).to_numpy(dtype=float)
+        qty = pd.to_numeric(_column(df, QTY_COLUMN).iloc[:m]).fillna(1).to_numpy(dtype=float)
+        value = price * qty
+        total_value = value.sum()
         if total_value > 0:
-            avg_score = weighted_score / total_value
-        else:
-            avg_score = sum(r['score'] for r in components_risk) / len(components_risk)
-    else:
-        avg_score = sum(r['score'] for r in components_risk) / len(components_risk)
+            avg_score = float(np.dot(scores[:m], value) / total_value)
 
+    avg_score = float(avg_score)
     if avg_score >= RISK_THRESHOLDS['high']:
         return {'score': avg_score, 'color': 'RED', 'risk_level': 'ALTO'}
     elif avg_score >= RISK_THRESHOLDS['medium']:
@@ -544,9 +636,6 @@ def calculate_bom_risk_v3(
             'max_chain_score': 0,
         }
 
-    # Costruisci grafo dipendenze
-    graph = build_dependency_graph(components)
-
     # Mappa rischi per part number
     risk_by_pn = {}
     for i, comp in enumerate(components):
@@ -554,48 +643,36 @@ def calculate_bom_risk_v3(
         if i < len(components_risk):
             risk_by_pn[pn] = components_risk[i]
 
-    # Calcola chain risks
-    chain_risks = calculate_chain_risk(graph, risk_by_pn)
-
-    # Trova SPOF
-    spofs = find_single_points_of_failure(graph)
-
-    # Genera Mermaid
-    mermaid = render_dependency_tree(graph, risk_by_pn)
-
-    # Score BOM: media pesata per VALORE FINANZIARIO con chain scores
-    all_scores = []
-    all_values = []
-    for i, risk in enumerate(components_risk):
-        pn = str(components[i].get('Part Number', '')) if i < len(components) else ''
-        chain = chain_risks.get(pn, {})
-        # Usa il chain_score (peggiore tra individuale e catena) se disponibile
-        effective_score = chain.get('chain_score', risk['score'])
-        all_scores.append(effective_score)
-
-        # Valore finanziario = unit_price * qty_in_bom
-        if i < len(components):
-            price = _get_safe_value(components[i], 'Unit Price ($)', 0)
-            qty = _get_safe_value(components[i], 'How Many Device of this specific PN are in the BOM?', 1)
-            try:
-                price = float(price) if price else 0
-                qty = float(qty) if qty and float(qty) > 0 else 1
-            except (ValueError, TypeError):
-                price, qty = 0, 1
-            all_values.append(price * qty)
-        else:
-            all_values.append(0)
+    # Grafo dipendenze, chain risks, SPOF e Mermaid (riusati se BOM e score non cambiano)
+    dependencies = analyze_dependencies(components, risk_by_pn)
+    graph = dependencies['graph']
+    chain_risks = dependencies['chain_risks']
+    spofs = dependencies['spofs']
+    mermaid = dependencies['mermaid']
+
+    # Score BOM: media pesata per VALORE FINANZIARIO con chain scores.
+    # Score effettivi e valori sono array allineati: una sola passata vettoriale.
+    n = len(components_risk)
+    pns = [str(comp.get('Part Number', '')) for comp in components[:n]]
+    pns += [''] * (n - len(pns))
+    # Usa il chain_score (peggiore tra individuale e catena) se disponibile
+    effective_scores = [
+        chain_risks.get(pn, {}).get('chain_score', risk['score'])
+        for pn, risk in zip(pns, components_risk)
+    ]
+    all_scores = np.array(effective_scores, dtype=float)
+    all_values = np.zeros(n)
+    m = min(n, len(components))
+    all_values[:m] = _component_values(components[:m])
 
     # Media pesata per valore finanziario (fallback a media semplice se nessun prezzo)
-    total_value = sum(all_values)
+    total_value = float(all_values.sum())
+    simple_avg = float(all_scores.mean())
     if total_value > 0:
-        weighted_score = sum(s * v for s, v in zip(all_scores, all_values)) / total_value
+        weighted_score = float(np.dot(all_scores, all_values) / total_value)
     else:
-        weighted_score = sum(all_scores) / len(all_scores) if all_scores else 0
-
-    # Media semplice (non pesata) per confronto
-    simple_avg = sum(all_scores) / len(all_scores) if all_scores else 0
-    max_chain = max(all_scores) if all_scores else 0
+        weighted_score = simple_avg
+    max_chain = max(effective_scores)
 
     # Usa lo score pesato come score BOM principale
     avg_score = weighted_score
@@ -620,5 +697,5 @@ def calculate_bom_risk_v3(
         'simple_avg_score': round(simple_avg, 1),
         'weighted_avg_score': round(weighted_score, 1),
         'total_bom_value': round(total_value, 2),
-        'component_values': all_values,
+        'component_values': all_values.tolist(),
     }
@@ -0,0 +1,512 @@
+"""
+Risk Kernel - Kernel numerico dello score di rischio
+====================================================
+Calcolo di score, ore-uomo e copertura buffer per tutti i componenti
+di una BOM a partire da array allineati (struct-of-arrays).
+
+Se numba è installato il kernel viene compilato JIT (seriale: le BOM sono
+piccole e il pool di thread di numba blocca l'uscita se chiamato fuori dal
+main thread),
+altrimenti si usa l'implementazione vettoriale NumPy equivalente.
+
+Le regole attivate sono restituite come bitmask (FLAG_*) per componente:
+risk_engine ricostruisce factors/suggestions solo per i bit accesi.
+
+Uso:
+    from risk_kernel import score_components, score_geo, FLAG_SPOF
+
+    score, man_hours, coverage, flags = score_components(...)
+    fe_score, be_score, composite, level = score_geo(...)
+"""
+
+import numpy as np
+from typing import Tuple
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+# =============================================================================
+# FLAG REGOLE ATTIVATE (un bit per esito di regola)
+# =============================================================================
+
+FLAG_GEO_CRITICAL = 1 << 0
+FLAG_GEO_HIGH = 1 << 1
+FLAG_GEO_MEDIUM = 1 << 2
+FLAG_TECH_HIGH = 1 << 3
+FLAG_TECH_MEDIUM = 1 << 4
+FLAG_SPOF = 1 << 5
+FLAG_DUAL_PLANT = 1 << 6
+FLAG_LEAD_CRITICAL = 1 << 7
+FLAG_LEAD_HIGH = 1 << 8
+FLAG_LEAD_MEDIUM = 1 << 9
+FLAG_BUFFER_CRITICAL = 1 << 10
+FLAG_BUFFER_MEDIUM = 1 << 11
+FLAG_BUFFER_MITIGATED = 1 << 12
+FLAG_NOT_STANDALONE = 1 << 13
+FLAG_PROPRIETARY = 1 << 14
+FLAG_NON_COMMODITY = 1 << 15
+FLAG_LONG_QUALIFICATION = 1 << 16
+FLAG_EOL_CRITICAL = 1 << 17
+FLAG_EOL_HIGH = 1 << 18
+FLAG_NO_ALT_SOURCE = 1 << 19
+FLAG_ONE_ALT_SOURCE = 1 << 20
+FLAG_MANY_ALT_SOURCES = 1 << 21
+FLAG_FIN_HIGH = 1 << 22
+FLAG_FIN_MEDIUM = 1 << 23
+FLAG_ALLOC_CRITICAL = 1 << 24
+FLAG_ALLOC_HIGH = 1 << 25
+FLAG_PRICE_HIGH = 1 << 26
+FLAG_PRICE_MEDIUM = 1 << 27
+FLAG_ADVANCED_PACKAGE = 1 << 28
+FLAG_TIER2_CRITICAL = 1 << 29
+FLAG_TIER2_HIGH = 1 << 30
+FLAG_TIER2_MEDIUM = 1 << 31
+
+# Ore-uomo di mitigazione per regola attivata. Il SPOF aggiunge a parte
+# weeks_qualify * SPOF_MAN_HOURS_PER_WEEK (SPOF_DEFAULT_MAN_HOURS se assente).
+MAN_HOURS_BY_FLAG = {
+    FLAG_GEO_CRITICAL: 40,
+    FLAG_GEO_HIGH: 30,
+    FLAG_LEAD_CRITICAL: 16,
+    FLAG_LEAD_HIGH: 8,
+    FLAG_BUFFER_CRITICAL: 8,
+    FLAG_PROPRIETARY: 200,
+    FLAG_LONG_QUALIFICATION: 16,
+    FLAG_EOL_CRITICAL: 80,
+    FLAG_EOL_HIGH: 40,
+    FLAG_NO_ALT_SOURCE: 120,
+    FLAG_ONE_ALT_SOURCE: 24,
+    FLAG_FIN_HIGH: 16,
+    FLAG_ALLOC_CRITICAL: 24,
+    FLAG_ALLOC_HIGH: 8,
+    FLAG_PRICE_HIGH: 8,
+    FLAG_TIER2_CRITICAL: 24,
+    FLAG_TIER2_HIGH: 8,
+}
+SPOF_MAN_HOURS_PER_WEEK = 40
+SPOF_DEFAULT_MAN_HOURS = 200
+
+# Pesi indicizzati per posizione del bit (condivisi da NumPy e numba)
+_NUM_FLAGS = 32
+_MAN_HOURS_WEIGHTS = np.array([MAN_HOURS_BY_FLAG.get(1 << b, 0) for b in range(_NUM_FLAGS)], dtype=np.int64)
+
+
+# =============================================================================
+# IMPLEMENTAZIONE NUMPY (fallback senza numba)
+# =============================================================================
+
+def _flags(*pairs) -> np.ndarray:
+    """Combina coppie (maschera, flag) in una bitmask int64."""
+    out = np.zeros(len(pairs[0][0]), dtype=np.int64)
+    for mask, flag in pairs:
+        out |= np.where(mask, flag, 0).astype(np.int64)
+    return out
+
+
+def _score_numpy(geo_norm, tech_score, num_plants, lead_time, buffer_stock, qty_per_bom,
+                 weeks_qualify, not_standalone, proprietary, non_commodity, eol_add,
+                 alt_sources, fin_add, alloc_add, price_increase, advanced_package,
+                 tier2_score, run_rate, lead_critical, lead_high, lead_medium):
+    n = len(geo_norm)
+
+    # 1. Geo + technology node
+    geo_pts = np.select([geo_norm >= 20, geo_norm >= 12, geo_norm >= 6], [25, 18, 12], 0)
+    tech_pts = np.select([tech_score >= 20, tech_score >= 10], [5, 3], 0)
+
+    # 2. Single source + lead time SPOF multiplier
+    is_spof = num_plants == 1
+    spof_multiplier = np.select([lead_time >= 52, lead_time >= 26, lead_time >= 16], [2.0, 1.5, 1.3], 1.0)
+    spof_pts = np.where(is_spof, (20 * spof_multiplier).astype(np.int64), np.where(num_plants == 2, 10, 0))
+
+    # 3. Lead time
+    lead_crit = lead_time > lead_critical
+    lead_hi = ~lead_crit & (lead_time > lead_high)
+    lead_med = ~lead_crit & ~lead_hi & (lead_time > lead_medium)
+
+    # 4. Buffer stock (con riduzione proporzionale)
+    weekly_consumption = run_rate * np.where(qty_per_bom > 0, qty_per_bom, 1)
+    has_coverage = ~np.isnan(buffer_stock) & ~np.isnan(qty_per_bom) & (weekly_consumption > 0)
+    coverage = np.zeros(n)
+    np.divide(buffer_stock, weekly_consumption, out=coverage, where=has_coverage)
+
+    has_lead = has_coverage & ~np.isnan(lead_time)
+    buffer_critical = has_lead & (coverage < lead_time)
+    buffer_medium = has_lead & ~buffer_critical & (coverage < lead_time * 1.5)
+    buffer_ample = (has_lead & ~buffer_critical & ~buffer_medium
+                    & (coverage >= lead_time * 2) & (lead_time != 0))
+    ratio = np.zeros(n)
+    np.divide(coverage, lead_time, out=ratio, where=buffer_ample)
+    buffer_bonus = np.where(buffer_ample, np.minimum(5, np.trunc((ratio - 2) * 2)), 0).astype(np.int64)
+
+    score = (geo_pts + tech_pts + spof_pts + np.select([lead_crit, lead_hi, lead_med], [15, 10, 5], 0)
+             + np.select([buffer_critical, buffer_medium], [15, 8], 0))
+    score = np.maximum(0, score - buffer_bonus)
+
+    # 5-9. Dipendenze, proprietary, certificazioni, EOL, fonti alternative
+    long_qualification = weeks_qualify > 12
+    alt_pts = np.select([alt_sources == 0, alt_sources == 1], [10, 5], 0)
+    alt_bonus = np.where(alt_sources >= 3, np.minimum(3, alt_sources - 2), 0).astype(np.int64)
+
+    score = (score + np.where(not_standalone, 10, 0) + np.select([proprietary, non_commodity], [10, 5], 0)
+             + np.where(long_qualification, 5, 0) + eol_add + alt_pts)
+    score = np.maximum(0, score - alt_bonus)
+
+    # 10-15. Salute finanziaria, allocation, prezzo, package, tier-2/3
+    price_pts = np.select([price_increase > 50, price_increase > 20], [5, 3], 0)
+    tier2_contribution = np.where(tier2_score > 0, np.minimum(15, np.trunc(tier2_score * 0.6)), 0).astype(np.int64)
+
+    score = score + fin_add + alloc_add + price_pts + np.where(advanced_package, 3, 0) + tier2_contribution
+    score = np.minimum(100, score).astype(np.int64)
+
+    flags = _flags(
+        (geo_norm >= 20, FLAG_GEO_CRITICAL),
+        ((geo_norm < 20) & (geo_norm >= 12), FLAG_GEO_HIGH),
+        ((geo_norm < 12) & (geo_norm >= 6), FLAG_GEO_MEDIUM),
+        (tech_pts == 5, FLAG_TECH_HIGH),
+        (tech_pts == 3, FLAG_TECH_MEDIUM),
+        (is_spof, FLAG_SPOF),
+        (num_plants == 2, FLAG_DUAL_PLANT),
+        (lead_crit, FLAG_LEAD_CRITICAL),
+        (lead_hi, FLAG_LEAD_HIGH),
+        (lead_med, FLAG_LEAD_MEDIUM),
+        (buffer_critical, FLAG_BUFFER_CRITICAL),
+        (buffer_medium, FLAG_BUFFER_MEDIUM),
+        (buffer_bonus > 0, FLAG_BUFFER_MITIGATED),
+        (not_standalone, FLAG_NOT_STANDALONE),
+        (proprietary, FLAG_PROPRIETARY),
+        (non_commodity & ~proprietary, FLAG_NON_COMMODITY),
+        (long_qualification, FLAG_LONG_QUALIFICATION),
+        (eol_add >= 12, FLAG_EOL_CRITICAL),
+        ((eol_add > 0) & (eol_add < 12), FLAG_EOL_HIGH),
+        (alt_sources == 0, FLAG_NO_ALT_SOURCE),
+        (alt_sources == 1, FLAG_ONE_ALT_SOURCE),
+        (alt_sources >= 3, FLAG_MANY_ALT_SOURCES),
+        (fin_add >= 5, FLAG_FIN_HIGH),
+        ((fin_add > 0) & (fin_add < 5), FLAG_FIN_MEDIUM),
+        (alloc_add >= 10, FLAG_ALLOC_CRITICAL),
+        ((alloc_add > 0) & (alloc_add < 10), FLAG_ALLOC_HIGH),
+        (price_pts == 5, FLAG_PRICE_HIGH),
+        (price_pts == 3, FLAG_PRICE_MEDIUM),
+        (advanced_package, FLAG_ADVANCED_PACKAGE),
+        (tier2_contribution >= 10, FLAG_TIER2_CRITICAL),
+        ((tier2_contribution >= 5) & (tier2_contribution < 10), FLAG_TIER2_HIGH),
+        ((tier2_score > 0) & (tier2_contribution < 5), FLAG_TIER2_MEDIUM),
+    )
+
+    # Ore-uomo: tabella pesi per bit + termine SPOF dipendente da weeks_qualify
+    bits = (flags[:, None] >> np.arange(_NUM_FLAGS)) & 1
+    spof_hours = np.where(np.isnan(weeks_qualify) | (weeks_qualify == 0), SPOF_DEFAULT_MAN_HOURS,
+                          np.nan_to_num(weeks_qualify) * SPOF_MAN_HOURS_PER_WEEK)
+    man_hours = bits @ _MAN_HOURS_WEIGHTS + np.where(is_spof, spof_hours, 0).astype(np.int64)
+    return score, man_hours, coverage, flags
+
+
+def _geo_numpy(fe_id, be_id, fe_table, be_table, fe_weight, be_weight, thresholds):
+    """Score frontend/backend, composito e indice di livello (tabelle per id paese)."""
+    fe_score = fe_table[fe_id]
+    be_score = be_table[be_id]
+    composite = fe_score * fe_weight + be_score * be_weight
+    level = np.digitize(composite, thresholds)
+    return fe_score, be_score, composite, level.astype(np.int64)
+
+
+# =============================================================================
+# KERNEL NUMBA (JIT)
+# =============================================================================
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _score_numba(geo_norm, tech_score, num_plants, lead_time, buffer_stock, qty_per_bom,
+                     weeks_qualify, not_standalone, proprietary, non_commodity, eol_add,
+                     alt_sources, fin_add, alloc_add, price_increase, advanced_package,
+                     tier2_score, run_rate, lead_critical, lead_high, lead_medium):
+        n = geo_norm.shape[0]
+        scores = np.zeros(n, dtype=np.int64)
+        man_hours = np.zeros(n, dtype=np.int64)
+        coverage = np.zeros(n, dtype=np.float64)
+        flags = np.zeros(n, dtype=np.int64)
+
+        for i in range(n):
+            s = 0
+            mh = 0
+            f = 0
+            lt = lead_time[i]
+
+            # 1. Geo + technology node
+            g = geo_norm[i]
+            if g >= 20:
+                s += 25
+                f |= FLAG_GEO_CRITICAL
+            elif g >= 12:
+                s += 18
+                f |= FLAG_GEO_HIGH
+            elif g >= 6:
+                s += 12
+                f |= FLAG_GEO_MEDIUM
+            if tech_score[i] >= 20:
+                s += 5
+                f |= FLAG_TECH_HIGH
+            elif tech_score[i] >= 10:
+                s += 3
+                f |= FLAG_TECH_MEDIUM
+
+            # 2. Single source + lead time SPOF multiplier
+            if num_plants[i] == 1:
+                multiplier = 1.0
+                if lt >= 52:
+                    multiplier = 2.0
+                elif lt >= 26:
+                    multiplier = 1.5
+                elif lt >= 16:
+                    multiplier = 1.3
+                s += int(20 * multiplier)
+                f |= FLAG_SPOF
+                wq = weeks_qualify[i]
+                if np.isnan(wq) or wq == 0:
+                    mh += SPOF_DEFAULT_MAN_HOURS
+                else:
+                    mh += int(wq) * SPOF_MAN_HOURS_PER_WEEK
+            elif num_plants[i] == 2:
+                s += 10
+                f |= FLAG_DUAL_PLANT
+
+            # 3. Lead time
+            if lt > lead_critical:
+                s += 15
+                f |= FLAG_LEAD_CRITICAL
+            elif lt > lead_high:
+                s += 10
+                f |= FLAG_LEAD_HIGH
+            elif lt > lead_medium:
+                s += 5
+                f |= FLAG_LEAD_MEDIUM
+
+            # 4. Buffer stock (con riduzione proporzionale)
+            b = buffer_stock[i]
+            q = qty_per_bom[i]
+            if not np.isnan(b) and not np.isnan(q):
+                weekly = run_rate * (q if q > 0 else 1.0)
+                if weekly > 0:
+                    cov = b / weekly
+                    coverage[i] = cov
+                    if not np.isnan(lt):
+                        if cov < lt:
+                            s += 15
+                            f |= FLAG_BUFFER_CRITICAL
+                        elif cov < lt * 1.5:
+                            s += 8
+                            f |= FLAG_BUFFER_MEDIUM
+                        elif cov >= lt * 2 and lt != 0:
+                            bonus = min(5, int((cov / lt - 2) * 2))
+                            s = max(0, s - bonus)
+                            if bonus > 0:
+                                f |= FLAG_BUFFER_MITIGATED
+
+            # 5-7. Dipendenze, proprietary, certificazioni
+            if not_standalone[i]:
+                s += 10
+                f |= FLAG_NOT_STANDALONE
+            if proprietary[i]:
+                s += 10
+                f |= FLAG_PROPRIETARY
+            elif non_commodity[i]:
+                s += 5
+                f |= FLAG_NON_COMMODITY
+            if weeks_qualify[i] > 12:
+                s += 5
+                f |= FLAG_LONG_QUALIFICATION
+
+            # 8. EOL
+            e = eol_add[i]
+            if e > 0:
+                s += e
+                if e >= 12:
+                    f |= FLAG_EOL_CRITICAL
+                else:
+                    f |= FLAG_EOL_HIGH
+
+            # 9. Fonti alternative
+            a = alt_sources[i]
+            if a == 0:
+                s += 10
+                f |= FLAG_NO_ALT_SOURCE
+            elif a == 1:
+                s += 5
+                f |= FLAG_ONE_ALT_SOURCE
+            elif a >= 3:
+                s = max(0, s - min(3, int(a) - 2))
+                f |= FLAG_MANY_ALT_SOURCES
+
+            # 10. Salute finanziaria
+            if fin_add[i] > 0:
+                s += fin_add[i]
+                if fin_add[i] >= 5:
+                    f |= FLAG_FIN_HIGH
+                else:
+                    f |= FLAG_FIN_MEDIUM
+
+            # 11. Allocation
+            if alloc_add[i] > 0:
+                s += alloc_add[i]
+                if alloc_add[i] >= 10:
+                    f |= FLAG_ALLOC_CRITICAL
+                else:
+                    f |= FLAG_ALLOC_HIGH
+
+            # 12. Aumento prezzo
+            if price_increase[i] > 50:
+                s += 5
+                f |= FLAG_PRICE_HIGH
+            elif price_increase[i] > 20:
+                s += 3
+                f |= FLAG_PRICE_MEDIUM
+
+            # 13. Package avanzato
+            if advanced_package[i]:
+                s += 3
+                f |= FLAG_ADVANCED_PACKAGE
+
+            # 15. Tier-2/3
+            t2 = tier2_score[i]
+            if t2 > 0:
+                contribution = min(15, int(t2 * 0.6))
+                s += contribution
+                if contribution >= 10:
+                    f |= FLAG_TIER2_CRITICAL
+                elif contribution >= 5:
+                    f |= FLAG_TIER2_HIGH
+                else:
+                    f |= FLAG_TIER2_MEDIUM
+
+            # Ore-uomo dalla tabella pesi per bit
+            for bit in range(_NUM_FLAGS):
+                if (f >> bit) & 1:
+                    mh += _MAN_HOURS_WEIGHTS[bit]
+
+            scores[i] = min(100, s)
+            man_hours[i] = mh
+            flags[i] = f
+
+        return scores, man_hours, coverage, flags
+
+    @njit(cache=True)
+    def _geo_numba(fe_id, be_id, fe_table, be_table, fe_weight, be_weight, thresholds):
+        n = fe_id.shape[0]
+        fe_score = np.empty(n, dtype=np.int64)
+        be_score = np.empty(n, dtype=np.int64)
+        composite = np.empty(n, dtype=np.float64)
+        level = np.zeros(n, dtype=np.int64)
+
+        for i in range(n):
+            fe_score[i] = fe_table[fe_id[i]]
+            be_score[i] = be_table[be_id[i]]
+            c = fe_score[i] * fe_weight + be_score[i] * be_weight
+            composite[i] = c
+            # Numero di soglie superate (equivale a np.digitize)
+            for t in thresholds:
+                if c >= t:
+                    level[i] += 1
+
+        return fe_score, be_score, composite, level
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+def score_components(
+    geo_norm: np.ndarray,
+    tech_score: np.ndarray,
+    num_plants: np.ndarray,
+    lead_time: np.ndarray,
+    buffer_stock: np.ndarray,
+    qty_per_bom: np.ndarray,
+    weeks_qualify: np.ndarray,
+    not_standalone: np.ndarray,
+    proprietary: np.ndarray,
+    non_commodity: np.ndarray,
+    eol_add: np.ndarray,
+    alt_sources: np.ndarray,
+    fin_add: np.ndarray,
+    alloc_add: np.ndarray,
+    price_increase: np.ndarray,
+    advanced_package: np.ndarray,
+    tier2_score: np.ndarray,
+    run_rate: float,
+    lead_thresholds: Tuple[float, float, float],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcola score, ore-uomo, copertura buffer e bitmask delle regole.
+
+    Args:
+        geo_norm ... tier2_score: array allineati (uno per componente);
+            i valori numerici non disponibili sono NaN
+        run_rate: Tasso di produzione (PCB/settimana)
+        lead_thresholds: Soglie lead time (critical, high, medium)
+
+    Returns:
+        Tupla (score int64, man_hours int64, buffer_coverage_weeks float64, flags int64)
+    """
+    args = (
+        np.ascontiguousarray(geo_norm, dtype=np.float64),
+        np.ascontiguousarray(tech_score, dtype=np.float64),
+        np.ascontiguousarray(num_plants, dtype=np.int64),
+        np.ascontiguousarray(lead_time, dtype=np.float64),
+        np.ascontiguousarray(buffer_stock, dtype=np.float64),
+        np.ascontiguousarray(qty_per_bom, dtype=np.float64),
+        np.ascontiguousarray(weeks_qualify, dtype=np.float64),
+        np.ascontiguousarray(not_standalone, dtype=np.bool_),
+        np.ascontiguousarray(proprietary, dtype=np.bool_),
+        np.ascontiguousarray(non_commodity, dtype=np.bool_),
+        np.ascontiguousarray(eol_add, dtype=np.int64),
+        np.ascontiguousarray(alt_sources, dtype=np.float64),
+        np.ascontiguousarray(fin_add, dtype=np.int64),
+        np.ascontiguousarray(alloc_add, dtype=np.int64),
+        np.ascontiguousarray(price_increase, dtype=np.float64),
+        np.ascontiguousarray(advanced_package, dtype=np.bool_),
+        np.ascontiguousarray(tier2_score, dtype=np.float64),
+        float(run_rate),
+        float(lead_thresholds[0]), float(lead_thresholds[1]), float(lead_thresholds[2]),
+    )
+    if HAS_NUMBA:
+        return _score_numba(*args)
+    return _score_numpy(*args)
+
+
+def score_geo(
+    fe_id: np.ndarray,
+    be_id: np.ndarray,
+    fe_table: np.ndarray,
+    be_table: np.ndarray,
+    fe_weight: float,
+    be_weight: float,
+    thresholds: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcola gli score geografici di tutti i componenti da id paese interi.
+
+    Args:
+        fe_id, be_id: id paese frontend/backend (indici in fe_table/be_table)
+        fe_table, be_table: score per id paese (ultimo elemento: paese non classificato)
+        fe_weight, be_weight: pesi dello score composito
+        thresholds: soglie crescenti del livello composito
+
+    Returns:
+        Tupla (frontend_score int64, backend_score int64, composite float64, indice livello int64)
+    """
+    args = (
+        np.ascontiguousarray(fe_id, dtype=np.int64),
+        np.ascontiguousarray(be_id, dtype=np.int64),
+        np.ascontiguousarray(fe_table, dtype=np.int64),
+        np.ascontiguousarray(be_table, dtype=np.int64),
+        float(fe_weight),
+        float(be_weight),
+        np.ascontiguousarray(thresholds, dtype=np.float64),
+    )
+    if HAS_NUMBA:
+        return _geo_numba(*args)
+    return _geo_numpy(*args)
@@ -83,6 +83,12 @@ def _get_safe(row: Dict[str, Any], key: str, default: Any = None) -> Any:
     return val
 
 
+def _to_float(val: Any) -> float:
+    """Converte in float senza passare da eccezioni: vuoti e non numerici valgono 0."""
+    num = pd.to_numeric(val, errors='coerce') if val else 0
+    return 0.0 if pd.isna(num) else float(num)
+
+
 def _parse_certification_multiplier(certification: str) -> float:
     """Trova il moltiplicatore massimo tra le certificazioni elencate."""
     if not certification:
@@ -124,10 +130,7 @@ def calculate_switching_cost(component: Dict[str, Any]) -> Dict[str, Any]:
     if not sw_size:
         # Fallback: cerca colonna originale BOM
         sw_size = _get_safe(component, 'Size of SW / Firmware Code that runs on this Part Number (KB)', 0)
-    try:
-        sw_size = float(sw_size) if sw_size else 0
-    except (ValueError, TypeError):
-        sw_size = 0
+    sw_size = _to_float(sw_size)
 
     os_type = str(_get_safe(component, 'OS_Type', '') or
                   _get_safe(component, 'OS or Baremetal', '') or '').strip().lower()
@@ -147,10 +150,7 @@ def calculate_switching_cost(component: Dict[str, Any]) -> Dict[str, Any]:
 
     # --- Qualification Time ---
     weeks_qualify = _get_safe(component, 'Weeks to qualify', 0)
-    try:
-        weeks_qualify = float(weeks_qualify) if weeks_qualify else 0
-    except (ValueError, TypeError):
-        weeks_qualify = 0
+    weeks_qualify = _to_float(weeks_qualify)
 
     qualification_hours = weeks_qualify * HOURS_PER_QUAL_WEEK
 
@@ -3,34 +3,48 @@ Moduli per i tab della Supply Chain Resilience Platform v3.0
 Ogni funzione rappresenta una tab e contiene tutta la logica di visualizzazione.
 """
 
+import io
+import os
+import time
+import shutil
+import hashlib
+import subprocess
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit.components.v1 as components
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional, Tuple
 
 # Import moduli personalizzati
-from risk_engine import calculate_component_risk
-from geo_risk import get_technology_node_risk, generate_risk_map_data
+from risk_engine import calculate_component_risk, calculate_components_risk, count_risk_colors, rank_by_score, risk_table
+from geo_risk import get_technology_node_risk, risk_map_frame
 from whatif_simulator import (
     simulate_disruption,
     get_predefined_scenarios,
     _is_component_affected as _check_affected,
     SCENARIO_TYPES
 )
-from dependency_graph import HAS_NETWORKX
+from dependency_graph import HAS_NETWORKX, _node_columns
 from pdf_export import show_export_button
 from tier2_visibility import (
     calculate_tier2_risk,
     analyze_bom_tier2_bottlenecks,
     MATERIAL_DATABASE,
     CATEGORY_MATERIAL_MAPPINGS,
+    CATEGORY_COLUMN,
 )
 
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
+# I badge HTML usano st.html: niente passata markdown per ogni badge,
+# le classi CSS restano quelle definite in app.py.
 
 def render_risk_badge(risk_level, score):
     """Renderizza un badge del rischio."""
@@ -40,42 +54,85 @@ def render_risk_badge(risk_level, score):
         'BASSO': 'risk-green'
     }
     css_class = color_map.get(risk_level, 'risk-green')
-    st.markdown(f"""
+    st.html(f"""
     <div class="{css_class}">
         <h3>{risk_level}</h3>
         <p>Score: {score}/100</p>
     </div>
-    """, unsafe_allow_html=True)
+    """)
 
 
 def render_switching_badge(classification):
     """Renderizza un badge per la classificazione di switching."""
     css_class = f"switching-{classification.lower()}"
-    st.markdown(f'<span class="{css_class}">{classification}</span>', unsafe_allow_html=True)
-
+    st.html(f'<span class="{css_class}">{classification}</span>')
 
-def render_geo_detail(geo_risk):
-    """Renderizza i dettagli del rischio geografico frontend/backend."""
-    frontend = geo_risk.get('frontend_country', 'N/A').title()
-    backend = geo_risk.get('backend_country', 'N/A').title()
-    f_level = geo_risk.get('frontend_level', 'N/A')
-    b_level = geo_risk.get('backend_level', 'N/A')
 
-    st.markdown(f"""
+_GEO_DETAIL_TEMPLATE = """
     <div class="geo-frontend">
-        <strong>Frontend (Wafer Fab):</strong> {frontend} - {f_level}<br/>
-        <small>{geo_risk.get('frontend_reason', '')}</small>
+        <strong>Frontend (Wafer Fab):</strong> {frontend_country} - {frontend_level}<br/>
+        <small>{frontend_reason}</small>
     </div>
     <div class="geo-backend">
-        <strong>Backend (Assembly/Test):</strong> {backend} - {b_level}<br/>
-        <small>{geo_risk.get('backend_reason', '')}</small>
+        <strong>Backend (Assembly/Test):</strong> {backend_country} - {backend_level}<br/>
+        <small>{backend_reason}</small>
     </div>
-    """, unsafe_allow_html=True)
+    """
 
 
-def render_mermaid(mermaid_code, height=600):
-    """Renderizza un diagramma Mermaid in Streamlit."""
-    components.html(f"""
+class _GeoFields(dict):
+    """Campi del template geo: le motivazioni mancanti sono vuote, il resto vale 'N/A'."""
+
+    def __missing__(self, key):
+        return '' if key.endswith('_reason') else 'N/A'
+
+
+@lru_cache(maxsize=256)
+def _country_title(country: str) -> str:
+    """Nome paese in formato titolo (i paesi distinti sono pochi)."""
+    return country.title()
+
+
+def render_geo_detail(geo_risk):
+    """Renderizza i dettagli del rischio geografico frontend/backend."""
+    fields = _GeoFields(geo_risk)
+    fields['frontend_country'] = _country_title(fields['frontend_country'])
+    fields['backend_country'] = _country_title(fields['backend_country'])
+    st.html(_GEO_DETAIL_TEMPLATE.format_map(fields))
+
+
+# mermaid-cli (mmdc) opzionale: se presente i diagrammi arrivano al browser
+# già renderizzati in SVG, altrimenti si usa mermaid.js lato client
+MMDC_PATH = shutil.which('mmdc')
+HAS_MMDC = MMDC_PATH is not None
+MMDC_TIMEOUT_S = 60
+
+
+@st.cache_data(show_spinner=False)
+def _mermaid_svg(mermaid_code: str) -> Optional[str]:
+    """Renderizza lato server (una volta per diagramma) il codice Mermaid in SVG con mmdc."""
+    if not HAS_MMDC:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'diagram.mmd')
+        out = os.path.join(tmp, 'diagram.svg')
+        with open(src, 'w', encoding='utf-8') as f:
+            f.write(mermaid_code)
+        try:
+            subprocess.run(
+                [MMDC_PATH, '-i', src, '-o', out, '-b', 'white', '--quiet'],
+                check=True, capture_output=True, timeout=MMDC_TIMEOUT_S,
+            )
+            with open(out, encoding='utf-8') as f:
+                return f.read()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+
+@st.cache_data(show_spinner=False)
+def _mermaid_html(mermaid_code: str) -> str:
+    """Costruisce (una volta per diagramma) la pagina HTML che renderizza il codice Mermaid."""
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -94,7 +151,52 @@ def render_mermaid(mermaid_code, height=600):
         </script>
     </body>
     </html>
-    """, height=height, scrolling=True)
+    """
+
+
+def render_mermaid(mermaid_code, height=600):
+    """Renderizza un diagramma Mermaid in Streamlit (SVG pre-renderizzato se mmdc è disponibile)."""
+    svg = _mermaid_svg(mermaid_code)
+    if svg:
+        # components.html (iframe): st.html sanifica il markup e scarterebbe l'SVG
+        components.html(f'<div style="background: white; padding: 20px;">{svg}</div>', height=height, scrolling=True)
+    else:
+        components.html(_mermaid_html(mermaid_code), height=height, scrolling=True)
+
+
+# =============================================================================
+# STATO DEI WIDGET TRA I TAB
+# =============================================================================
+# app.py renderizza solo il tab aperto e Streamlit elimina lo stato dei widget
+# non renderizzati. I valori da conservare al cambio tab vivono in una chiave
+# di sessione normale (`key`); il widget usa la chiave `_key`, riallineata a
+# ogni render. Questi widget non passano value/index/default: il valore
+# iniziale e' il `default` di _kept_widget.
+
+def _keep_widget_value(key: str) -> None:
+    """Copia il valore del widget `_key` nella chiave di sessione `key`."""
+    st.session_state[key] = st.session_state[f"_{key}"]
+
+
+def _kept_widget(key: str, default: Any, options: Optional[List[Any]] = None,
+                 in_form: bool = False) -> Dict[str, Any]:
+    """
+    Argomenti (key, on_change) per un widget il cui valore sopravvive al cambio tab.
+
+    Se `options` è indicato, un valore conservato non più tra le opzioni torna
+    al default. I widget dentro st.form non accettano on_change: il valore va
+    copiato con _keep_widget_value nel callback del submit.
+    """
+    value = st.session_state.get(key, default)
+    if options is not None:
+        values = value if isinstance(value, list) else [value]
+        if any(v not in options for v in values):
+            value = default
+    st.session_state[key] = value
+    st.session_state[f"_{key}"] = value
+    if in_form:
+        return {'key': f"_{key}"}
+    return {'key': f"_{key}", 'on_change': _keep_widget_value, 'args': (key,)}
 
 
 # =============================================================================
@@ -255,34 +357,16 @@ def render_tab_analisi_multipla():
         selected_bom = st.selectbox(
             "Seleziona BOM",
             options=list(BOM_EXAMPLES.keys()),
-            help="Seleziona una BOM di esempio da analizzare"
+            help="Seleziona una BOM di esempio da analizzare",
+            **_kept_widget("bom_example", next(iter(BOM_EXAMPLES)), list(BOM_EXAMPLES))
         )
 
         if st.button("Carica e Analizza BOM", type="primary"):
             bom_file = BOM_EXAMPLES[selected_bom]
             try:
-                # Leggi il file Excel
-                xl = pd.ExcelFile(bom_file)
-                target_sheet = None
-                for sheet in xl.sheet_names:
-                    if sheet.upper() == 'INPUTS':
-                        target_sheet = sheet
-                        break
-                if target_sheet is None:
-                    target_sheet = xl.sheet_names[0]
-
-                df_raw = pd.read_excel(xl, sheet_name=target_sheet, header=None)
-                header_row = None
-                for i, row in df_raw.iterrows():
-                    row_str = ' '.join(str(v).lower() for v in row.values if pd.notna(v))
-                    if 'supplier' in row_str and ('part' in row_str or 'name' in row_str):
-                        header_row = i
-                        break
-                if header_row is not None:
-                    df_uploaded = pd.read_excel(xl, sheet_name=target_sheet, header=header_row)
-                    df_uploaded = df_uploaded.dropna(how='all')
-                else:
-                    df_uploaded = pd.read_excel(xl, sheet_name=target_sheet)
+                # Leggi il file Excel (parsing in cache sui bytes del file)
+                with open(bom_file, 'rb') as f:
+                    df_uploaded = _load_bom_dataframe(f.read(), bom_file)
 
                 # Trova colonna Part Number
                 pn_col = None
@@ -300,8 +384,7 @@ def render_tab_analisi_multipla():
                     pns = [p for p in pns if p.strip() and p.strip().lower() not in ('nan', 'none', '')]
                     st.success(f"Caricati **{len(pns)}** part numbers da **{selected_bom}**")
 
-                    batch = _run_batch_analysis(pns, st.session_state.current_client, st.session_state.run_rate)
-                    st.session_state.batch_results = batch
+                    _score_batch(pns, st.session_state.current_client, st.session_state.run_rate)
                 else:
                     st.error("Colonna 'Part Number' non trovata nel file.")
             except Exception as e:
@@ -309,38 +392,27 @@ def render_tab_analisi_multipla():
 
     with col2:
         st.subheader("Carica il Tuo File")
+        # Il file_uploader non si può ripristinare da session_state: nome e
+        # contenuto del file restano in bom_upload, svuotato solo dall'utente
+        def _keep_upload():
+            upload = st.session_state._bom_upload
+            st.session_state.bom_upload = None if upload is None else (upload.name, upload.getvalue())
+
         uploaded_file = st.file_uploader(
             "Carica file con lista Part Numbers",
             type=['csv', 'xlsx', 'xls'],
-            help="Il file deve avere una colonna 'Part Number'"
+            help="Il file deve avere una colonna 'Part Number'",
+            key="_bom_upload",
+            on_change=_keep_upload
         )
 
-        if uploaded_file:
+        upload = st.session_state.get('bom_upload')
+        if upload and uploaded_file is None:
+            st.caption(f"File caricato: **{upload[0]}**")
+
+        if upload:
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    df_uploaded = pd.read_csv(uploaded_file)
-                else:
-                    xl = pd.ExcelFile(uploaded_file)
-                    target_sheet = None
-                    for sheet in xl.sheet_names:
-                        if sheet.upper() == 'INPUTS':
-                            target_sheet = sheet
-                            break
-                    if target_sheet is None:
-                        target_sheet = xl.sheet_names[0]
-
-                    df_raw = pd.read_excel(xl, sheet_name=target_sheet, header=None)
-                    header_row = None
-                    for i, row in df_raw.iterrows():
-                        row_str = ' '.join(str(v).lower() for v in row.values if pd.notna(v))
-                        if 'supplier' in row_str and ('part' in row_str or 'name' in row_str):
-                            header_row = i
-                            break
-                    if header_row is not None:
-                        df_uploaded = pd.read_excel(xl, sheet_name=target_sheet, header=header_row)
-                        df_uploaded = df_uploaded.dropna(how='all')
-                    else:
-                        df_uploaded = pd.read_excel(xl, sheet_name=target_sheet)
+                df_uploaded = _load_bom_dataframe(upload[1], upload[0])
 
                 pn_col = None
                 for col in df_uploaded.columns:
@@ -358,14 +430,17 @@ def render_tab_analisi_multipla():
                     st.success(f"Trovati **{len(pns)}** part numbers nel file")
 
                     if st.button("Analizza File Upload", type="primary"):
-                        batch = _run_batch_analysis(pns, st.session_state.current_client, st.session_state.run_rate)
-                        st.session_state.batch_results = batch
+                        _score_batch(pns, st.session_state.current_client, st.session_state.run_rate)
                 else:
                     st.error("Colonna 'Part Number' non trovata nel file. Colonne trovate: " +
                              ", ".join(str(c) for c in df_uploaded.columns[:10]))
             except Exception as e:
                 st.error(f"Errore nel caricamento: {str(e)}")
 
+    # Scoring in background ancora in corso: il fragment ne controlla lo stato
+    if st.session_state.get('scoring_job') is not None:
+        _poll_scoring_job()
+
     # Mostra risultati batch
     batch = st.session_state.batch_results
     if batch:
@@ -383,20 +458,19 @@ def render_tab_analisi_multipla():
 
         risks = batch['components_risk']
 
+        red_count, yellow_count, green_count = count_risk_colors(risks)
+
         with col1:
-            red_count = sum(1 for r in risks if r['color'] == 'RED')
             st.metric("Alto Rischio", red_count)
 
         with col2:
-            yellow_count = sum(1 for r in risks if r['color'] == 'YELLOW')
             st.metric("Medio Rischio", yellow_count)
 
         with col3:
-            green_count = sum(1 for r in risks if r['color'] == 'GREEN')
             st.metric("Basso Rischio", green_count)
 
         with col4:
-            total_mh = sum(r['man_hours'] for r in risks)
+            total_mh = int(batch['risk_table']['man_hours'].sum())
             st.metric("Totale Man-Hours", f"{total_mh:,}h")
 
         with col5:
@@ -407,48 +481,36 @@ def render_tab_analisi_multipla():
         col1, col2 = st.columns(2)
 
         with col1:
-            risk_counts = {
-                'Alto (RED)': red_count,
-                'Medio (YELLOW)': yellow_count,
-                'Basso (GREEN)': green_count
-            }
-            fig_pie = px.pie(
-                values=list(risk_counts.values()),
-                names=list(risk_counts.keys()),
-                color=list(risk_counts.keys()),
-                color_discrete_map={
-                    'Alto (RED)': '#ff4444',
-                    'Medio (YELLOW)': '#ffbb33',
-                    'Basso (GREEN)': '#00C851'
-                },
-                title="Distribuzione per Livello di Rischio"
-            )
+            fig_pie = _build_risk_pie((red_count, yellow_count, green_count))
             st.plotly_chart(fig_pie, use_container_width=True)
 
         with col2:
-            sw_counts = {'TRIVIALE': 0, 'MODERATO': 0, 'COMPLESSO': 0, 'CRITICO': 0}
-            for r in risks:
-                cls = r.get('switching_cost', {}).get('classification', 'TRIVIALE')
-                sw_counts[cls] = sw_counts.get(cls, 0) + 1
-
-            fig_sw = px.pie(
-                values=list(sw_counts.values()),
-                names=list(sw_counts.keys()),
-                color=list(sw_counts.keys()),
-                color_discrete_map={
-                    'TRIVIALE': '#00C851',
-                    'MODERATO': '#ffbb33',
-                    'COMPLESSO': '#ff8800',
-                    'CRITICO': '#ff4444'
-                },
-                title="Distribuzione Costi di Switching"
-            )
+            sw_counts = dict.fromkeys(('TRIVIALE', 'MODERATO', 'COMPLESSO', 'CRITICO'), 0)
+            sw_counts.update(batch['risk_table']['switching_class'].value_counts(sort=False).to_dict())
+
+            fig_sw = _build_switching_pie(tuple(sw_counts.items()))
             st.plotly_chart(fig_sw, use_container_width=True)
 
         # Dettaglio rischi per componente
         st.subheader("Dettaglio Rischi per Componente")
 
-        for risk in sorted(risks, key=lambda x: x['score'], reverse=True):
+        # Paginazione: si renderizzano solo gli expander della pagina corrente
+        order = rank_by_score(risks)
+        col_size, col_page = st.columns(2)
+        with col_size:
+            page_size = st.slider("Componenti per pagina", 10, 100, step=5,
+                                  **_kept_widget("detail_page_size", 25))
+        num_pages = max(1, -(-len(order) // page_size))
+        if st.session_state.get("detail_page", 1) > num_pages:
+            st.session_state.detail_page = num_pages
+        with col_page:
+            page = st.number_input(f"Pagina (di {num_pages})", min_value=1, max_value=num_pages,
+                                   step=1, **_kept_widget("detail_page", 1))
+        start = (int(page) - 1) * page_size
+        st.caption(f"Componenti {start + 1}-{min(start + page_size, len(order))} di {len(order)}, ordinati per score")
+
+        for idx in order[start:start + page_size]:
+            risk = risks[idx]
             color_emoji = "🔴" if risk['color'] == 'RED' else "🟡" if risk['color'] == 'YELLOW' else "🟢"
             sw = risk.get('switching_cost', {})
             sw_class = sw.get('classification', 'N/A')
@@ -525,14 +587,18 @@ def render_tab_albero_dipendenze():
                     # Prova layout a livelli (top-down)
                     pos = nx.shell_layout(graph)
                     if nx.is_directed_acyclic_graph(graph):
-                        # Per DAG usa layout multipartite basato sulla profondita'
+                        # Per DAG usa layout multipartite basato sulla profondita'.
+                        # Il grafo e' in cache e condiviso: i livelli vanno su una copia
+                        layers = {}
                         for node in graph.nodes():
                             try:
                                 depth = nx.shortest_path_length(graph, node, list(nx.descendants(graph, node))[-1]) if nx.descendants(graph, node) else 0
                             except (nx.NetworkXError, IndexError):
                                 depth = 0
-                            graph.nodes[node]['layer'] = depth
-                        pos = nx.multipartite_layout(graph, subset_key='layer')
+                            layers[node] = depth
+                        layered = graph.copy()
+                        nx.set_node_attributes(layered, layers, 'layer')
+                        pos = nx.multipartite_layout(layered, subset_key='layer')
                 except Exception:
                     pos = nx.spring_layout(graph, k=2, iterations=50, seed=42)
 
@@ -558,10 +624,10 @@ def render_tab_albero_dipendenze():
                         n_dep = 0
                     node_sizes.append(1500 + n_dep * 500)
 
-                # Labels abbreviate
+                # Labels abbreviate (fornitori dalla tabella attributi del grafo)
                 labels = {}
-                for node in graph.nodes():
-                    supplier = graph.nodes[node].get('supplier', '')
+                suppliers = _node_columns(graph)['supplier'].tolist()
+                for node, supplier in zip(graph.nodes(), suppliers):
                     label = node
                     if supplier and supplier != 'N/A':
                         label += f"\n({supplier})"
@@ -678,27 +744,30 @@ def render_tab_mappa_geopolitica():
             import folium
             from streamlit_folium import st_folium
 
-            markers = generate_risk_map_data(components_data)
+            markers = risk_map_frame(components_data)
 
-            if markers:
+            if not markers.empty:
                 m = folium.Map(location=[30, 0], zoom_start=2, tiles='CartoDB positron')
 
-                for marker in markers:
-                    color = 'red' if marker['risk_score'] >= 20 else 'orange' if marker['risk_score'] >= 10 else 'green'
-                    icon = 'industry' if marker['type'] == 'frontend' else 'cog'
+                # Colore e icona calcolati a colonne per tutti i marker
+                is_frontend = (markers['type'] == 'frontend').to_numpy()
+                colors = np.select([markers['risk_score'] >= 20, markers['risk_score'] >= 10], ['red', 'orange'], 'green')
+                icons = np.where(is_frontend, 'industry', 'cog')
+                phases = np.where(is_frontend, 'Frontend (Wafer Fab)', 'Backend (Assembly/Test)')
 
+                for marker, color, icon, phase in zip(markers.itertuples(index=False), colors, icons, phases):
                     popup_html = f"""
-                    <b>{marker['label']}</b><br/>
-                    Tipo: {'Frontend (Wafer Fab)' if marker['type'] == 'frontend' else 'Backend (Assembly/Test)'}<br/>
-                    Paese: {marker['country']}<br/>
-                    Rischio: {marker['risk_level']} ({marker['risk_score']}/25)
+                    <b>{marker.label}</b><br/>
+                    Tipo: {phase}<br/>
+                    Paese: {marker.country}<br/>
+                    Rischio: {marker.risk_level} ({marker.risk_score}/25)
                     """
 
                     folium.Marker(
-                        location=[marker['lat'], marker['lon']],
+                        location=[marker.lat, marker.lon],
                         popup=folium.Popup(popup_html, max_width=300),
-                        tooltip=marker['label'],
-                        icon=folium.Icon(color=color, icon=icon, prefix='fa')
+                        tooltip=marker.label,
+                        icon=folium.Icon(color=str(color), icon=str(icon), prefix='fa')
                     ).add_to(m)
 
                 st_folium(m, width=None, height=500)
@@ -733,8 +802,8 @@ def render_tab_mappa_geopolitica():
 
             # Grafico a barre
             fig_geo = go.Figure()
-            colors = ['#ff4444' if row['Geo Score'] >= 20 else '#ffbb33' if row['Geo Score'] >= 12 else '#00C851'
-                      for _, row in df_geo.iterrows()]
+            geo_scores = df_geo['Geo Score'].to_numpy()
+            colors = np.select([geo_scores >= 20, geo_scores >= 12], ['#ff4444', '#ffbb33'], '#00C851').tolist()
 
             fig_geo.add_trace(go.Bar(
                 x=df_geo['Part Number'],
@@ -804,10 +873,7 @@ def render_tab_tier2_visibility():
         else:
             st.metric("Paese Piu' Esposto", "N/A")
     with col4:
-        high_t2 = sum(
-            1 for r in components_risk
-            if r.get('tier2_risk', {}).get('tier2_score', 0) > 15
-        )
+        high_t2 = int((batch['risk_table']['tier2_score'] > 15).sum())
         st.metric("Componenti Alto Rischio T2", high_t2)
 
     # Tabella top bottlenecks
@@ -1119,7 +1185,7 @@ def render_tab_costi_switching():
             'TRIVIALE': '#00C851', 'MODERATO': '#ffbb33',
             'COMPLESSO': '#ff8800', 'CRITICO': '#ff4444'
         }
-        colors = [color_map.get(row['Classificazione'], '#888') for _, row in df_sw.iterrows()]
+        colors = df_sw['Classificazione'].map(color_map).fillna('#888').tolist()
 
         fig_sw.add_trace(go.Bar(
             y=df_sw['Part Number'],
@@ -1347,6 +1413,13 @@ COUNTRY_BLOCK_CONFIG = {
     'Philippines': {'default_weeks': 3, 'risk_multiplier': 1.3},
 }
 
+# Widget del form scenario personalizzato conservati al cambio tab (vedi _kept_widget)
+CUSTOM_SCENARIO_KEYS = (
+    'custom_type', 'custom_country', 'custom_weeks_country', 'custom_supplier',
+    'custom_weeks_supplier', 'custom_increase_percent', 'custom_weeks_lead',
+    'custom_material', 'custom_material_countries', 'custom_weeks_material',
+)
+
 
 def render_tab_simulatore_whatif():
     """Tab 7: Simulatore What-If - Scenari di Disruption"""
@@ -1393,7 +1466,7 @@ def render_tab_simulatore_whatif():
                 options=["Predefinito", "Personalizzato"],
                 horizontal=True,
                 label_visibility="collapsed",
-                key="scenario_option"
+                **_kept_widget("scenario_option", "Predefinito")
             )
 
             scenario_config = None
@@ -1407,7 +1480,7 @@ def render_tab_simulatore_whatif():
                     "Seleziona Scenario",
                     options=scenario_names,
                     help="Scegli tra gli scenari predefiniti",
-                    key="predefined_select"
+                    **_kept_widget("predefined_select", scenario_names[0], scenario_names)
                 )
 
                 selected_scenario = next(
@@ -1456,32 +1529,37 @@ def render_tab_simulatore_whatif():
 
                 def _apply_custom(form_data: Dict[str, Any]):
                     st.session_state.custom_scenario = form_data
+                    # I widget del form non hanno on_change: i valori si conservano al submit
+                    for key in CUSTOM_SCENARIO_KEYS:
+                        if f"_{key}" in st.session_state:
+                            _keep_widget_value(key)
 
                 with st.form("custom_scenario_form"):
+                    scenario_type_labels = list(SCENARIO_TYPES.values())
                     scenario_type_label = st.selectbox(
                         "Tipo Disruption",
-                        options=list(SCENARIO_TYPES.values()),
+                        options=scenario_type_labels,
                         help="Seleziona il tipo di scenario",
-                        key="custom_type"
+                        **_kept_widget("custom_type", scenario_type_labels[0], scenario_type_labels, in_form=True)
                     )
 
                     form_data: Dict[str, Any] = {}
 
                     if scenario_type_label == "Blocco Paese":
+                        block_countries = list(COUNTRY_BLOCK_CONFIG.keys())
                         country = st.selectbox(
                             "Paese",
-                            options=list(COUNTRY_BLOCK_CONFIG.keys()),
+                            options=block_countries,
                             help="Seleziona il paese da simulare bloccato",
-                            key="custom_country"
+                            **_kept_widget("custom_country", block_countries[0], block_countries, in_form=True)
                         )
                         default_weeks = COUNTRY_BLOCK_CONFIG[country]['default_weeks']
                         risk_multiplier = COUNTRY_BLOCK_CONFIG[country]['risk_multiplier']
 
                         weeks = st.slider(
                             "Durata Blocco (settimane)",
-                            min_value=1, max_value=52,
-                            value=default_weeks, step=1,
-                            key="custom_weeks_country"
+                            min_value=1, max_value=52, step=1,
+                            **_kept_widget("custom_weeks_country", default_weeks, in_form=True)
                         )
                         form_data = {
                             'type': 'country_block',
@@ -1499,12 +1577,13 @@ def render_tab_simulatore_whatif():
                             "Fornitore",
                             options=suppliers_list,
                             help="Seleziona il fornitore da simulare interrotto",
-                            key="custom_supplier"
+                            **_kept_widget("custom_supplier", suppliers_list[0] if suppliers_list else None,
+                                           suppliers_list, in_form=True)
                         )
                         weeks = st.slider(
                             "Durata Interruzione (settimane)",
-                            min_value=1, max_value=52, value=4, step=1,
-                            key="custom_weeks_supplier"
+                            min_value=1, max_value=52, step=1,
+                            **_kept_widget("custom_weeks_supplier", 4, in_form=True)
                         )
                         form_data = {
                             'type': 'supplier_outage',
@@ -1516,13 +1595,13 @@ def render_tab_simulatore_whatif():
                     elif scenario_type_label == "Aumento Lead Time":
                         increase_percent = st.slider(
                             "Aumento Lead Time (%)",
-                            min_value=10, max_value=200, value=50, step=10,
-                            key="custom_increase_percent"
+                            min_value=10, max_value=200, step=10,
+                            **_kept_widget("custom_increase_percent", 50, in_form=True)
                         )
                         weeks = st.slider(
                             "Durata Aumento (settimane)",
-                            min_value=1, max_value=52, value=4, step=1,
-                            key="custom_weeks_lead"
+                            min_value=1, max_value=52, step=1,
+                            **_kept_widget("custom_weeks_lead", 4, in_form=True)
                         )
                         form_data = {
                             'type': 'lead_time_increase',
@@ -1534,26 +1613,28 @@ def render_tab_simulatore_whatif():
 
                     elif scenario_type_label == "Carenza Materiale Tier-2":
                         material_options = {v['name']: k for k, v in MATERIAL_DATABASE.items()}
+                        material_names = list(material_options.keys())
                         selected_material_name = st.selectbox(
                             "Materiale",
-                            options=list(material_options.keys()),
-                            key="custom_material"
+                            options=material_names,
+                            **_kept_widget("custom_material", material_names[0], material_names, in_form=True)
                         )
                         material_key = material_options[selected_material_name]
 
                         mat_info = MATERIAL_DATABASE[material_key]
                         countries = list(mat_info['primary_countries'].keys())
+                        country_options = [c.title() for c in countries]
                         affected_countries = st.multiselect(
                             "Paesi Colpiti",
-                            options=[c.title() for c in countries],
-                            default=[c.title() for c in countries[:2]],
-                            key="custom_material_countries"
+                            options=country_options,
+                            **_kept_widget("custom_material_countries", country_options[:2],
+                                           country_options, in_form=True)
                         )
 
                         weeks = st.slider(
                             "Durata Carenza (settimane)",
-                            min_value=1, max_value=52, value=4, step=1,
-                            key="custom_weeks_material"
+                            min_value=1, max_value=52, step=1,
+                            **_kept_widget("custom_weeks_material", 4, in_form=True)
                         )
                         form_data = {
                             'type': 'material_shortage',
@@ -1612,7 +1693,7 @@ def render_tab_simulatore_whatif():
                     "Componente Specifico (Analizza Tutti)",
                     options=["Analizza Tutti"] + component_names,
                     help="Seleziona un componente per vedere dettaglio",
-                    key="component_select"
+                    **_kept_widget("component_select", "Analizza Tutti", ["Analizza Tutti"] + component_names)
                 )
 
                 if selected_pn == "Analizza Tutti":
@@ -1791,51 +1872,39 @@ def render_tab_dashboard_esecutiva():
 
     # Calcolo KPI
     risks = batch['components_risk']
-    red_count = sum(1 for r in risks if r['color'] == 'RED')
-    yellow_count = sum(1 for r in risks if r['color'] == 'YELLOW')
-    green_count = sum(1 for r in risks if r['color'] == 'GREEN')
+    red_count, yellow_count, green_count = count_risk_colors(risks)
 
-    avg_score = sum(r['score'] for r in risks) / len(risks) if risks else 0
-    total_mh = sum(r['man_hours'] for r in risks)
+    table = batch['risk_table']
+    is_red = table['color'] == 'RED'
+    avg_score = float(table['score'].mean()) if risks else 0
+    total_mh = int(table['man_hours'].sum())
     spof_count = len(bom_risk.get('spofs', []))
 
     # Valore BOM
     total_bom_value = bom_risk.get('total_bom_value', 0)
 
     # Componenti critici per categoria
-    critical_by_category = {}
-    for r in risks:
-        cat = r.get('category', 'N/A')
-        if r['color'] == 'RED':
-            critical_by_category[cat] = critical_by_category.get(cat, 0) + 1
+    critical_by_category = table.loc[is_red, 'category'].value_counts(sort=False, dropna=False).to_dict()
 
-    # Top fornitori a rischio
-    supplier_risk = {}
-    for r in risks:
-        supp = r.get('supplier', 'N/A')
-        if supp not in supplier_risk:
-            supplier_risk[supp] = {'total': 0, 'red': 0, 'count': 0}
-        supplier_risk[supp]['total'] += r['score']
-        supplier_risk[supp]['count'] += 1
-        if r['color'] == 'RED':
-            supplier_risk[supp]['red'] += 1
-
-    # Media per fornitore
-    for supp in supplier_risk:
-        supplier_risk[supp]['avg'] = supplier_risk[supp]['total'] / supplier_risk[supp]['count']
+    # Top fornitori a rischio (media, numero componenti e RED per fornitore)
+    supplier_risk = (
+        table.assign(red=is_red)
+        .groupby('supplier', sort=False, dropna=False)
+        .agg(**{'Rischio Medio': ('score', 'mean'), 'Count': ('score', 'size'), 'Red': ('red', 'sum')})
+        .rename_axis('Fornitore')
+        .reset_index()
+    )
 
     # Top 10 componenti a rischio
-    top_risks = sorted(risks, key=lambda x: x['score'], reverse=True)[:10]
+    top_risks = [risks[idx] for idx in rank_by_score(risks)[:10]]
 
     # Heat map categorie x livello rischio
-    category_risk_matrix = {}
-    for r in risks:
-        cat = r.get('category', 'N/A')
-        level = r['risk_level']
-        if cat not in category_risk_matrix:
-            category_risk_matrix[cat] = {'ALTO': 0, 'MEDIO': 0, 'BASSO': 0, 'count': 0}
-        category_risk_matrix[cat][level] += 1
-        category_risk_matrix[cat]['count'] += 1
+    level_counts = (
+        pd.get_dummies(table['risk_level'])
+        .reindex(columns=['ALTO', 'MEDIO', 'BASSO'], fill_value=0)
+        .astype(int)
+    )
+    category_risk_matrix = level_counts.groupby(table['category'], sort=False, dropna=False).sum()
 
     # =============================================================================
     # DISPLAY KPI
@@ -1892,11 +1961,8 @@ def render_tab_dashboard_esecutiva():
 
     with chart_col2:
         # Bar chart fornitori a rischio
-        if supplier_risk:
-            supp_df = pd.DataFrame([
-                {'Fornitore': s, 'Rischio Medio': d['avg'], 'Count': d['count'], 'Red': d['red']}
-                for s, d in supplier_risk.items()
-            ]).sort_values('Rischio Medio', ascending=False).head(10)
+        if not supplier_risk.empty:
+            supp_df = supplier_risk.sort_values('Rischio Medio', ascending=False).head(10)
 
             colors = ['#ff4444' if r >= 55 else '#ffbb33' if r >= 30 else '#00C851' for r in supp_df['Rischio Medio']]
             fig_supp = px.bar(
@@ -1920,19 +1986,13 @@ def render_tab_dashboard_esecutiva():
     # =============================================================================
     st.subheader("🔥 Heat Map: Categorie x Livello Rischio")
 
-    if category_risk_matrix:
-        heatmap_data = []
-        for cat, levels in category_risk_matrix.items():
-            total = levels['count']
-            heatmap_data.append({
-                'Categoria': cat,
-                'ALTO': levels['ALTO'],
-                'MEDIO': levels['MEDIO'],
-                'BASSO': levels['BASSO'],
-                'Totale': total
-            })
-
-        df_heatmap = pd.DataFrame(heatmap_data).sort_values('Totale', ascending=False)
+    if not category_risk_matrix.empty:
+        df_heatmap = (
+            category_risk_matrix.assign(Totale=category_risk_matrix.sum(axis=1))
+            .rename_axis('Categoria')
+            .reset_index()
+            .sort_values('Totale', ascending=False)
+        )
 
         # Visualizzazione tabellare con colori
         def highlight_risk(val, col):
@@ -2239,28 +2299,139 @@ def render_tab_guida():
 # HELPER FUNCTIONS
 # =============================================================================
 
-def _run_batch_analysis(pns: List[str], client_id, run_rate):
-    """Esegue analisi batch e restituisce risultati strutturati."""
+@st.cache_resource(show_spinner=False)
+def _build_risk_pie(counts: Tuple[int, int, int]) -> go.Figure:
+    """Grafico a torta RED/YELLOW/GREEN (in cache sui conteggi)."""
+    risk_counts = {
+        'Alto (RED)': counts[0],
+        'Medio (YELLOW)': counts[1],
+        'Basso (GREEN)': counts[2]
+    }
+    return px.pie(
+        values=list(risk_counts.values()),
+        names=list(risk_counts.keys()),
+        color=list(risk_counts.keys()),
+        color_discrete_map={
+            'Alto (RED)': '#ff4444',
+            'Medio (YELLOW)': '#ffbb33',
+            'Basso (GREEN)': '#00C851'
+        },
+        title="Distribuzione per Livello di Rischio"
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _build_switching_pie(sw_counts: Tuple[Tuple[str, int], ...]) -> go.Figure:
+    """Grafico a torta delle classi di switching (in cache sui conteggi)."""
+    return px.pie(
+        values=[count for _, count in sw_counts],
+        names=[cls for cls, _ in sw_counts],
+        color=[cls for cls, _ in sw_counts],
+        color_discrete_map={
+            'TRIVIALE': '#00C851',
+            'MODERATO': '#ffbb33',
+            'COMPLESSO': '#ff8800',
+            'CRITICO': '#ff4444'
+        },
+        title="Distribuzione Costi di Switching"
+    )
+
+
+def _find_header_row(df_raw: pd.DataFrame) -> Optional[int]:
+    """
+    Trova la riga di intestazione della BOM (contiene 'supplier' e 'part'/'name').
+
+    Ricerca vettoriale per colonna, senza iterare le righe in Python.
+    """
+    cells = df_raw.astype(str).where(df_raw.notna(), '')
+    lowered = cells.apply(lambda col: col.str.lower())
+
+    def _row_contains(word: str) -> pd.Series:
+        return lowered.apply(lambda col: col.str.contains(word, regex=False)).any(axis=1)
+
+    hits = _row_contains('supplier') & (_row_contains('part') | _row_contains('name'))
+    return int(hits.idxmax()) if hits.any() else None
+
+
+def _dedupe_columns(header: List[Any]) -> List[Any]:
+    """Nomi colonna come pd.read_excel: 'Unnamed: i' per celle vuote, suffisso .N per duplicati."""
+    columns = []
+    seen = {}
+    for i, name in enumerate(header):
+        if pd.isna(name):
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+@st.cache_data(show_spinner=False)
+def _load_bom_dataframe(file_bytes: bytes, filename: str) -> pd.DataFrame:
+    """
+    Legge una BOM (CSV o Excel) e restituisce il DataFrame con l'header corretto.
+
+    Per i file Excel usa il foglio INPUTS (se presente) e cerca la riga di
+    intestazione. Il risultato è in cache sui bytes del file: i rerun di
+    Streamlit (es. cambio run rate) non rileggono il workbook.
+    """
+    if filename.lower().endswith('.csv'):
+        return pd.read_csv(io.BytesIO(file_bytes))
+
+    xl = pd.ExcelFile(io.BytesIO(file_bytes))
+    target_sheet = None
+    for sheet in xl.sheet_names:
+        if sheet.upper() == 'INPUTS':
+            target_sheet = sheet
+            break
+    if target_sheet is None:
+        target_sheet = xl.sheet_names[0]
+
+    # Un solo parsing del foglio: l'header viene applicato in memoria
+    df_raw = pd.read_excel(xl, sheet_name=target_sheet, header=None)
+    if df_raw.empty:
+        return df_raw
+    header_row = _find_header_row(df_raw)
+    if header_row is None:
+        header_row = 0
+        drop_empty = False
+    else:
+        drop_empty = True
+
+    df = df_raw.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = _dedupe_columns(df_raw.iloc[header_row].tolist())
+    df = df.astype(object).infer_objects()
+    return df.dropna(how='all') if drop_empty else df
+
+
+def _run_batch_analysis(db, pns: List[str], client_id, run_rate):
+    """
+    Esegue analisi batch e restituisce risultati strutturati.
+    Non usa st.*: può girare nel thread di lavoro (vedi _score_batch).
+    """
     from risk_engine import calculate_bom_risk_v3
-    
-    results = st.session_state.db.lookup_batch(pns, client_id)
-    found_components = {pn: data for pn, data in results.items() if data is not None}
-    not_found = [pn for pn, data in results.items() if data is None]
 
-    if not found_components:
+    # Un solo DataFrame per tutta la BOM (indicizzato per PN trovato):
+    # lo scoring legge le colonne direttamente
+    df = db.lookup_batch_df(pns, client_id)
+    not_found = [pn for pn in dict.fromkeys(pns) if pn not in df.index]
+
+    if df.empty:
         return None
 
-    # Calcola rischi individuali
-    components_data = []
-    components_risk = []
-    for pn, data in found_components.items():
-        risk = calculate_component_risk(data, run_rate)
+    df['Part Number'] = df.index
+    components_data = df.to_dict('records')
+
+    components_risk = calculate_components_risk(df, run_rate)
+    suppliers = df.get('Supplier Name', pd.Series('N/A', index=df.index)).tolist()
+    categories = df.get(CATEGORY_COLUMN, pd.Series('N/A', index=df.index)).tolist()
+    for risk, pn, supplier, category in zip(components_risk, df.index, suppliers, categories):
         risk['part_number'] = pn
-        risk['supplier'] = data.get('Supplier Name', 'N/A')
-        risk['category'] = data.get('Category of product (MCU, MPU, Sensor, Analogic, Power, Passive Component, Transceiver Wireless)', 'N/A')
-        components_risk.append(risk)
-        data['Part Number'] = pn
-        components_data.append(data)
+        risk['supplier'] = supplier
+        risk['category'] = category
 
     # Calcola BOM risk v3 (con dependency graph)
     bom_risk_v3 = calculate_bom_risk_v3(components_data, components_risk)
@@ -2268,8 +2439,110 @@ def _run_batch_analysis(pns: List[str], client_id, run_rate):
     return {
         'components_data': components_data,
         'components_risk': components_risk,
+        'risk_table': risk_table(components_risk),
         'bom_risk': bom_risk_v3,
-        'found_count': len(found_components),
+        'found_count': len(df),
         'total_count': len(pns),
         'not_found': not_found,
     }
+
+
+# Oltre questa soglia di part numbers lo scoring gira in un thread di lavoro
+BACKGROUND_SCORING_MIN_PNS = 200
+
+# Worker condivisi tra le sessioni per lo scoring in background
+SCORING_WORKERS = min(4, os.cpu_count() or 1)
+
+# Intervallo (s) con cui la UI controlla lo stato del job in background
+SCORING_POLL_S = 0.5
+
+
+@st.cache_resource
+def _scoring_executor() -> ThreadPoolExecutor:
+    """Executor condiviso per lo scoring delle BOM grandi."""
+    return ThreadPoolExecutor(max_workers=SCORING_WORKERS, thread_name_prefix='risk-scoring')
+
+
+# Analisi batch memorizzate per sessione (LRU sugli input)
+BATCH_CACHE_SIZE = 4
+
+
+def _batch_key(db, pns: List[str], client_id, run_rate) -> str:
+    """Hash stabile degli input dell'analisi batch, versione del database inclusa."""
+    payload = repr((tuple(pns), client_id, int(run_rate), db.db_path.stat().st_mtime_ns))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _store_batch(key: str, batch):
+    """Salva il risultato nella cache LRU di sessione e in st.session_state.batch_results."""
+    if 'batch_cache' not in st.session_state:
+        st.session_state.batch_cache = OrderedDict()
+    cache = st.session_state.batch_cache
+    cache[key] = batch
+    cache.move_to_end(key)
+    if len(cache) > BATCH_CACHE_SIZE:
+        cache.popitem(last=False)
+    st.session_state.batch_results = batch
+
+
+def _score_batch(pns: List[str], client_id, run_rate):
+    """
+    Lancia l'analisi batch (solo su click dei pulsanti di analisi) e la salva
+    in st.session_state.batch_results, letta da dashboard e grafici.
+
+    Se PN, cliente, run rate e database non sono cambiati rispetto a
+    un'analisi recente, il risultato viene riusato senza ricalcolo.
+    Le BOM grandi sono calcolate nel thread di lavoro: il job resta in
+    st.session_state.scoring_job e viene raccolto da _poll_scoring_job,
+    quindi la UI resta utilizzabile e i rerun non perdono il risultato.
+    Ritorna None finché il job in background non è completato.
+    """
+    db = st.session_state.db
+    cache = st.session_state.get('batch_cache', {})
+
+    key = _batch_key(db, pns, client_id, run_rate)
+    if key in cache:
+        batch = cache[key]
+    elif len(pns) < BACKGROUND_SCORING_MIN_PNS:
+        with st.spinner(f"Calcolo rischio su {len(pns)} part numbers..."):
+            batch = _run_batch_analysis(db, pns, client_id, run_rate)
+    else:
+        job = st.session_state.get('scoring_job')
+        if job is None or job['key'] != key:
+            if job is not None:
+                job['future'].cancel()
+            st.session_state.scoring_job = {
+                'key': key,
+                'future': _scoring_executor().submit(_run_batch_analysis, db, pns, client_id, run_rate),
+                'start': time.perf_counter(),
+                'count': len(pns),
+            }
+        return None
+
+    _store_batch(key, batch)
+    return batch
+
+
+@st.fragment(run_every=SCORING_POLL_S)
+def _poll_scoring_job():
+    """Mostra l'avanzamento del job di scoring in background e ne raccoglie il risultato."""
+    job = st.session_state.get('scoring_job')
+    if job is None:
+        return
+    future = job['future']
+    elapsed = time.perf_counter() - job['start']
+    if not future.done():
+        with st.status(f"Calcolo rischio su {job['count']} part numbers...", state="running"):
+            st.caption(f"In corso da {elapsed:.1f}s")
+        return
+
+    del st.session_state.scoring_job
+    try:
+        batch = future.result()
+    except Exception as e:
+        st.error(f"Errore nel calcolo del rischio: {str(e)}")
+        return
+    _store_batch(job['key'], batch)
+    st.toast(f"Rischio calcolato in {elapsed:.1f}s")
+    # Rerun completo: dashboard e grafici leggono i nuovi batch_results
+    st.rerun()
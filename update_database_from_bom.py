@@ -1224,32 +1224,32 @@ def update_database():
 
     # Aggiungi part numbers
     print(f"\n=== Adding Part Numbers ({len(COMPONENTS_DB)} components) ===")
-    for comp in COMPONENTS_DB:
-        pn = comp['Part Number']
-        if db.add_part_number(pn, comp):
-            print(f"  Added: {pn} ({comp['Supplier Name']})")
-        else:
-            print(f"  Updated: {pn} ({comp['Supplier Name']})")
+    # Un solo salvataggio per tutti i componenti
+    if db.add_part_numbers(COMPONENTS_DB):
+        for comp in COMPONENTS_DB:
+            print(f"  Added/updated: {comp['Part Number']} ({comp['Supplier Name']})")
+    else:
+        print("  Error adding part numbers")
 
-    # Aggiungi dati specifici per cliente
+    # Aggiungi dati specifici per cliente (un salvataggio per cliente)
     print("\n=== Adding Client-Specific Data (qty, buffer) ===")
     for client_id, data_list in CLIENT_DATA.items():
-        for item in data_list:
-            pn = item['pn']
-            qty = item['qty']
-            buffer = item['buffer']
-
-            client_data = {
-                'How Many Device of this specific PN are in the BOM?': qty,
-                'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units': buffer,
+        records = [
+            {
+                'Part Number': item['pn'],
+                'How Many Device of this specific PN are in the BOM?': item['qty'],
+                'If Dedicated Buffer Stock Units to the supplier is yes specify the number of Units': item['buffer'],
                 'Custom Supplier Lead Time (weeks)': None,
                 'Notes': f'Importato da BOM {client_id}',
             }
+            for item in data_list
+        ]
 
-            if db.add_part_number(pn, client_data, client_id):
-                print(f"  Added client data: {client_id} - {pn} (qty={qty}, buffer={buffer})")
-            else:
-                print(f"  Updated client data: {client_id} - {pn}")
+        if db.add_part_numbers(records, client_id):
+            for item in data_list:
+                print(f"  Added/updated client data: {client_id} - {item['pn']} (qty={item['qty']}, buffer={item['buffer']})")
+        else:
+            print(f"  Error adding client data: {client_id}")
 
     print("\n=== Database Update Complete ===")
 